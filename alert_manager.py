@@ -1,4 +1,3 @@
-
 import threading
 import time
 import os
@@ -13,51 +12,67 @@ class AlertManager:
         self.sound_file = os.path.abspath(sound_file) # Absolute path is safer
         self.is_playing = False
         self.thread = None
+        self._stop_event = threading.Event()
+        self._proc = None
 
     def _play_loop(self):
-        """Internal loop to play sound continuously while is_playing is True."""
+        """Internal loop to play sound continuously until stopped."""
         print(f"DEBUG: Starting Alert Loop. File: {self.sound_file}")
-        
-        while self.is_playing:
+
+        while not self._stop_event.is_set():
             played = False
             try:
-                # Method 1: playsound library (Cross Platform)
-                if playsound:
-                    # playsound 1.2.2 block param is default True, which is good for us
-                    playsound(self.sound_file)
-                    played = True
-            except Exception as e:
-                # print(f"DEBUG: playsound failed: {e}")
+                # Method 1: macOS Native (killable, so stop() silences it immediately)
+                self._proc = subprocess.Popen(["afplay", self.sound_file])
+                self._proc.wait()
+                played = True
+            except Exception:
                 pass
-            
+            finally:
+                self._proc = None
+
             if not played:
                 try:
-                    # Method 2: macOS Native
-                    subprocess.run(["afplay", self.sound_file], check=False)
-                    played = True
-                except:
+                    # Method 2: playsound library (Cross Platform)
+                    if playsound and not self._stop_event.is_set():
+                        # playsound 1.2.2 block param is default True, which is good for us
+                        playsound(self.sound_file)
+                        played = True
+                except Exception as e:
+                    # print(f"DEBUG: playsound failed: {e}")
                     pass
 
             if not played:
                 # Method 3: Terminal Bell (Fallback)
                 print('\a')
-                time.sleep(1)
-            
+                self._stop_event.wait(1)
+
             # Small delay if the method was non-blocking or very short
-            if self.is_playing:
-                time.sleep(0.5)
+            self._stop_event.wait(0.5)
 
     def start(self):
         """Starts the alert sound in a background thread."""
         if not self.is_playing:
             self.is_playing = True
+            self._stop_event.clear()
             self.thread = threading.Thread(target=self._play_loop, daemon=True)
             self.thread.start()
 
+    def signal_stop(self):
+        """Silences the alert without waiting for the thread (safe to call from event callbacks)."""
+        self.is_playing = False
+        self._stop_event.set()
+        proc = self._proc
+        if proc and proc.poll() is None:
+            try:
+                proc.terminate()
+            except Exception:
+                pass
+
     def stop(self):
         """Stops the alert sound."""
         print("DEBUG: Stopping Alert Loop.")
-        self.is_playing = False
+        self.signal_stop()
         if self.thread:
             self.thread.join(timeout=1)
             self.thread = None
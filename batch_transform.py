@@ -0,0 +1,142 @@
+"""
+Column-wise version of `bulk_uploader.prepare_row` for whole files.
+
+`prepare_rows(rows)` returns exactly what `[prepare_row(r) for r in rows]` does
+(the same (data, rpc_payload, problems) triples, equal dicts, same problem
+messages), but works a column at a time: each column is pulled out once, and
+every per-value rule (type/unit mapping, defaults, blank checks, int parsing,
+name canonicalization) runs once per *distinct* value instead of once per row.
+Catalogue columns are highly repetitive (a few types, categories, units,
+generics and manufacturers per file), so most of the per-row work disappears.
+
+`bulk_uploader` (one file at a time, off the event loop) and `copy_loader` (per
+chunk) prepare their rows with it; `bench_hotpaths.py` times both paths and
+checks they agree.
+"""
+from operator import itemgetter
+
+from row_validator import text_to_unit_enum
+from name_index import get_index
+
+DATA_KEYS = (
+    'type', 'category', 'brand', 'strength', 'name', 'primary_unit', 'secondary_unit',
+    'conversion_rate', 'item_code', 'medex_url', 'entry_status', 'updated_by',
+    'generic_name_raw', 'manufacturer_name_raw', 'generic_id', 'manufacturer_id',
+)
+
+PAYLOAD_KEYS = (
+    'p_type', 'p_category', 'p_brand', 'p_generic_name', 'p_strength', 'p_manufacturer_name',
+    'p_name', 'p_primary_unit', 'p_secondary_unit', 'p_conversion_rate', 'p_item_code', 'p_medex_url',
+)
+
+
+def _blank(val):
+    return val is None or (isinstance(val, str) and val.strip() == '')
+
+
+def _map(fn, column):
+    """`[fn(v) for v in column]`, calling fn once per distinct value, in first-appearance order."""
+    lut = dict.fromkeys(column)  # Row order, not set order: canonical() keeps the first spelling it sees
+    for val in lut:
+        lut[val] = fn(val)
+    return list(map(lut.__getitem__, column))
+
+
+def _column(rows, key, default):
+    try:
+        return list(map(itemgetter(key), rows))  # csv.DictReader rows always carry every header
+    except KeyError:
+        return [row.get(key, default) for row in rows]
+
+
+def _type(val):
+    val = val.upper()
+    return val if val in ('MEDICINE', 'OTHER') else 'MEDICINE'
+
+
+def _blank_to_none(val):
+    return None if val and val.strip() == "" else val
+
+
+def _none_if_empty(val):
+    return None if _blank(val) else val
+
+
+def _rate(val):
+    try:
+        rate = int(val)
+    except:
+        rate = 1
+    return rate
+
+
+def _payload_rate(rate):
+    rate = int(rate or 1)
+    return rate if rate > 0 else 1
+
+
+def _default(default):
+    return lambda val: default if _blank(val) else val
+
+
+def prepare_rows(rows):
+    """Batch `prepare_row`: list of CSV dicts -> list of (data, rpc_payload, problems)."""
+    if not rows:
+        return []
+    index = get_index()
+    count = len(rows)
+    nones = [None] * count
+
+    # sanitize_row, column by column
+    types = _map(_type, _column(rows, 'type', 'MEDICINE'))
+    categories = _column(rows, 'category', 'Miscellaneous')
+    brands = _map(_blank_to_none, _column(rows, 'brand', None))
+    strengths = _column(rows, 'strength', 'N/A')
+    primary_units = _column(rows, 'primary_unit', 'piece')
+    secondary_units = _map(_blank_to_none, _column(rows, 'secondary_unit', None))
+    rates = _map(_rate, _column(rows, 'conversion_rate', 1))
+    item_codes = _column(rows, 'item_code', '')
+    urls = _map(_blank_to_none, _column(rows, 'medex_url', None))
+    statuses = _column(rows, 'entry_status', 'AI_L1')
+    updaters = _map(_blank_to_none, _column(rows, 'updated_by', None))
+    generics = _map(_none_if_empty, _column(rows, 'generic_name', None))
+    manufacturers = _map(_none_if_empty, _column(rows, 'manufacturer', None))
+
+    is_med = [t == 'MEDICINE' for t in types]
+    names = [None if med else (n or 'Unknown Product') for med, n in zip(is_med, _column(rows, 'name', None))]
+
+    datas = [dict(zip(DATA_KEYS, values)) for values in zip(
+        types, categories, brands, strengths, names, primary_units, secondary_units, rates,
+        item_codes, urls, statuses, updaters, generics, manufacturers, nones, nones,
+    )]
+
+    # RPC payload: none_if_empty + validate_rpc_payload + canonicalize_payload
+    p_brands = [b if med else None for med, b in zip(is_med, _map(_none_if_empty, brands))]
+    p_names = _map(_none_if_empty, names)
+    # prepare_row only canonicalizes MEDICINE generics; OTHER rows must not register names
+    p_generics = _map(lambda v: index.canonical("generic", v) if v else v,
+                      [g if med else None for med, g in zip(is_med, generics)])
+    p_strengths = [s if med else None for med, s in zip(is_med, _map(_default('N/A'), strengths))]
+
+    payloads = [dict(zip(PAYLOAD_KEYS, values)) for values in zip(
+        types,
+        _map(_default('Miscellaneous'), categories),
+        p_brands,
+        p_generics,
+        p_strengths,
+        _map(lambda v: index.canonical("manufacturer", v) if v else v, manufacturers),
+        p_names,
+        _map(lambda v: text_to_unit_enum(v) or 'piece', primary_units),
+        _map(text_to_unit_enum, secondary_units),
+        _map(_payload_rate, rates),
+        _map(_default(''), item_codes),
+        _map(_none_if_empty, urls),
+    )]
+
+    problems = [
+        (["MEDICINE row without brand"] if brand is None else [])
+        if med else (["OTHER row without name"] if name is None else [])
+        for med, brand, name in zip(is_med, p_brands, p_names)
+    ]
+    return list(zip(datas, payloads, problems))
+
@@ -0,0 +1,214 @@
+"""
+Microbenchmarks for the pure per-item functions on the scrape/upload path.
+
+Runs each function over the rows in data/*.csv plus a synthetic corpus scaled up
+from them, reports the best-of-N time per item, and compares it with the stored
+baseline (benchmarks/hotpaths_baseline.json). Any function slower than the
+baseline by more than --threshold makes the script exit with status 1.
+It also checks that batch_transform.prepare_rows still matches prepare_row
+row for row (each with a fresh name index, under several PYTHONHASHSEEDs, since
+canonical spellings depend on the order names are first seen) and prints the
+time the batch path saves.
+
+Usage:
+    python bench_hotpaths.py                    # compare against the baseline
+    python bench_hotpaths.py --save-baseline    # record a new baseline (same machine!)
+    python bench_hotpaths.py --scale 50 --threshold 0.15
+"""
+import argparse
+import copy
+import csv
+import glob
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import main_browser
+import bulk_uploader
+import batch_transform
+import name_index
+import upload_supabase
+
+BASELINE_FILE = "benchmarks/hotpaths_baseline.json"
+
+# Characters the site sprinkles into scraped text (NBSP, zero-width, tabs/newlines)
+NOISE = ["\u00a0", "\u200b", "\t", "\n  ", " "]
+
+
+def load_rows(pattern="data/*.csv"):
+    rows = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, 'r', encoding='utf-8') as f:
+            rows.extend(csv.DictReader(f))
+    return rows
+
+
+def scale_rows(rows, scale, seed=42):
+    """Synthetic corpus: `scale` copies of the real rows with varied brands/strengths."""
+    rnd = random.Random(seed)
+    out = []
+    for i in range(scale):
+        for row in rows:
+            r = dict(row)
+            r['brand'] = f"{row['brand']} {i}" if i else row['brand']
+            r['strength'] = f"{rnd.choice([5, 10, 20, 40, 250, 500])} mg" if i else row['strength']
+            out.append(r)
+    return out
+
+
+def to_raw_scrape(row, rnd):
+    """Builds the dict scrape_details hands to transform_medex_item, noise included."""
+    noisy = lambda s: f"{rnd.choice(NOISE)}{s}{rnd.choice(NOISE)}" if s else s
+    return {
+        "brand_name": noisy(f"{row.get('brand', '')} {row.get('category', '')}"),
+        "generic_name": noisy(row.get('generic_name', '')),
+        "strength": noisy(row.get('strength', '')),
+        "manufacturer": noisy(row.get('manufacturer', '')),
+        "dosage_form": row.get('category', ''),
+        "category_name": row.get('category', ''),
+        "url": row.get('medex_url'),
+    }
+
+
+def make_curl(i):
+    return (
+        f"curl 'https://medex.com.bd/brands/{i}' "
+        f"-H 'accept: text/html,application/xhtml+xml' "
+        f"-H 'accept-language: en-US,en;q=0.9' "
+        f"-H 'cookie: cf_clearance=abc{i}; XSRF-TOKEN=tok{i}; medex_session=sess{i}' "
+        f"-H 'user-agent: Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)' --compressed"
+    )
+
+
+def build_cases(rows):
+    rnd = random.Random(7)
+    raw = [to_raw_scrape(r, rnd) for r in rows]
+    texts = [v for d in raw for v in (d['brand_name'], d['generic_name'], d['manufacturer']) if v]
+    dosages = [d['dosage_form'] for d in raw]
+    curls = [make_curl(i) for i in range(max(1, len(rows) // 10))]
+
+    # upload_supabase.santize_row mutates its input, so it gets fresh copies each run
+    def santize_all(items):
+        for r in copy.deepcopy(items):
+            upload_supabase.santize_row(r)
+
+    return {
+        "clean_text": (lambda items: [main_browser.clean_text(t) for t in items], texts),
+        "get_internal_category": (lambda items: [main_browser.get_internal_category(d) for d in items], dosages),
+        "transform_medex_item": (lambda items: [main_browser.transform_medex_item(d) for d in items], raw),
+        "parse_curl_command": (lambda items: [main_browser.parse_curl_command(c) for c in items], curls),
+        "bulk_uploader.sanitize_row": (lambda items: [bulk_uploader.sanitize_row(r) for r in items], rows),
+        "bulk_uploader.prepare_row": (lambda items: [bulk_uploader.prepare_row(r) for r in items], rows),
+        "batch_transform.prepare_rows": (batch_transform.prepare_rows, rows),
+        "upload_supabase.santize_row": (santize_all, rows),
+    }
+
+
+def bench(fn, items, repeat):
+    """Best-of-`repeat` wall time per item, in microseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(items)
+        best = min(best, time.perf_counter() - start)
+    return best / max(len(items), 1) * 1e6
+
+
+def paths_agree(corpus):
+    """prepare_rows == [prepare_row(r)], each path starting from a freshly loaded name index."""
+    name_index._index = None
+    batch = batch_transform.prepare_rows(corpus)
+    name_index._index = None
+    per_row = [bulk_uploader.prepare_row(r) for r in corpus]
+    name_index._index = None
+    return batch == per_row
+
+
+def check_seeds(argv, seeds):
+    """Seeds (of `seeds`) under which a child run with --check-only finds the paths differ."""
+    failed = []
+    for seed in seeds:
+        env = {**os.environ, "PYTHONHASHSEED": str(seed)}
+        child = subprocess.run([sys.executable, os.path.abspath(__file__), *argv, "--check-only"], env=env)
+        if child.returncode != 0:
+            failed.append(seed)
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pure hot-path functions.")
+    parser.add_argument("--scale", type=int, default=20, help="Copies of the real rows in the synthetic corpus")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per function (best is kept)")
+    parser.add_argument("--threshold", type=float, default=0.20, help="Allowed slowdown vs baseline (0.20 = 20%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--seeds", default="0,1,2,3,4", help="PYTHONHASHSEEDs for the prepare_rows equality check")
+    parser.add_argument("--check-only", action="store_true", help="Only run the equality check (used per seed)")
+    args = parser.parse_args(argv)
+
+    rows = load_rows()
+    if not rows:
+        print("No rows found in data/*.csv")
+        return 1
+    corpus = scale_rows(rows, args.scale)
+    cases = build_cases(corpus)
+
+    # The batch path must stay a drop-in replacement for the per-row one, whatever the hash seed
+    if args.check_only:
+        return 0 if paths_agree(corpus) else 1
+    failed = check_seeds(["--scale", str(args.scale)], [s for s in args.seeds.split(",") if s.strip()])
+    if failed:
+        print(f"batch_transform.prepare_rows output differs from bulk_uploader.prepare_row "
+              f"(PYTHONHASHSEED {', '.join(failed)})")
+        return 1
+
+    results = {}
+    print(f"Corpus: {len(rows)} real rows x{args.scale} = {len(corpus)} rows\n")
+    for name, (fn, items) in cases.items():
+        results[name] = bench(fn, items, args.repeat)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f).get('results', {})
+
+    regressions = []
+    print(f"{'function':32} {'us/item':>10} {'baseline':>10} {'change':>9}")
+    for name, us in results.items():
+        base = baseline.get(name)
+        if base:
+            change = (us - base) / base
+            flag = "  << REGRESSION" if change > args.threshold else ""
+            if flag:
+                regressions.append(name)
+            print(f"{name:32} {us:10.2f} {base:10.2f} {change:+8.1%}{flag}")
+        else:
+            print(f"{name:32} {us:10.2f} {'-':>10} {'-':>9}")
+
+    per_row, batch = results["bulk_uploader.prepare_row"], results["batch_transform.prepare_rows"]
+    print(f"\nprepare_rows vs prepare_row: {per_row / batch:.1f}x faster, "
+          f"{(per_row - batch) * len(corpus) / 1e3:.1f} ms saved on {len(corpus)} rows")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({
+                'saved_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'python': sys.version.split()[0],
+                'corpus_rows': len(corpus),
+                'results': results,
+            }, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"\n{len(regressions)} function(s) slower than baseline by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,351 @@
+"""
+Load benchmark for `global_inventory_add_data_from_python` on a local Postgres.
+
+Generates realistic synthetic rows (zipf-skewed: a few manufacturers own most
+brands, popular generics are shared by many brands), optionally preloads
+inventory_global to a target size with COPY, then calls the RPC from 1..N
+concurrent connections and reports per level:
+
+    rows/s, latency p50/p95/p99/max, INTERNAL_ERROR count,
+    lock waits (backends waiting on a lock, sampled from pg_stat_activity)
+
+`--schedule round-robin,keyed` runs every level twice: rows dealt to the
+connections in turn, then pulled from a shared feed that applies the uploader's
+key_scheduler.KeyScheduler (a new generic / manufacturer is created by one call
+at a time, names already in the database are never waited for). Load
+fix_rpc.sql (current RPC) or an older version of it to compare both RPCs.
+
+Set up a scratch database first (never point this at production):
+
+    createdb medidesh_local
+    psql -d medidesh_local -f "MedideshDb -  Feb 27.sql"
+    psql -d medidesh_local -f fix_rpc.sql
+    python bench_rpc_load.py --preload 300000 --rows 20000 --concurrency 1,4,8,16
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+import config
+from key_scheduler import KeyScheduler, dimension_keys
+from name_index import normalize_name
+
+try:
+    import psycopg
+except ImportError:
+    psycopg = None
+
+CATEGORIES = ["Tablet", "Capsule", "Syrup", "Injection", "Cream", "Drops", "Inhaler", "Powder", "Suppository"]
+STRENGTHS = ["5 mg", "10 mg", "20 mg", "40 mg", "100 mg", "250 mg", "500 mg", "1 gm", "5 mg/5 ml", "0.1%"]
+UNITS = {
+    "Tablet": ("piece", "strip", 10), "Capsule": ("piece", "strip", 10), "Syrup": ("bottle", None, 1),
+    "Injection": ("vial", None, 1), "Cream": ("tube", None, 1), "Drops": ("bottle", None, 1),
+    "Inhaler": ("piece", None, 1), "Powder": ("sachet", None, 1), "Suppository": ("piece", None, 1),
+}
+
+RPC_SQL = (
+    "SELECT public.global_inventory_add_data_from_python("
+    "%(p_type)s, %(p_category)s, %(p_brand)s, %(p_generic_name)s, %(p_strength)s, %(p_manufacturer_name)s, "
+    "%(p_name)s, %(p_primary_unit)s, %(p_secondary_unit)s, %(p_conversion_rate)s, %(p_item_code)s, %(p_medex_url)s)"
+)
+
+LOCK_SAMPLE_SQL = """
+SELECT count(*) FILTER (WHERE wait_event_type = 'Lock'),
+       count(*) FILTER (WHERE state = 'active')
+FROM pg_stat_activity
+WHERE datname = current_database() AND pid <> pg_backend_pid()
+"""
+
+
+def zipf_weights(n, s):
+    return [1.0 / (rank ** s) for rank in range(1, n + 1)]
+
+
+class RowGenerator:
+    """Synthetic RPC payloads with a fixed pool of manufacturers and generics."""
+
+    def __init__(self, manufacturers=300, generics=2000, skew=1.1, other_ratio=0.02, seed=42):
+        self.rnd = random.Random(seed)
+        self.manufacturers = [f"Synthetic Pharma {i:04d} Ltd." for i in range(manufacturers)]
+        self.generics = [f"Synthgen {i:05d}" for i in range(generics)]
+        self.mfg_weights = zipf_weights(manufacturers, skew)
+        self.gen_weights = zipf_weights(generics, skew)
+        self.other_ratio = other_ratio
+        self.serial = 0
+
+    def row(self, tag="r"):
+        self.serial += 1
+        rnd = self.rnd
+        category = rnd.choice(CATEGORIES)
+        primary, secondary, rate = UNITS[category]
+        manufacturer = rnd.choices(self.manufacturers, self.mfg_weights)[0]
+        if rnd.random() < self.other_ratio:
+            return {
+                "p_type": "OTHER", "p_category": "Miscellaneous", "p_brand": None, "p_generic_name": None,
+                "p_strength": None, "p_manufacturer_name": manufacturer, "p_name": f"Synthetic Device {tag}{self.serial}",
+                "p_primary_unit": "piece", "p_secondary_unit": None, "p_conversion_rate": 1,
+                "p_item_code": "", "p_medex_url": None,
+            }
+        return {
+            "p_type": "MEDICINE", "p_category": category, "p_brand": f"Synbrand {tag}{self.serial}",
+            "p_generic_name": rnd.choices(self.generics, self.gen_weights)[0], "p_strength": rnd.choice(STRENGTHS),
+            "p_manufacturer_name": manufacturer, "p_name": None,
+            "p_primary_unit": primary, "p_secondary_unit": secondary, "p_conversion_rate": rate,
+            "p_item_code": "", "p_medex_url": f"https://medex.com.bd/brands/{900000 + self.serial}/synthetic",
+        }
+
+    def rows(self, count, tag="r", dup_ratio=0.0, previous=None):
+        """`count` rows; `dup_ratio` of them are repeats of `previous` (exercises ON CONFLICT DO NOTHING)."""
+        out = []
+        for _ in range(count):
+            if previous and self.rnd.random() < dup_ratio:
+                out.append(self.rnd.choice(previous))
+            else:
+                out.append(self.row(tag))
+        return out
+
+
+def preload(dsn, gen, target):
+    """Fills inventory_global up to `target` rows with COPY + the copy_loader merge SQL."""
+    import copy_loader
+
+    with psycopg.connect(dsn) as conn:
+        current = conn.execute("SELECT count(*) FROM public.inventory_global").fetchone()[0]
+        missing = target - current
+        if missing <= 0:
+            return current, 0
+        with conn.cursor() as cur:
+            cur.execute(copy_loader.CREATE_STAGING_SQL)
+            copy_sql = f"COPY inventory_stage ({', '.join(copy_loader.STAGING_COLUMNS)}) FROM STDIN"
+            with cur.copy(copy_sql) as copy:
+                for _ in range(missing):
+                    payload = gen.row(tag="pre")
+                    copy.write_row(tuple(payload[f"p_{col}"] for col in copy_loader.STAGING_COLUMNS))
+            cur.execute("ANALYZE inventory_stage")
+            for sql in (copy_loader.MERGE_GENERICS_SQL, copy_loader.MERGE_MANUFACTURERS_SQL,
+                        copy_loader.MERGE_MEDICINE_SQL, copy_loader.MERGE_OTHER_SQL):
+                cur.execute(sql)
+        conn.execute("ANALYZE public.inventory_global")
+        return current, missing
+
+
+def split_rows(rows, workers):
+    """Round-robin assignment of rows to workers."""
+    return [rows[i::workers] for i in range(workers)]
+
+
+class KeyedFeed:
+    """Rows shared by all connections, handed out through a KeyScheduler (thread-safe)."""
+
+    def __init__(self, rows, resolved=()):
+        self.rows = list(reversed(rows))
+        self.ready = []
+        self.scheduler = KeyScheduler(resolved)
+        self.cond = threading.Condition()
+
+    def _next(self):
+        with self.cond:
+            while True:
+                payload = self.ready.pop() if self.ready else (self.rows.pop() if self.rows else None)
+                if payload is None:
+                    if not self.scheduler.claimed:
+                        return None
+                    self.cond.wait()  # Only parked rows left: wait for their key to resolve
+                    continue
+                keys = dimension_keys(payload)
+                if self.scheduler.claim(keys, payload):
+                    return payload, keys
+
+    def _release(self, keys):
+        with self.cond:
+            self.ready.extend(self.scheduler.release(keys))
+            self.cond.notify_all()
+
+    def stream(self):
+        """Per-connection iterator; a row's keys are released when the next one is requested."""
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            payload, keys = item
+            try:
+                yield payload
+            finally:
+                self._release(keys)
+
+
+def existing_keys(dsn):
+    """key_scheduler keys of the generics / manufacturers already in the database."""
+    keys = set()
+    with psycopg.connect(dsn) as conn:
+        for kind, table in (("generic", "inventory_generics"), ("manufacturer", "inventory_manufacturers")):
+            for (name,) in conn.execute(f"SELECT name FROM public.{table}"):
+                keys.add((kind, normalize_name(name, kind)))
+    return keys
+
+
+def keyed_streams(dsn):
+    """`assign` for run_level: every connection pulls from one KeyedFeed."""
+    def assign(rows, workers):
+        feed = KeyedFeed(rows, existing_keys(dsn))
+        return [feed.stream() for _ in range(workers)]
+    return assign
+
+
+SCHEDULES = {"round-robin": lambda dsn: split_rows, "keyed": keyed_streams}
+
+
+def worker(dsn, rows, latencies, errors, start_event):
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        start_event.wait()
+        for payload in rows:
+            t0 = time.perf_counter()
+            try:
+                result = conn.execute(RPC_SQL, payload).fetchone()[0]
+                if isinstance(result, dict) and result.get('code') == 'INTERNAL_ERROR':
+                    errors.append(result.get('message'))
+            except Exception as e:
+                errors.append(str(e))
+            latencies.append(time.perf_counter() - t0)
+
+
+def sample_locks(dsn, stop_event, samples, interval=0.1):
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        while not stop_event.is_set():
+            samples.append(conn.execute(LOCK_SAMPLE_SQL).fetchone())
+            time.sleep(interval)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def run_level(dsn, rows, concurrency, assign=split_rows, schedule="round-robin"):
+    """Drives the RPC with `concurrency` connections; returns a result dict."""
+    slices = assign(rows, concurrency)
+    latencies, errors, samples = [], [], []
+    start_event, stop_event = threading.Event(), threading.Event()
+    threads = [threading.Thread(target=worker, args=(dsn, part, latencies, errors, start_event)) for part in slices]
+    sampler = threading.Thread(target=sample_locks, args=(dsn, stop_event, samples), daemon=True)
+    for t in threads:
+        t.start()
+    sampler.start()
+    time.sleep(0.2)  # Let every connection open before the clock starts
+
+    t0 = time.perf_counter()
+    start_event.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    stop_event.set()
+    sampler.join()
+
+    lat = sorted(latencies)
+    waiting = [w for w, _ in samples]
+    return {
+        "concurrency": concurrency,
+        "schedule": schedule,
+        "rows": len(rows),
+        "seconds": round(elapsed, 3),
+        "rows_per_s": round(len(rows) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(lat, 50) * 1e3, 2),
+        "p95_ms": round(percentile(lat, 95) * 1e3, 2),
+        "p99_ms": round(percentile(lat, 99) * 1e3, 2),
+        "max_ms": round((lat[-1] if lat else 0) * 1e3, 2),
+        "errors": len(errors),
+        "lock_wait_avg": round(sum(waiting) / len(waiting), 2) if waiting else 0.0,
+        "lock_wait_max": max(waiting, default=0),
+        "first_error": errors[0] if errors else None,
+    }
+
+
+def print_results(results):
+    from rich.console import Console
+    from rich.table import Table
+
+    table = Table(title="global_inventory_add_data_from_python load test", show_header=True, header_style="bold")
+    for col in ("Conns", "Schedule", "Rows/s", "p50 ms", "p95 ms", "p99 ms", "max ms", "Lock waits avg/max", "Errors"):
+        table.add_column(col, justify="right")
+    for r in results:
+        table.add_row(str(r['concurrency']), r['schedule'], f"{r['rows_per_s']:.0f}", f"{r['p50_ms']:.1f}", f"{r['p95_ms']:.1f}",
+                      f"{r['p99_ms']:.1f}", f"{r['max_ms']:.1f}", f"{r['lock_wait_avg']:.1f} / {r['lock_wait_max']}",
+                      str(r['errors']))
+    Console().print(table)
+    for r in results:
+        if r['first_error']:
+            Console().print(f"[red]{r['concurrency']} conns ({r['schedule']}), first error:[/] {r['first_error']}")
+
+    # Lock-wait change of the keyed schedule against round-robin at the same level
+    by_level = {(r['concurrency'], r['schedule']): r for r in results}
+    for (level, schedule), r in by_level.items():
+        base = by_level.get((level, "round-robin"))
+        if schedule != "keyed" or not base:
+            continue
+        change = ((r['lock_wait_avg'] - base['lock_wait_avg']) / base['lock_wait_avg'] * 100
+                  if base['lock_wait_avg'] else 0.0)
+        Console().print(f"{level} conns: lock waits avg {base['lock_wait_avg']:.2f} -> {r['lock_wait_avg']:.2f} "
+                        f"([bold]{change:+.0f}%[/]), rows/s {base['rows_per_s']:.0f} -> {r['rows_per_s']:.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the insert RPC against a local Postgres.")
+    parser.add_argument("--dsn", default="postgresql://localhost/medidesh_local", help="Scratch database (not production!)")
+    parser.add_argument("--rows", type=int, default=10000, help="RPC calls per concurrency level")
+    parser.add_argument("--concurrency", default="1,4,8,16", help="Comma-separated connection counts")
+    parser.add_argument("--preload", type=int, default=0, help="Fill inventory_global to this many rows first")
+    parser.add_argument("--manufacturers", type=int, default=300)
+    parser.add_argument("--generics", type=int, default=2000)
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for manufacturer/generic popularity")
+    parser.add_argument("--dup-ratio", type=float, default=0.1, help="Share of calls repeating an existing row")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--schedule", default="round-robin",
+                        help="Comma-separated: round-robin (rows dealt in turn), keyed (uploader's key scheduling)")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    parser.add_argument("--allow-remote", action="store_true", help="Allow a DSN that looks like the hosted database")
+    args = parser.parse_args(argv)
+
+    if psycopg is None:
+        print("psycopg is not installed. Run: pip install 'psycopg[binary]'")
+        return 2
+    if not args.allow_remote and ("supabase" in args.dsn or (config.DATABASE_URL and args.dsn == config.DATABASE_URL)):
+        print("Refusing to load-test what looks like the production database. Use a local scratch DB.")
+        return 2
+
+    gen = RowGenerator(args.manufacturers, args.generics, args.skew, seed=args.seed)
+    if args.preload:
+        before, added = preload(args.dsn, gen, args.preload)
+        print(f"Preload: inventory_global had {before} rows, staged {added} synthetic rows.")
+
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    schedules = [s.strip() for s in args.schedule.split(",") if s.strip()]
+    unknown = [s for s in schedules if s not in SCHEDULES]
+    if unknown:
+        print(f"Unknown schedule(s): {', '.join(unknown)} (choose from {', '.join(SCHEDULES)})")
+        return 2
+
+    results, previous = [], []
+    for level in levels:
+        for schedule in schedules:
+            # Fresh rows per run (same generator stream), so no run only hits rows inserted by the one before
+            rows = gen.rows(args.rows, tag=f"c{level}_{schedule[0]}_", dup_ratio=args.dup_ratio, previous=previous)
+            previous = rows
+            print(f"Running {len(rows)} calls on {level} connection(s), {schedule}...")
+            results.append(run_level(args.dsn, rows, level, SCHEDULES[schedule](args.dsn), schedule))
+
+    print_results(results)
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Offline end-to-end benchmark of MedexBrowserScraper.run_session.
+
+Builds list and brand page fixtures from data/*.csv (or loads saved ones), runs
+complete sessions against fake_driver.FakeChromiumPage and FakeSupabase, and
+splits the wall time into:
+
+    driver   time inside the fake page (HTML parsing / selector matching)
+    rpc      time inside the fake Supabase client (incl. --rpc-latency)
+    pauses   human-like pauses (config.SLEEP_SCALE, default 0 here)
+    own      everything else: navigation bookkeeping, extraction, transform,
+             validation, journal, frontier, dedup store, console/log output
+
+and reports items/s for our own code. Each session runs in a fresh temp
+directory, so frontier, journal and dedup files start empty.
+
+    python bench_session.py                          # sleeps disabled
+    python bench_session.py --sleep-scale 0.01 --rpc-latency 20 --sessions 3
+    python bench_session.py --profile                # top functions by cumulative time
+    python bench_session.py --save-fixtures data/fixtures
+"""
+import argparse
+import cProfile
+import csv
+import glob
+import os
+import pstats
+import shutil
+import sys
+import tempfile
+import time
+
+import config
+import fake_driver
+import main_browser
+
+
+def load_rows(pattern="data/*.csv", limit=None):
+    rows = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, 'r', encoding='utf-8') as f:
+            rows.extend(csv.DictReader(f))
+    return rows[:limit] if limit else rows
+
+
+def run_once(site, pages, base_url, rpc_latency, profiler=None):
+    """One full session in a temp dir; returns a timing dict."""
+    workdir = tempfile.mkdtemp(prefix="bench_session_")
+    page = fake_driver.FakeChromiumPage(site)
+    supabase = fake_driver.FakeSupabase(latency=rpc_latency)
+    scraper = main_browser.MedexBrowserScraper(allow_attach=False, base_url=base_url, page=page, supabase=supabase)
+
+    paused = [0.0]
+    real_pause = main_browser.human_pause
+
+    def timed_pause(low, high):
+        t0 = time.perf_counter()
+        real_pause(low, high)
+        paused[0] += time.perf_counter() - t0
+
+    main_browser.human_pause = timed_pause
+    try:
+        if profiler:
+            profiler.enable()
+        t0 = time.perf_counter()
+        status, _, stats = scraper.run_session(1, pages, os.path.join(workdir, "scraped_urls_bench.txt"))
+        wall = time.perf_counter() - t0
+        if profiler:
+            profiler.disable()
+    finally:
+        main_browser.human_pause = real_pause
+        scraper.cleanup()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    own = wall - page.elapsed - supabase.elapsed - paused[0]
+    return {
+        "status": status, "items": stats.get('total', 0), "inserted": stats.get('inserted', 0),
+        "wall": wall, "driver": page.elapsed, "rpc": supabase.elapsed, "pauses": paused[0], "own": own,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark whole scraper sessions offline (fake browser + Supabase).")
+    parser.add_argument("--csv", default="data/*.csv", help="Rows to build fixtures from (glob)")
+    parser.add_argument("--items", type=int, help="Use at most N rows")
+    parser.add_argument("--per-page", type=int, default=30, help="Brand links per list page")
+    parser.add_argument("--fixtures", help="Load saved fixtures (fake_driver.save_site layout) instead of building them")
+    parser.add_argument("--base-url", default=fake_driver.BASE_URL, help="Listing URL of the fixtures")
+    parser.add_argument("--pages", type=int, help="List pages to crawl (default: all built pages)")
+    parser.add_argument("--save-fixtures", help="Write the built fixtures to this directory and exit")
+    parser.add_argument("--sessions", type=int, default=3, help="Sessions to run (best is reported)")
+    parser.add_argument("--sleep-scale", type=float, default=0.0, help="config.SLEEP_SCALE for the run (1 = production pauses)")
+    parser.add_argument("--rpc-latency", type=float, default=0.0, help="Simulated RPC round-trip in ms")
+    parser.add_argument("--profile", action="store_true", help="Print the top functions of the last session")
+    args = parser.parse_args(argv)
+
+    from rich.console import Console
+    from rich.table import Table
+    console = Console()
+
+    if args.fixtures:
+        site, pages = fake_driver.load_site(args.fixtures), args.pages or 1
+    else:
+        rows = load_rows(args.csv, args.items)
+        if not rows:
+            console.print(f"[bold yellow]No rows found in {args.csv}[/]")
+            return 2
+        site, pages = fake_driver.build_site(rows, args.per_page, args.base_url)
+        pages = min(args.pages or pages, pages)
+        if args.save_fixtures:
+            fake_driver.save_site(site, args.save_fixtures)
+            console.print(f"[bold green]✓ {len(site)} pages written to {args.save_fixtures}[/]")
+            return 0
+
+    config.SLEEP_SCALE = args.sleep_scale
+    main_browser.console.quiet = True  # Per-item console output would dominate the timing
+    results = []
+    profiler = None
+    for n in range(args.sessions):
+        profiler = cProfile.Profile() if args.profile and n == args.sessions - 1 else None
+        results.append(run_once(site, pages, args.base_url, args.rpc_latency / 1000, profiler))
+    main_browser.console.quiet = False
+
+    best = min(results, key=lambda r: r['own'])
+    items = best['items'] or 1
+    table = Table(title=f"run_session offline ({best['items']} items, {pages} list pages, best of {len(results)})",
+                  show_header=True, header_style="bold")
+    table.add_column("Part", style="bold cyan")
+    table.add_column("Total s", justify="right")
+    table.add_column("ms / item", justify="right")
+    table.add_column("Share", justify="right")
+    for part in ("own", "driver", "rpc", "pauses", "wall"):
+        share = best[part] / best['wall'] * 100 if best['wall'] else 0
+        table.add_row(part, f"{best[part]:.3f}", f"{best[part] / items * 1e3:.3f}", f"{share:.0f}%")
+    console.print(table)
+    console.print(f"Status {best['status']}, {best['inserted']} inserted. "
+                  f"[bold green]Own code: {items / best['own']:.0f} items/s[/] "
+                  f"(wall: {items / best['wall']:.0f} items/s)" if best['own'] > 0 else "")
+
+    if profiler:
+        stats = pstats.Stats(profiler)
+        stats.sort_stats("cumulative").print_stats(20)
+    return 0 if best['status'] == "DONE" else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,23 +4,23 @@ import csv
 import glob
 import logging
 import asyncio
-from datetime import datetime
 from rich.console import Console
 from rich.panel import Panel
 from rich.prompt import Prompt, Confirm
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TimeElapsedColumn
 from rich.table import Table
 from rich.text import Text
-from supabase import create_async_client, ClientOptions
 import config
+from row_validator import validate_rpc_payload, rpc_outcome
+from name_index import canonicalize_payload, get_index
+from batch_transform import prepare_rows
+from dead_letter import DeadLetter, DEAD_LETTER_FILE
+from key_scheduler import KeyScheduler, dimension_keys, known_keys
 
-def debug_log(msg):
-    with open("debug.log", "a") as f:
-        f.write(f"{datetime.now().isoformat()} - {msg}\n")
+from log_setup import setup_logging
 
-# Suppress debug logs from third-party libraries
-logging.getLogger("httpx").setLevel(logging.WARNING)
-logging.basicConfig(level=logging.ERROR)
+# Debug output goes to debug.log through the shared buffered logger (see log_setup.py)
+logger = logging.getLogger("bulk_uploader")
 
 console = Console()
 
@@ -29,6 +29,7 @@ async def get_supabase_client():
     key = config.SUPABASE_KEY
     if "your-project" in url or "your-service" in key:
         return None
+    from supabase import create_async_client, ClientOptions
     options = ClientOptions(postgrest_client_timeout=15)
     return await create_async_client(url, key, options=options)
 
@@ -88,46 +89,92 @@ async def resolve_dependency_direct(supabase, table_name, name_val):
     if not name_val or name_val.strip() == "":
         return None
     name_val = name_val.strip()
-    
-    debug_log(f"Resolving dependency: {table_name} for '{name_val}'")
+
+    kind = "generic" if table_name == "inventory_generics" else "manufacturer"
+    known_id = get_index().lookup_id(kind, name_val)
+    if known_id:
+        return known_id
+    name_val = get_index().canonical(kind, name_val)
+
+    logger.debug("Resolving dependency: %s for '%s'", table_name, name_val)
     try:
         # 1. Select
-        debug_log(f"Executing SELECT on {table_name}")
+        logger.debug("Executing SELECT on %s", table_name)
         res = await supabase.table(table_name).select("id").ilike("name", name_val).execute()
-        debug_log(f"SELECT returned: {res.data}")
+        logger.debug("SELECT returned: %s", res.data)
         if res.data and len(res.data) > 0:
             return res.data[0]['id']
             
         # 2. Insert
-        debug_log(f"Executing INSERT on {table_name}")
+        logger.debug("Executing INSERT on %s", table_name)
         ins = await supabase.table(table_name).insert({"name": name_val}).execute()
-        debug_log(f"INSERT returned: {ins.data}")
+        logger.debug("INSERT returned: %s", ins.data)
         if ins.data and len(ins.data) > 0:
             return ins.data[0]['id']
     except Exception as e:
-        debug_log(f"Exception in resolve_dependency_direct: {e}")
+        logger.warning("Exception in resolve_dependency_direct: %s", e)
         pass
     return None
 
-async def process_single_row(supabase, row, semaphore):
+def none_if_empty(val, default_val=None):
+    """Helper to return None (or a default) instead of an empty string."""
+    if val is None: return default_val
+    if isinstance(val, str) and str(val).strip() == '': return default_val
+    return val
+
+def prepare_row(row):
+    """
+    Sanitizes a CSV row and builds its RPC payload.
+    Returns (data, rpc_payload, problems); rows with problems must not be sent.
+    """
+    data = sanitize_row(row)
+    is_medicine = data['type'] == 'MEDICINE'
+
+    data['generic_name_raw'] = none_if_empty(row.get('generic_name'))
+    data['manufacturer_name_raw'] = none_if_empty(row.get('manufacturer'))
+
+    # The RPC has two signatures. The newest uses category_id UUIDs exclusively.
+    # To avoid UUID lookups entirely for the primary script, we use the older signature:
+    # function global_inventory_add_data_from_python(p_category text, p_name text, p_brand text, p_generic_name text, p_strength text, p_base_unit text, p_manufacturer text, p_item_code text, p_unit_per_strip smallint DEFAULT 1)
+
+    # Since the user specifically disabled RLS and expects direct inserts, and the 2nd signature supports only limited args
+    # We will use the second overloaded RPC which natively handles generics and manufacturers for us and bypasses Grants!
+
+    # `inventory_global_data_integrity` is enforced locally by row_validator
+    rpc_payload = {
+        "p_type": data['type'],
+        "p_category": none_if_empty(data.get('category'), 'Miscellaneous'), 
+        "p_brand": none_if_empty(data.get('brand')) if is_medicine else None,
+        "p_generic_name": data['generic_name_raw'] if is_medicine else None, 
+        "p_strength": none_if_empty(data.get('strength'), 'N/A') if is_medicine else None,
+        "p_manufacturer_name": data['manufacturer_name_raw'], 
+        "p_name": None if is_medicine else none_if_empty(data.get('name')),
+        "p_primary_unit": none_if_empty(data.get('primary_unit', 'piece')),
+        "p_secondary_unit": none_if_empty(data.get('secondary_unit')),
+        "p_conversion_rate": data.get('conversion_rate', 1),
+        "p_item_code": none_if_empty(data.get('item_code'), ''),
+        "p_medex_url": none_if_empty(data.get('medex_url'))
+    }
+    rpc_payload, problems = validate_rpc_payload(rpc_payload)
+    canonicalize_payload(rpc_payload)
+    return data, rpc_payload, problems
+
+def row_identifier(row):
+    return row.get('brand') or row.get('name') or "Unknown"
+
+async def process_single_row(supabase, prepared, semaphore, dead_letter=None, source="bulk_uploader", optimistic=False):
+    """
+    Existence check, then the insert RPC. With `optimistic` the check is skipped and
+    the RPC's INSERTED / DUPLICATE code decides (migrations/003): one round-trip per row.
+    """
     async with semaphore:
+        data, rpc_payload, _ = prepared
         try:
-            data = sanitize_row(row)
-            
-            is_medicine = data['type'] == 'MEDICINE'
-            
-            # Helper to return None instead of an empty string
-            def none_if_empty(val, default_val=None):
-                if val is None: return default_val
-                if isinstance(val, str) and str(val).strip() == '': return default_val
-                return val
-            
-            data['generic_name_raw'] = none_if_empty(row.get('generic_name'))
-            data['manufacturer_name_raw'] = none_if_empty(row.get('manufacturer'))
-
             # 2. Check existence
-            debug_log(f"Checking existence in global inventory")
-            if data['type'] == 'MEDICINE':
+            logger.debug("Checking existence in global inventory")
+            if optimistic:
+                res = None
+            elif data['type'] == 'MEDICINE':
                 res = await supabase.table(config.SUPABASE_TABLE).select("id").match({
                     "brand": data['brand'],
                     "strength": data['strength'],
@@ -139,66 +186,32 @@ async def process_single_row(supabase, row, semaphore):
                     "category": data['category']
                 }).execute()
                 
-            debug_log(f"Existence check returned: {res.data}")
-            if res.data:
+            if res is not None:
+                logger.debug("Existence check returned: %s", res.data)
+            if res is not None and res.data:
                 identifier = data['brand'] if data['type'] == 'MEDICINE' else data['name']
                 return 'SKIPPED', identifier
                 
             # 3. Insert via SECURITY DEFINER RPC to bypass table permissions
-            debug_log(f"Inserting into global inventory via RPC")
+            logger.debug("Inserting into global inventory via RPC")
             
-            # The RPC has two signatures. The newest uses category_id UUIDs exclusively.
-            # To avoid UUID lookups entirely for the primary script, we use the older signature:
-            # function global_inventory_add_data_from_python(p_category text, p_name text, p_brand text, p_generic_name text, p_strength text, p_base_unit text, p_manufacturer text, p_item_code text, p_unit_per_strip smallint DEFAULT 1)
-            
-            # Since the user specifically disabled RLS and expects direct inserts, and the 2nd signature supports only limited args
-            # We will use the second overloaded RPC which natively handles generics and manufacturers for us and bypasses Grants!
-            
-            # Strictly obey `inventory_global_data_integrity` Postgres CHECK constraints:
-            # MEDICINE: brand NOT NULL, generic_id NOT NULL, strength NOT NULL, name IS NULL
-            # OTHER: name NOT NULL, brand IS NULL, generic_id IS NULL, strength IS NULL
-            
-            rpc_payload = {
-                "p_type": data['type'],
-                "p_category": none_if_empty(data.get('category'), 'Miscellaneous'), 
-                "p_brand": none_if_empty(data.get('brand')) if is_medicine else None,
-                "p_generic_name": data['generic_name_raw'] if is_medicine else None, 
-                "p_strength": none_if_empty(data.get('strength'), 'N/A') if is_medicine else None,
-                "p_manufacturer_name": data['manufacturer_name_raw'], 
-                "p_name": None if is_medicine else none_if_empty(data.get('name')),
-                "p_primary_unit": none_if_empty(data.get('primary_unit', 'piece')),
-                "p_secondary_unit": none_if_empty(data.get('secondary_unit')),
-                "p_conversion_rate": data.get('conversion_rate', 1),
-                "p_item_code": none_if_empty(data.get('item_code'), ''),
-                "p_medex_url": none_if_empty(data.get('medex_url'))
-            }
-            
-            # Temporary Debug Print
-            if is_medicine:
-                debug_log(f"RPC Payload: {rpc_payload}")
+            logger.debug("RPC Payload: %s", rpc_payload)
 
             res = await supabase.rpc("global_inventory_add_data_from_python", rpc_payload).execute()
-            debug_log(f"RPC Insert returned: {res.data}")
+            logger.debug("RPC Insert returned: %s", res.data)
             
-            if res.data and isinstance(res.data, dict) and res.data.get('code') != 'SUCCESS':
-                 raise Exception(res.data.get('message', 'RPC Failed'))
-                 
             identifier = data.get('brand') if data['type'] == 'MEDICINE' else data.get('name')
+            if rpc_outcome(res.data) == 'duplicate':
+                return 'SKIPPED', identifier
             return 'INSERTED', identifier
             
         except Exception as e:
-            debug_log(f"Exception in process_single_row: {e}")
-            identifier = row.get('brand') or row.get('name') or "Unknown"
-            return 'ERROR', f"{identifier} - {str(e)}"
-
-async def async_main():
-    console.print(Panel(Text("Medidesh Supabase Data Uploader", justify="center", style="bold cyan"), expand=False))
-    
-    supabase = await get_supabase_client()
-    if not supabase:
-        console.print("[bold red]Error:[/] Supabase connection failed. Check your config.py credentials.")
-        sys.exit(1)
+            logger.error("Exception in process_single_row: %s", e)
+            if dead_letter is not None:
+                dead_letter.record_failure(rpc_payload, e, source)
+            return 'ERROR', f"{row_identifier(data)} - {str(e)}"
 
+def select_files_interactively():
     # File Selection
     files = glob.glob("data/*.csv")
     if not files:
@@ -231,65 +244,166 @@ async def async_main():
             console.print("[bold red]Invalid selection. Exiting.[/]")
             sys.exit(1)
         
-    if not Confirm.ask("Are you sure you want to continuously upload to Supabase now?"):
-        sys.exit(0)
+    return selected_files
 
-    overall_inserted = 0
-    overall_skipped = 0
-    overall_failed = 0
-    overall_errors = []
-    total_processed_global = 0
+UPLOAD_WORKERS = 15
 
-    console.print("\n[bold cyan]Starting Bulk Upload...[/]")
-    
-    semaphore = asyncio.Semaphore(15)
-    
-    for selected_file in selected_files:
-        console.print(f"\n[bold blue]Processing File:[/] {os.path.basename(selected_file)}")
-        with open(selected_file, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            rows = list(reader)
-            
-        total_rows = len(rows)
-        if total_rows == 0:
-            console.print("[bold yellow]Skipping empty file.[/]")
-            continue
-            
-        total_processed_global += total_rows
-
-        inserted = 0
-        skipped = 0
-        failed = 0
-
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            BarColumn(bar_width=40),
-            "[progress.percentage]{task.percentage:>3.0f}%",
-            TimeElapsedColumn(),
-            console=console
-        ) as progress:
-            task = progress.add_task("[green]Uploading...", total=total_rows)
-            
-            # Create asynchronous tasks for all rows
-            tasks = [process_single_row(supabase, row, semaphore) for row in rows]
-            
-            # Process them as they complete to update the progress bar in real-time
-            for coroutine in asyncio.as_completed(tasks):
-                status, msg = await coroutine
-                
+def read_prepared_file(path, row_range=None):
+    """Reads one CSV and prepares its rows (runs in a thread, off the event loop)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    if row_range:
+        first, last = row_range
+        rows = rows[max(first, 1) - 1:last]
+    return rows, prepare_rows(rows)
+
+async def upload_files(supabase, selected_files, row_range=None, workers=UPLOAD_WORKERS, dead_letter=None,
+                       optimistic=False):
+    """
+    Pipelines all files through one pool of `workers` upload tasks: the next file
+    is read and prepared while the previous one is still uploading, so there is
+    no drain at every file boundary. Rows that would create the same new generic /
+    manufacturer as a request in flight wait for it (key_scheduler.py), so
+    concurrent RPCs do not queue on one dimension row. Failed rows go to
+    `dead_letter` (if given) with their payload. `optimistic` skips the per-row
+    existence check (see process_single_row). Returns one stats dict per non-empty file.
+    """
+    queue = asyncio.Queue()  # Unbounded so parked rows can be re-queued; `slots` bounds the producer
+    slots = asyncio.Semaphore(workers * 4)
+    semaphore = asyncio.Semaphore(workers)
+    scheduler = KeyScheduler(known_keys(get_index()))
+    outstanding = [0]  # Rows handed to the workers and not finished yet (parked ones included)
+    producing = [True]
+    file_stats = []
+
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(bar_width=40),
+        "[progress.percentage]{task.percentage:>3.0f}%",
+        TimeElapsedColumn(),
+        console=console
+    ) as progress:
+        overall = progress.add_task("[bold green]All files", total=0)
+        queued_total = [0]
+
+        def advance(stats, status):
+            stats[status] += 1
+            progress.update(stats['task'], advance=1,
+                            description=f"[cyan]{stats['name']} ({stats['inserted']} Ins, {stats['skipped']} Skip, {stats['failed']} Err)")
+            progress.update(overall, advance=1)
+
+        async def producer():
+            for selected_file in selected_files:
+                name = os.path.basename(selected_file)
+                rows, prepared_rows = await asyncio.to_thread(read_prepared_file, selected_file, row_range)
+                if not rows:
+                    progress.console.print(f"[bold yellow]Skipping empty file:[/] {name}")
+                    continue
+
+                stats = {'name': name, 'total': len(rows), 'inserted': 0, 'skipped': 0, 'failed': 0, 'errors': []}
+                stats['task'] = progress.add_task(f"[cyan]{name}", total=len(rows))
+                file_stats.append(stats)
+                queued_total[0] += len(rows)
+                progress.update(overall, total=queued_total[0])
+
+                # Pre-validate locally so doomed rows never cost a round-trip
+                rejected = 0
+                for row, prepared in zip(rows, prepared_rows):
+                    problems = prepared[2]
+                    if problems:
+                        rejected += 1
+                        stats['errors'].append(f"{name} - {row_identifier(row)} - INVALID: {'; '.join(problems)}")
+                        if dead_letter is not None:
+                            dead_letter.record_failure(prepared[1], f"Rejected locally: {'; '.join(problems)}",
+                                                       f"bulk_uploader:{name}", "validate")
+                        advance(stats, 'failed')
+                    else:
+                        await slots.acquire()
+                        outstanding[0] += 1
+                        queue.put_nowait((stats, prepared))
+                if rejected:
+                    progress.console.print(f"[bold yellow]{name}: rejected {rejected} invalid rows locally (not sent).[/]")
+
+        def stop_if_done():
+            if not producing[0] and outstanding[0] == 0:
+                for _ in range(workers):
+                    queue.put_nowait(None)
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                stats, prepared = item
+                keys = dimension_keys(prepared[1])
+                if not scheduler.claim(keys, item):
+                    continue  # Re-queued when the row creating that name finishes
+                status, msg = await process_single_row(supabase, prepared, semaphore, dead_letter,
+                                                       f"bulk_uploader:{stats['name']}", optimistic)
+                for parked in scheduler.release(keys, ok=status != 'ERROR'):
+                    queue.put_nowait(parked)
                 if status == 'INSERTED':
-                    inserted += 1
-                    overall_inserted += 1
+                    advance(stats, 'inserted')
                 elif status == 'SKIPPED':
-                    skipped += 1
-                    overall_skipped += 1
+                    advance(stats, 'skipped')
                 else:
-                    failed += 1
-                    overall_failed += 1
-                    overall_errors.append(f"{os.path.basename(selected_file)} - {msg}")
-                    
-                progress.update(task, advance=1, description=f"[cyan]({inserted} Ins, {skipped} Skip, {failed} Err)")
+                    stats['errors'].append(f"{stats['name']} - {msg}")
+                    advance(stats, 'failed')
+                slots.release()
+                outstanding[0] -= 1
+                stop_if_done()
+
+        pool = [asyncio.create_task(worker()) for _ in range(workers)]
+        try:
+            await producer()
+            producing[0] = False
+            stop_if_done()
+            await asyncio.gather(*pool)
+        finally:
+            for task in pool:
+                task.cancel()
+
+    if scheduler.deferrals:
+        console.print(f"[dim]{scheduler.deferrals} row(s) waited for a new generic/manufacturer to be created first.[/]")
+    for stats in file_stats:
+        del stats['task']
+    return file_stats
+
+async def async_main(selected_files=None, assume_yes=False, row_range=None, optimistic=False):
+    """
+    Interactive by default. Pass `selected_files` (and assume_yes=True) to run
+    without prompts; `row_range` = (first, last), 1-based inclusive, limits the
+    rows taken from each file. `optimistic` relies on the RPC's DUPLICATE code
+    instead of a SELECT per row (needs migrations/003).
+    """
+    console.print(Panel(Text("Medidesh Supabase Data Uploader", justify="center", style="bold cyan"), expand=False))
+    
+    supabase = await get_supabase_client()
+    if not supabase:
+        console.print("[bold red]Error:[/] Supabase connection failed. Check your config.py credentials.")
+        sys.exit(1)
+
+    if selected_files is None:
+        selected_files = select_files_interactively()
+        
+    if not assume_yes and not Confirm.ask("Are you sure you want to continuously upload to Supabase now?"):
+        sys.exit(0)
+
+    console.print("\n[bold cyan]Starting Bulk Upload...[/]")
+
+    dead_letter = DeadLetter()
+    try:
+        file_stats = await upload_files(supabase, selected_files, row_range, dead_letter=dead_letter,
+                                        optimistic=optimistic)
+    finally:
+        dead_letter.close()
+
+    overall_inserted = sum(s['inserted'] for s in file_stats)
+    overall_skipped = sum(s['skipped'] for s in file_stats)
+    overall_failed = sum(s['failed'] for s in file_stats)
+    overall_errors = [e for s in file_stats for e in s['errors']]
+    total_processed_global = sum(s['total'] for s in file_stats)
 
     # Beautiful Summary
     console.print("\n")
@@ -313,6 +427,17 @@ async def async_main():
         console.print(Panel(warning_text, title="[bold red]⚠️  Permission Denied Detected", border_style="red", padding=(1, 2)))
         console.print("\n")
 
+    if len(file_stats) > 1:
+        per_file = Table(title="Per-File Results", show_header=True, header_style="bold")
+        per_file.add_column("File", style="bold cyan")
+        per_file.add_column("Rows", justify="right")
+        per_file.add_column("Inserted", justify="right", style="green")
+        per_file.add_column("Skipped", justify="right", style="yellow")
+        per_file.add_column("Failed", justify="right", style="red")
+        for s in file_stats:
+            per_file.add_row(s['name'], str(s['total']), str(s['inserted']), str(s['skipped']), str(s['failed']))
+        console.print(per_file)
+
     summary = Table(title="Upload Summary Results", show_header=True, header_style="bold")
     summary.add_column("Metric", style="bold cyan")
     summary.add_column("Value", justify="right")
@@ -329,10 +454,13 @@ async def async_main():
         console.print("\n[bold red]Error Log Extract (First 10):[/]")
         for e in overall_errors[:10]:
             console.print(f" - [red]{e}[/]")
+        console.print(f"\n[bold]All {dead_letter.failures} failed rows were saved to {DEAD_LETTER_FILE}.[/] "
+                      "Retry only those with: [cyan]python cli.py redrive[/]")
 
-def main():
+def main(selected_files=None, assume_yes=False, row_range=None, optimistic=False):
+    setup_logging("debug.log")
     try:
-        asyncio.run(async_main())
+        asyncio.run(async_main(selected_files, assume_yes, row_range, optimistic))
     except KeyboardInterrupt:
         print("\nUpload aborted.")
 
@@ -0,0 +1,239 @@
+"""
+Change-detecting upsert mode.
+
+Both uploaders skip any row that already exists, so corrected units, conversion
+rates or medex URLs from a re-scrape never reach the database. This module keeps
+a local cache of the remote rows (natural key -> id + content hash), refreshed
+incrementally with the exporter, and for each incoming row:
+
+    - unknown key         -> inserted through the normal RPC path
+    - same content hash   -> nothing sent
+    - different hash      -> queued for a batched `upsert(on_conflict=id)`
+
+so a refresh only writes the rows that actually differ.
+"""
+import asyncio
+import csv
+import gzip
+import hashlib
+import json
+import os
+
+import config
+import exporter
+from bulk_uploader import get_supabase_client, prepare_row, process_single_row
+
+CACHE_FILE = "data/remote_hash_cache.json.gz"
+
+# Columns a re-scrape may correct. Identity columns (brand, strength, category,
+# generic, manufacturer) form the key instead.
+MUTABLE_COLUMNS = ("primary_unit", "secondary_unit", "conversion_rate", "item_code", "medex_url")
+
+CACHE_SELECT = (
+    "id,type,category,brand,strength,name,generic_id,manufacturer_id,updated_at,"
+    + ",".join(MUTABLE_COLUMNS)
+    + ",generic:inventory_generics(name),manufacturer:inventory_manufacturers(name)"
+)
+
+
+def _norm(val):
+    return (val or "").strip().lower()
+
+
+def _norm_strength(val):
+    # Same as the normalize_inventory_global trigger: lower(replace(trim(strength), ' ', ''))
+    return (val or "").strip().replace(" ", "").lower()
+
+
+def natural_key(type_, category, brand, strength, name, generic_name, manufacturer_name):
+    if type_ == 'MEDICINE':
+        return "|".join(("M", _norm(brand), _norm_strength(strength), _norm(category),
+                         _norm(generic_name), _norm(manufacturer_name)))
+    return "|".join(("O", _norm(name), _norm(category), _norm(manufacturer_name)))
+
+
+def content_hash(values):
+    """Hash of the mutable columns; `values` maps column -> value."""
+    canon = []
+    for col in MUTABLE_COLUMNS:
+        val = values.get(col)
+        if col == 'conversion_rate':
+            val = int(val or 1)
+        else:
+            # '' and NULL are the same value for the RPC
+            val = str(val).strip() if val is not None else None
+            val = val or None
+        canon.append(val)
+    return hashlib.blake2b(json.dumps(canon).encode(), digest_size=12).hexdigest()
+
+
+def payload_key(payload):
+    return natural_key(
+        payload['p_type'], payload.get('p_category'), payload.get('p_brand'), payload.get('p_strength'),
+        payload.get('p_name'), payload.get('p_generic_name') or 'Unknown Generic',
+        payload.get('p_manufacturer_name') or ('Unknown Manufacturer' if payload['p_type'] == 'MEDICINE' else None),
+    )
+
+
+def payload_values(payload):
+    return {col: payload.get(f"p_{col}") for col in MUTABLE_COLUMNS}
+
+
+class RemoteHashCache:
+    """id -> compact remote row; key index built on load."""
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self.rows = {}
+        self.max_updated_at = None
+        if os.path.exists(path):
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+            self.rows = data.get('rows', {})
+            self.max_updated_at = data.get('max_updated_at')
+        self._rebuild_index()
+
+    def _rebuild_index(self):
+        self.by_key = {entry['key']: row_id for row_id, entry in self.rows.items()}
+
+    def put_remote(self, row):
+        generic = (row.get('generic') or {}).get('name')
+        manufacturer = (row.get('manufacturer') or {}).get('name')
+        key = natural_key(row['type'], row.get('category'), row.get('brand'), row.get('strength'),
+                          row.get('name'), generic, manufacturer)
+        self.rows[row['id']] = {
+            'key': key,
+            'hash': content_hash(row),
+            'ident': {c: row.get(c) for c in ("type", "category", "brand", "strength", "name",
+                                               "generic_id", "manufacturer_id")},
+        }
+        self.by_key[key] = row['id']
+        updated = row.get('updated_at')
+        if updated and (self.max_updated_at is None or updated > self.max_updated_at):
+            self.max_updated_at = updated
+
+    def refresh(self, full=False, workers=4):
+        """Pulls remote rows changed since the last refresh (or everything)."""
+        since = None
+        if not full and self.max_updated_at:
+            since = exporter.incremental_since({'max_updated_at': self.max_updated_at})
+        count = 0
+        for page in exporter.stream_pages(since=since, workers=workers, columns=CACHE_SELECT):
+            for row in page:
+                self.put_remote(row)
+            count += len(page)
+        self._rebuild_index()
+        self.save()
+        return count
+
+    def lookup(self, key):
+        row_id = self.by_key.get(key)
+        return (row_id, self.rows[row_id]) if row_id else (None, None)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+            json.dump({'max_updated_at': self.max_updated_at, 'rows': self.rows}, f)
+        os.replace(tmp, self.path)
+
+
+def classify_rows(rows, cache):
+    """Splits CSV rows into (new_prepared, changed_updates, unchanged_count, invalid)."""
+    new_rows, updates, unchanged, invalid = [], [], 0, []
+    seen_keys = set()
+    for row in rows:
+        prepared = prepare_row(row)
+        _, payload, problems = prepared
+        if problems:
+            invalid.append((row, problems))
+            continue
+        key = payload_key(payload)
+        if key in seen_keys:
+            unchanged += 1  # Same row twice in the input
+            continue
+        seen_keys.add(key)
+
+        row_id, entry = cache.lookup(key)
+        if row_id is None:
+            new_rows.append(prepared)
+            continue
+        values = payload_values(payload)
+        new_hash = content_hash(values)
+        if new_hash == entry['hash']:
+            unchanged += 1
+            continue
+        update = {'id': row_id, **entry['ident'], **values}
+        updates.append((update, key, new_hash))
+    return new_rows, updates, unchanged, invalid
+
+
+async def apply_updates(supabase, cache, updates, batch_size):
+    """Sends changed rows as batched upserts on id; returns (updated, errors)."""
+    updated, errors = 0, []
+    for i in range(0, len(updates), batch_size):
+        batch = updates[i:i + batch_size]
+        try:
+            await supabase.table(config.SUPABASE_TABLE).upsert(
+                [u for u, _, _ in batch], on_conflict="id"
+            ).execute()
+        except Exception as e:
+            errors.append(f"batch {i // batch_size + 1}: {e}")
+            continue
+        for update, key, new_hash in batch:
+            cache.rows[update['id']]['hash'] = new_hash
+        updated += len(batch)
+    return updated, errors
+
+
+async def async_refresh(files, batch_size=200, full_cache=False, dry_run=False, concurrency=15):
+    from rich.console import Console
+    from rich.table import Table
+
+    console = Console()
+    cache = RemoteHashCache()
+    console.print("[cyan]Refreshing remote hash cache...[/]")
+    fetched = cache.refresh(full=full_cache or not cache.rows)
+    console.print(f"[dim]{fetched} remote rows fetched, {len(cache.rows)} cached.[/]")
+
+    rows = []
+    for path in files:
+        with open(path, 'r', encoding='utf-8') as f:
+            rows.extend(csv.DictReader(f))
+
+    new_rows, updates, unchanged, invalid = classify_rows(rows, cache)
+
+    inserted, updated, errors = 0, 0, [f"INVALID: {'; '.join(p)}" for _, p in invalid]
+    if not dry_run:
+        supabase = await get_supabase_client()
+        updated, update_errors = await apply_updates(supabase, cache, updates, batch_size)
+        errors.extend(update_errors)
+
+        semaphore = asyncio.Semaphore(concurrency)
+        # The hash cache already says these rows are new, so no existence SELECT per row
+        results = await asyncio.gather(*(process_single_row(supabase, p, semaphore, optimistic=True)
+                                         for p in new_rows))
+        for status, msg in results:
+            if status == 'INSERTED':
+                inserted += 1
+            elif status == 'ERROR':
+                errors.append(msg)
+        cache.save()
+
+    summary = Table(title="Upsert Summary" + (" (dry run)" if dry_run else ""), show_header=True, header_style="bold")
+    summary.add_column("Metric", style="bold cyan")
+    summary.add_column("Value", justify="right")
+    summary.add_row("Rows Read", str(len(rows)))
+    summary.add_row("Unchanged (not sent)", str(unchanged))
+    summary.add_row("[yellow]Changed[/]", f"[yellow]{len(updates)}[/]")
+    summary.add_row("[green]Updated[/]", f"[green]{updated}[/]")
+    summary.add_row("New", str(len(new_rows)))
+    summary.add_row("[green]Inserted[/]", f"[green]{inserted}[/]")
+    summary.add_row("[red]Errors[/]", f"[red]{len(errors)}[/]")
+    console.print(summary)
+    for e in errors[:10]:
+        console.print(f" - [red]{e}[/]")
+
+
+def main(files, batch_size=200, full_cache=False, dry_run=False):
+    asyncio.run(async_refresh(files, batch_size=batch_size, full_cache=full_cache, dry_run=dry_run))
@@ -0,0 +1,158 @@
+"""
+Single non-interactive entry point for the scraper and uploaders.
+
+    python cli.py scrape --suffix "ACI Limited" --url https://medex.com.bd/companies/... --pages 1-5
+    python cli.py upload data/medex_mapped_inventory_ACI_1_to_5.csv --yes
+    python cli.py upload --all --rows 1-500 --yes
+    python cli.py upload --all --upsert --dry-run
+    python cli.py diag
+    python cli.py export --format parquet
+    python cli.py replay --retransform
+    python cli.py redrive --class timeout,network
+
+Only argparse is imported up front. Each subcommand imports its module (and
+with it rich / supabase / DrissionPage) when it runs, so `--help` and `diag`
+start instantly and everything can run from cron without prompts.
+"""
+import argparse
+import glob
+import sys
+
+
+def parse_range(text):
+    """'3-10' -> (3, 10); '7' -> (7, 7)."""
+    try:
+        if '-' in text:
+            first, last = text.split('-', 1)
+            first, last = int(first), int(last)
+        else:
+            first = last = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected N or N-M, got '{text}'")
+    if first < 1 or last < first:
+        raise argparse.ArgumentTypeError(f"invalid range '{text}'")
+    return first, last
+
+
+def cmd_scrape(args):
+    import main_browser
+    start, end = args.pages if args.pages else (None, None)
+    main_browser.main_loop(
+        suffix=args.suffix, start_page=start, end_page=end,
+        base_url=args.url, interactive=False,
+    )
+
+
+def cmd_upload(args):
+    if args.all:
+        files = sorted(glob.glob("data/*.csv"))
+    else:
+        files = args.files
+    if not files:
+        print("No files selected. Pass CSV paths or --all.", file=sys.stderr)
+        return 2
+
+    if args.upsert:
+        import change_detector
+        change_detector.main(files, batch_size=args.batch_size, full_cache=args.full_cache, dry_run=args.dry_run)
+        return
+
+    import bulk_uploader
+    bulk_uploader.main(selected_files=files, assume_yes=args.yes, row_range=args.rows, optimistic=args.optimistic)
+
+
+def cmd_diag(args):
+    import diag_csv
+    diag_csv.scan_csv_files(args.pattern)
+
+
+def cmd_export(args):
+    import exporter
+    exporter.main(fmt=args.format, full=args.full, workers=args.workers,
+                  page_size=args.page_size, out_path=args.out)
+
+
+def cmd_replay(args):
+    import scrape_journal
+    paths = args.journals or scrape_journal.find_journals()
+    if not paths:
+        print("No journals found (data/*.journal.jsonl).", file=sys.stderr)
+        return 2
+    stats = scrape_journal.replay(paths, retransform=args.retransform, replay_all=args.all,
+                                  csv_path=args.csv, dry_run=args.dry_run)
+    print(", ".join(f"{k}: {v}" for k, v in stats.items()))
+
+
+def cmd_redrive(args):
+    import dead_letter
+    counts = dead_letter.summarize(args.file)
+    if not counts:
+        print(f"No open entries in {args.file}.")
+        return
+    print("Open entries by class: " + ", ".join(f"{k}: {v}" for k, v in sorted(counts.items())))
+    classes = set(args.error_class.split(",")) if args.error_class else None
+    stats = dead_letter.redrive(args.file, batch_size=args.batch_size, error_classes=classes, dry_run=args.dry_run)
+    dead_letter.print_stats(stats, dry_run=args.dry_run)
+    return 1 if stats['failed'] else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Medex scraper & Medidesh uploader.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("scrape", help="Scrape a company's brand listing and upload live")
+    p.add_argument("--url", help="Company brands URL (default: config.BASE_URL)")
+    p.add_argument("--suffix", default="", help="List suffix for the dedup file (default: config.DEFAULT_SUFFIX)")
+    p.add_argument("--pages", type=parse_range, help="Page range, e.g. 1-5 (default: config START_PAGE-END_PAGE)")
+    p.set_defaults(func=cmd_scrape)
+
+    p = sub.add_parser("upload", help="Upload CSV files through the insert RPC")
+    p.add_argument("files", nargs="*", help="CSV files to upload")
+    p.add_argument("--all", action="store_true", help="Upload every data/*.csv")
+    p.add_argument("--rows", type=parse_range, help="Only rows N-M of each file (1-based)")
+    p.add_argument("-y", "--yes", action="store_true", help="Do not ask for confirmation")
+    p.add_argument("--optimistic", action="store_true",
+                   help="Skip the per-row existence check; rely on the RPC's DUPLICATE code (migrations/003)")
+    p.add_argument("--upsert", action="store_true", help="Update existing rows whose content changed (batched)")
+    p.add_argument("--batch-size", type=int, default=200, help="Rows per upsert request (--upsert)")
+    p.add_argument("--full-cache", action="store_true", help="Rebuild the remote hash cache from scratch (--upsert)")
+    p.add_argument("--dry-run", action="store_true", help="Only report what would change (--upsert)")
+    p.set_defaults(func=cmd_upload)
+
+    p = sub.add_parser("diag", help="Scan CSV files for missing generics/manufacturers")
+    p.add_argument("--pattern", default="data/*.csv", help="Glob of files to scan")
+    p.set_defaults(func=cmd_diag)
+
+    p = sub.add_parser("export", help="Stream inventory_global to a local gzip CSV / Parquet file")
+    p.add_argument("--format", choices=("csv", "parquet"), default="csv")
+    p.add_argument("--full", action="store_true", help="Ignore the last export and fetch everything")
+    p.add_argument("--workers", type=int, default=4, help="Parallel id ranges")
+    p.add_argument("--page-size", type=int, default=1000, help="Rows per request")
+    p.add_argument("--out", help="Output path (default: data/exports/...)")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("replay", help="Re-upload / re-transform journaled scrape records without the browser")
+    p.add_argument("journals", nargs="*", help="Journal files (default: data/*.journal.jsonl)")
+    p.add_argument("--retransform", action="store_true", help="Re-run transform_medex_item on the raw fields")
+    p.add_argument("--all", action="store_true", help="Include items already inserted/skipped")
+    p.add_argument("--csv", help="Write the items to this CSV (bulk_uploader format) instead of uploading")
+    p.add_argument("--dry-run", action="store_true", help="Only count what would be replayed")
+    p.set_defaults(func=cmd_replay)
+
+    p = sub.add_parser("redrive", help="Retry only the rows in the dead-letter file")
+    p.add_argument("--file", default="data/dead_letter.jsonl", help="Dead-letter file")
+    p.add_argument("--class", dest="error_class", help="Only these error classes, e.g. timeout,network")
+    p.add_argument("--batch-size", type=int, default=100, help="Rows per bulk RPC call")
+    p.add_argument("--dry-run", action="store_true", help="Only count what would be retried")
+    p.set_defaults(func=cmd_redrive)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
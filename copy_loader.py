@@ -0,0 +1,208 @@
+"""
+Direct Postgres bulk loader for first-time catalogue imports.
+
+Streams sanitized CSV rows with COPY into a temporary staging table and merges
+them into inventory_generics / inventory_manufacturers / inventory_global with
+set-based SQL that follows `global_inventory_add_data_from_python`
+(see fix_rpc.sql): trimmed dimension names, 'Unknown Generic' /
+'Unknown Manufacturer' fallbacks for MEDICINE rows, text_to_unit_enum for units
+and ON CONFLICT DO NOTHING on the unique medicine index.
+
+Needs a direct connection string (config.DATABASE_URL or --dsn) and psycopg 3.
+To try it locally, load the schema dump and fix_rpc.sql into a scratch database:
+
+    psql -d medidesh_local -f "MedideshDb -  Feb 27.sql"
+    psql -d medidesh_local -f fix_rpc.sql
+    python copy_loader.py --dsn postgresql://localhost/medidesh_local data/*.csv
+"""
+import argparse
+import csv
+import glob
+import itertools
+import sys
+import time
+
+from rich.console import Console
+from rich.table import Table
+
+import config
+from batch_transform import prepare_rows
+
+try:
+    import psycopg
+except ImportError:
+    psycopg = None
+
+console = Console()
+
+# Column order matches the RPC parameters (minus the `p_` prefix)
+STAGING_COLUMNS = (
+    "type", "category", "brand", "generic_name", "strength", "manufacturer_name", "name",
+    "primary_unit", "secondary_unit", "conversion_rate", "item_code", "medex_url",
+)
+
+CREATE_STAGING_SQL = """
+CREATE TEMP TABLE inventory_stage (
+    type text NOT NULL,
+    category text,
+    brand text,
+    generic_name text,
+    strength text,
+    manufacturer_name text,
+    name text,
+    primary_unit text,
+    secondary_unit text,
+    conversion_rate integer,
+    item_code text,
+    medex_url text
+) ON COMMIT DROP
+"""
+
+MERGE_GENERICS_SQL = """
+INSERT INTO public.inventory_generics (name)
+SELECT DISTINCT ON (lower(g.name)) g.name
+FROM (
+    SELECT btrim(generic_name) AS name FROM inventory_stage
+    WHERE type = 'MEDICINE' AND NULLIF(btrim(generic_name), '') IS NOT NULL
+    UNION ALL
+    SELECT 'Unknown Generic' FROM inventory_stage
+    WHERE type = 'MEDICINE' AND NULLIF(btrim(generic_name), '') IS NULL
+) g
+ON CONFLICT (lower(btrim(name))) DO NOTHING
+"""
+
+MERGE_MANUFACTURERS_SQL = """
+INSERT INTO public.inventory_manufacturers (name)
+SELECT DISTINCT ON (lower(m.name)) m.name
+FROM (
+    SELECT btrim(manufacturer_name) AS name FROM inventory_stage
+    WHERE NULLIF(btrim(manufacturer_name), '') IS NOT NULL
+    UNION ALL
+    SELECT 'Unknown Manufacturer' FROM inventory_stage
+    WHERE type = 'MEDICINE' AND NULLIF(btrim(manufacturer_name), '') IS NULL
+) m
+ON CONFLICT (lower(btrim(name))) DO NOTHING
+"""
+
+_GLOBAL_SELECT = """
+SELECT
+    CAST(s.type AS public.inventory_type_enum), s.category, s.brand, gen.id, s.strength, man.id, s.name,
+    COALESCE(public.text_to_unit_enum(s.primary_unit), 'piece'::public.unit_enum),
+    public.text_to_unit_enum(s.secondary_unit),
+    COALESCE(s.conversion_rate, 1), COALESCE(s.item_code, ''), s.medex_url, 'AI_L1'
+FROM inventory_stage s
+LEFT JOIN public.inventory_generics gen
+    ON lower(btrim(gen.name)) = lower({generic_key})
+LEFT JOIN public.inventory_manufacturers man
+    ON lower(btrim(man.name)) = lower({manufacturer_key})
+WHERE s.type = '{type}'
+"""
+
+_GLOBAL_INSERT = """
+INSERT INTO public.inventory_global (
+    type, category, brand, generic_id, strength, manufacturer_id, name,
+    primary_unit, secondary_unit, conversion_rate, item_code, medex_url, entry_status
+)
+"""
+
+MERGE_MEDICINE_SQL = _GLOBAL_INSERT + _GLOBAL_SELECT.format(
+    type="MEDICINE",
+    generic_key="COALESCE(NULLIF(btrim(s.generic_name), ''), 'Unknown Generic')",
+    manufacturer_key="COALESCE(NULLIF(btrim(s.manufacturer_name), ''), 'Unknown Manufacturer')",
+) + """
+ON CONFLICT (lower(btrim(brand)), generic_id, lower(btrim(COALESCE(strength, ''::text))), manufacturer_id, lower(btrim(category))) WHERE (type = 'MEDICINE'::public.inventory_type_enum) DO NOTHING
+"""
+
+MERGE_OTHER_SQL = _GLOBAL_INSERT + _GLOBAL_SELECT.format(
+    type="OTHER",
+    generic_key="NULL",
+    manufacturer_key="NULLIF(btrim(s.manufacturer_name), '')",
+)
+
+
+def iter_staging_rows(files, stats, chunk_size=5000):
+    """Yields validated staging tuples from the CSV files, prepared `chunk_size` rows at a time."""
+    for path in files:
+        with open(path, 'r', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            while True:
+                chunk = list(itertools.islice(reader, chunk_size))
+                if not chunk:
+                    break
+                stats['read'] += len(chunk)
+                for _, payload, problems in prepare_rows(chunk):
+                    if problems:
+                        stats['rejected'] += 1
+                        continue
+                    yield tuple(payload[f"p_{col}"] for col in STAGING_COLUMNS)
+
+
+def copy_load(dsn, files):
+    """
+    Loads the given CSV files in a single transaction.
+    Returns a stats dict (read, rejected, staged, generics, manufacturers, inserted).
+    """
+    if psycopg is None:
+        raise RuntimeError("psycopg is not installed. Run: pip install 'psycopg[binary]'")
+
+    stats = {'read': 0, 'rejected': 0, 'staged': 0, 'generics': 0, 'manufacturers': 0, 'inserted': 0}
+    copy_sql = f"COPY inventory_stage ({', '.join(STAGING_COLUMNS)}) FROM STDIN"
+
+    with psycopg.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(CREATE_STAGING_SQL)
+            with cur.copy(copy_sql) as copy:
+                for record in iter_staging_rows(files, stats):
+                    copy.write_row(record)
+                    stats['staged'] += 1
+
+            cur.execute("ANALYZE inventory_stage")
+            cur.execute(MERGE_GENERICS_SQL)
+            stats['generics'] = cur.rowcount
+            cur.execute(MERGE_MANUFACTURERS_SQL)
+            stats['manufacturers'] = cur.rowcount
+            cur.execute(MERGE_MEDICINE_SQL)
+            stats['inserted'] = cur.rowcount
+            cur.execute(MERGE_OTHER_SQL)
+            stats['inserted'] += cur.rowcount
+        # Leaving the connection block commits; the staging table drops with it
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="COPY-based bulk load of CSV files into inventory_global.")
+    parser.add_argument("files", nargs="*", help="CSV files to load (default: data/*.csv)")
+    parser.add_argument("--dsn", default=getattr(config, "DATABASE_URL", ""), help="Postgres connection string")
+    args = parser.parse_args()
+
+    if not args.dsn:
+        console.print("[bold red]Error:[/] No connection string. Set DATABASE_URL in config.py or pass --dsn.")
+        sys.exit(1)
+
+    files = sorted(args.files or glob.glob("data/*.csv"))
+    if not files:
+        console.print("[bold yellow]No CSV files found.[/]")
+        sys.exit(0)
+
+    start = time.time()
+    stats = copy_load(args.dsn, files)
+    duration = time.time() - start
+
+    summary = Table(title="COPY Load Summary", show_header=True, header_style="bold")
+    summary.add_column("Metric", style="bold cyan")
+    summary.add_column("Value", justify="right")
+    summary.add_row("Files", str(len(files)))
+    summary.add_row("Rows Read", str(stats['read']))
+    summary.add_row("[red]Rejected Locally[/]", f"[red]{stats['rejected']}[/]")
+    summary.add_row("Rows Staged", str(stats['staged']))
+    summary.add_row("New Generics", str(stats['generics']))
+    summary.add_row("New Manufacturers", str(stats['manufacturers']))
+    summary.add_row("[green]Inserted[/]", f"[green]{stats['inserted']}[/]")
+    summary.add_row("[yellow]Duplicates Skipped[/]", f"[yellow]{stats['staged'] - stats['inserted']}[/]")
+    summary.add_row("Duration", f"{duration:.2f}s")
+    console.print(summary)
+
+
+if __name__ == "__main__":
+    main()
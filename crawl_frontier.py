@@ -0,0 +1,174 @@
+"""
+Persistent crawl frontier (SQLite) for the live scraper.
+
+List pages are harvested once into an ordered queue of detail URLs; each URL
+carries its state so a restarted session resumes exactly where it stopped
+without re-reading list pages. FAILED URLs are handed out again until they have
+failed config.MAX_ATTEMPTS times; after that they are reported as exhausted.
+"""
+import re
+import sqlite3
+import time
+
+import config
+
+PENDING = 'PENDING'
+HARVESTED = 'HARVESTED'
+DONE = 'DONE'
+FAILED = 'FAILED'
+QUEUED = 'QUEUED'  # Handed to the scheduler's uploader, DONE once it acknowledges the upload
+
+BRAND_ID_RE = re.compile(r"/brands/(\d+)")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS list_pages (
+    page INTEGER PRIMARY KEY,
+    state TEXT NOT NULL DEFAULT 'PENDING',
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    page INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'PENDING',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_urls_state ON urls (state, page, position);
+"""
+
+
+def brand_id_from_url(url):
+    """Medex brand ID of a detail URL (https://medex.com.bd/brands/31999/...), or None."""
+    match = BRAND_ID_RE.search(url or "")
+    return int(match.group(1)) if match else None
+
+
+def frontier_path_for(dedup_filename):
+    """data/scraped_urls_X_1_to_5.txt -> data/scraped_urls_X_1_to_5.frontier.db"""
+    base = dedup_filename[:-4] if dedup_filename.endswith('.txt') else dedup_filename
+    return f"{base}.frontier.db"
+
+
+class CrawlFrontier:
+    def __init__(self, path, max_attempts=None):
+        self.path = path
+        self.max_attempts = max_attempts or config.MAX_ATTEMPTS
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(list_pages)")}
+        if "attempts" not in columns:  # Frontier created before list pages were retried
+            self.conn.execute("ALTER TABLE list_pages ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        self.conn.commit()
+
+    def close(self):
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+    # --- Meta ---
+    def get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    @property
+    def total_pages(self):
+        val = self.get_meta('total_pages')
+        return int(val) if val else None
+
+    # --- List pages ---
+    def plan_pages(self, start_page, end_page):
+        """Registers the page range once; pages already known keep their state."""
+        total = self.total_pages
+        if total:
+            end_page = min(end_page, total)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO list_pages (page) VALUES (?)",
+                [(p,) for p in range(start_page, end_page + 1)]
+            )
+
+    def set_total_pages(self, total):
+        """Stores the discovered page count and drops planned pages beyond it."""
+        self.set_meta('total_pages', total)
+        with self.conn:
+            self.conn.execute("DELETE FROM list_pages WHERE page > ? AND state = ?", (total, PENDING))
+
+    def pending_pages(self):
+        rows = self.conn.execute("SELECT page FROM list_pages WHERE state = ? ORDER BY page", (PENDING,))
+        return [r[0] for r in rows]
+
+    def list_page_empty(self, page):
+        """
+        Records a list page that gave no links (half-loaded or a missed soft block).
+        It stays PENDING until it failed max_attempts times, then becomes FAILED.
+        Returns True if it will be retried.
+        """
+        with self.conn:
+            self.conn.execute("UPDATE list_pages SET attempts = attempts + 1 WHERE page = ?", (page,))
+            self.conn.execute("UPDATE list_pages SET state = ? WHERE page = ? AND attempts >= ?",
+                              (FAILED, page, self.max_attempts))
+        row = self.conn.execute("SELECT state FROM list_pages WHERE page = ?", (page,)).fetchone()
+        return bool(row) and row[0] == PENDING
+
+    def add_urls(self, page, urls):
+        """Queues a page's detail URLs in page order and marks the page harvested, atomically."""
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO urls (url, page, position, updated_at) VALUES (?, ?, ?, ?)",
+                [(url, page, pos, now) for pos, url in enumerate(urls)]
+            )
+            self.conn.execute("UPDATE list_pages SET state = ? WHERE page = ?", (HARVESTED, page))
+
+    # --- Detail URLs ---
+    def pending_urls(self):
+        """Returns [(url, page)] still to fetch (incl. FAILED ones with attempts left), in list order."""
+        rows = self.conn.execute(
+            "SELECT url, page FROM urls WHERE state = ? OR (state = ? AND attempts < ?) ORDER BY page, position",
+            (PENDING, FAILED, self.max_attempts)
+        )
+        return rows.fetchall()
+
+    def can_retry(self, url):
+        row = self.conn.execute("SELECT state, attempts FROM urls WHERE url = ?", (url,)).fetchone()
+        return bool(row) and row[0] == FAILED and row[1] < self.max_attempts
+
+    def exhausted_urls(self):
+        """[(url, attempts)] that failed max_attempts times and are no longer retried."""
+        rows = self.conn.execute(
+            "SELECT url, attempts FROM urls WHERE state = ? AND attempts >= ? ORDER BY page, position",
+            (FAILED, self.max_attempts)
+        )
+        return rows.fetchall()
+
+    def mark(self, url, state):
+        """Sets a URL's state; `attempts` counts its failures."""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE urls SET state = ?, attempts = attempts + ?, updated_at = ? WHERE url = ?",
+                (state, 1 if state == FAILED else 0, time.time(), url)
+            )
+
+    def requeue_unacked(self):
+        """QUEUED -> PENDING for items whose upload was never acknowledged (the run died). Returns the count."""
+        with self.conn:
+            return self.conn.execute("UPDATE urls SET state = ? WHERE state = ?", (PENDING, QUEUED)).rowcount
+
+    def counts(self):
+        counts = {PENDING: 0, DONE: 0, FAILED: 0, QUEUED: 0}
+        for state, n in self.conn.execute("SELECT state, COUNT(*) FROM urls GROUP BY state"):
+            counts[state] = n
+        counts['pages_pending'] = len(self.pending_pages())
+        return counts
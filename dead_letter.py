@@ -0,0 +1,252 @@
+"""
+Dead-letter store for rows that failed to upload (or to scrape), and a re-drive.
+
+Every failure is appended as one JSON line to data/dead_letter.jsonl with the full
+RPC payload, where it came from and a coarse error class:
+
+    {"t": ..., "key": "M|napa|500mg|tablet|paracetamol|beximco", "source": "bulk_uploader:file.csv", "stage": "upload",
+     "error_class": "timeout", "error_type": "ReadTimeout", "error": "...", "payload": {...}, "url": ...}
+
+A later {"key": ..., "resolved": "inserted"} line closes the entry, so the file is
+append-only (safe to write from the scheduler's worker processes) and the open
+entries are the keys whose last line is a failure.
+
+`redrive` retries only the open entries: payloads are re-validated, sent in
+batches through global_inventory_add_data_bulk (migrations/002) and, when a batch
+fails or that function is missing, row by row to isolate the bad ones.
+Entries without a payload (page could not be extracted or transformed) are
+closed once a later scrape of the page uploads (per the scrape journals);
+otherwise they need a re-scrape or `cli.py replay --retransform`.
+
+    python cli.py redrive --dry-run
+    python cli.py redrive --class timeout,network --batch-size 200
+"""
+import json
+import os
+import threading
+import time
+
+DEAD_LETTER_FILE = "data/dead_letter.jsonl"
+
+# Stages whose failures are classed by the stage itself
+STAGE_CLASSES = ("validate", "extract", "transform")
+
+# Upload errors: (error_class, substrings of the lower-cased error text), first match wins
+ERROR_CLASSES = (
+    ("permission", ("42501", "permission denied", "jwt")),
+    ("rate_limit", ("429", "too many requests", "rate limit")),
+    ("timeout", ("timeout", "timed out")),
+    ("network", ("connection", "connect", "network", "remoteprotocol", "ssl", "eof occurred", "name resolution")),
+    ("duplicate", ("duplicate key", "unique constraint")),
+    ("rpc", ("internal_error", "rpc failed", "violates", "invalid input", "null value")),
+)
+
+
+def classify(error):
+    text = str(error).lower()
+    if not isinstance(error, str):
+        text = f"{type(error).__name__} {text}".lower()
+    for name, needles in ERROR_CLASSES:
+        if any(n in text for n in needles):
+            return name
+    return "other"
+
+
+def entry_key(payload, url=None):
+    """Identity of a failed row: the RPC's conflict key (generic included), else the page URL."""
+    if not payload:
+        return f"U|{url}"
+    fold = lambda v: (v or "").strip().lower()
+    if payload.get('p_type') == 'MEDICINE':
+        return "|".join(("M", fold(payload.get('p_brand')), fold(payload.get('p_strength')).replace(" ", ""),
+                         fold(payload.get('p_category')), fold(payload.get('p_generic_name')),
+                         fold(payload.get('p_manufacturer_name'))))
+    return "|".join(("O", fold(payload.get('p_name')), fold(payload.get('p_category')),
+                     fold(payload.get('p_manufacturer_name'))))
+
+
+class DeadLetter:
+    """Appends failures / resolutions; each line is written and flushed in one call."""
+
+    def __init__(self, path=DEAD_LETTER_FILE):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._f = open(path, 'a', encoding='utf-8')
+        self.failures = 0
+
+    def _append(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self._f.write(line)
+            self._f.flush()
+
+    def record_failure(self, payload, error, source, stage="upload", url=None, key=None):
+        self.failures += 1
+        self._append({
+            "t": time.time(), "key": key or entry_key(payload, url), "source": source, "stage": stage,
+            "error_class": stage if stage in STAGE_CLASSES else classify(error),
+            "error_type": None if isinstance(error, str) else type(error).__name__,
+            "error": str(error), "payload": payload, "url": url or (payload or {}).get('p_medex_url'),
+        })
+
+    def record_resolved(self, key, outcome):
+        self._append({"t": time.time(), "key": key, "resolved": outcome})
+
+    def close(self):
+        with self._lock:
+            if not self._f.closed:
+                self._f.flush()
+                os.fsync(self._f.fileno())
+                self._f.close()
+
+
+def open_entries(path=DEAD_LETTER_FILE):
+    """key -> last failure record (plus 'attempts') for every unresolved key, in first-failure order."""
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Torn last line
+            key = rec.get('key')
+            if 'resolved' in rec:
+                entries.pop(key, None)
+            else:
+                attempts = entries[key]['attempts'] + 1 if key in entries else 1
+                if key in entries and not rec.get('payload'):
+                    rec['payload'] = entries[key].get('payload')  # Keep the best payload we have
+                entries[key] = {**rec, 'attempts': attempts}
+    return entries
+
+
+def settled_urls():
+    """URLs whose last journaled upload succeeded (see scrape_journal.py)."""
+    from scrape_journal import SETTLED, find_journals, latest_by_url
+
+    return {url for url, (_, outcome, _) in latest_by_url(find_journals()).items() if outcome in SETTLED}
+
+
+def _send_one(supabase, payload):
+    from row_validator import rpc_outcome
+
+    res = supabase.rpc("global_inventory_add_data_from_python", payload).execute()
+    return rpc_outcome(res.data)
+
+
+def redrive(path=DEAD_LETTER_FILE, batch_size=100, error_classes=None, dry_run=False):
+    """Retries the open entries (optionally only some error classes). Returns a stats dict."""
+    from rich.console import Console
+    from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, MofNCompleteColumn
+    from row_validator import validate_rpc_payload
+    from name_index import canonicalize_payload
+
+    console = Console()
+    entries = open_entries(path)
+    stats = {'open': len(entries), 'selected': 0, 'no_payload': 0, 'invalid': 0,
+             'resolved': 0, 'failed': 0, 'batches': 0}
+
+    todo, rescraped = [], []
+    uploaded = None
+    for key, rec in entries.items():
+        if error_classes and rec.get('error_class') not in error_classes:
+            continue
+        if not rec.get('payload'):
+            if uploaded is None:
+                uploaded = settled_urls()
+            if rec.get('url') in uploaded:
+                rescraped.append(key)  # A later scrape of the page went through
+            else:
+                stats['no_payload'] += 1
+            continue
+        todo.append((key, rec))
+    stats['selected'] = len(todo)
+    stats['rescraped'] = len(rescraped)
+    if dry_run:
+        return stats
+    if rescraped:
+        dead = DeadLetter(path)
+        for key in rescraped:
+            dead.record_resolved(key, 'rescraped')
+        dead.close()
+    if not todo:
+        return stats
+
+    from exporter import make_client
+
+    supabase = make_client()
+    dead = DeadLetter(path)
+    bulk_available = True
+    try:
+        with Progress(SpinnerColumn(), TextColumn("{task.description}"), BarColumn(), MofNCompleteColumn(), console=console) as progress:
+            task = progress.add_task("[cyan]Re-driving...", total=len(todo))
+            for i in range(0, len(todo), batch_size):
+                ready = []
+                for key, rec in todo[i:i + batch_size]:
+                    payload, problems = validate_rpc_payload(dict(rec['payload']))
+                    if problems:
+                        stats['invalid'] += 1
+                        dead.record_failure(payload, f"Rejected locally: {'; '.join(problems)}", "redrive", "validate", key=key)
+                        progress.advance(task)
+                        continue
+                    canonicalize_payload(payload)
+                    ready.append((key, payload))
+
+                if bulk_available and len(ready) > 1:
+                    stats['batches'] += 1
+                    try:
+                        res = supabase.rpc("global_inventory_add_data_bulk", {"p_rows": [p for _, p in ready]}).execute()
+                        if isinstance(res.data, dict) and res.data.get('code') != 'SUCCESS':
+                            raise Exception(res.data.get('message', 'Bulk RPC Failed'))
+                        for key, _ in ready:
+                            dead.record_resolved(key, 'redriven')
+                        stats['resolved'] += len(ready)
+                        progress.advance(task, len(ready))
+                        continue
+                    except Exception as e:
+                        if "global_inventory_add_data_bulk" in str(e) or "PGRST202" in str(e):
+                            bulk_available = False  # Migration 002 not applied; row by row from now on
+                            console.print("[yellow]Bulk RPC not available, retrying row by row.[/]")
+
+                # Row by row: isolates the rows that still fail
+                for key, payload in ready:
+                    try:
+                        dead.record_resolved(key, _send_one(supabase, payload))
+                        stats['resolved'] += 1
+                    except Exception as e:
+                        stats['failed'] += 1
+                        dead.record_failure(payload, e, "redrive", "upload", key=key)
+                    progress.advance(task)
+    finally:
+        dead.close()
+    return stats
+
+
+def print_stats(stats, dry_run=False):
+    from rich.console import Console
+    from rich.table import Table
+
+    summary = Table(title="Dead-Letter Re-drive" + (" (dry run)" if dry_run else ""), show_header=True, header_style="bold")
+    summary.add_column("Metric", style="bold cyan")
+    summary.add_column("Value", justify="right")
+    summary.add_row("Open entries", str(stats['open']))
+    summary.add_row("Selected for retry", str(stats['selected']))
+    summary.add_row("Without payload (re-scrape / replay)", str(stats['no_payload']))
+    summary.add_row("Closed by a later scrape", str(stats.get('rescraped', 0)))
+    if not dry_run:
+        summary.add_row("Bulk batches sent", str(stats['batches']))
+        summary.add_row("[green]Resolved[/]", f"[green]{stats['resolved']}[/]")
+        summary.add_row("[yellow]Still invalid[/]", f"[yellow]{stats['invalid']}[/]")
+        summary.add_row("[red]Failed again[/]", f"[red]{stats['failed']}[/]")
+    Console().print(summary)
+
+
+def summarize(path=DEAD_LETTER_FILE):
+    """{error_class: open entry count}"""
+    counts = {}
+    for rec in open_entries(path).values():
+        counts[rec.get('error_class', 'other')] = counts.get(rec.get('error_class', 'other'), 0) + 1
+    return counts
@@ -2,8 +2,8 @@ import csv
 import glob
 from collections import defaultdict
 
-def scan_csv_files():
-    all_files = glob.glob("data/*.csv")
+def scan_csv_files(pattern="data/*.csv"):
+    all_files = glob.glob(pattern)
     total_rows = 0
     missing_generic = 0
     missing_manufacturer = 0
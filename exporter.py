@@ -0,0 +1,238 @@
+"""
+Streaming export of inventory_global (with generic and manufacturer names) to local files.
+
+- Keyset pagination on `id` (`id > last_id ORDER BY id LIMIT n`), never OFFSET.
+- The UUID key space is split into ranges that are fetched in parallel, each
+  range by its own thread and client.
+- Pages flow through a bounded queue to a single writer, so memory stays
+  constant however large the table is.
+- Output: gzip CSV (default) or Parquet (needs pyarrow).
+- Incremental: the newest `updated_at` seen is kept in data/exports/export_state.json;
+  the next export without --full only fetches rows changed since then (with a
+  small overlap, so consumers should dedupe by id).
+"""
+import csv
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+import config
+
+EXPORT_DIR = "data/exports"
+STATE_FILE = os.path.join(EXPORT_DIR, "export_state.json")
+
+# Re-fetch window for incremental exports (rows committed while the last export ran)
+INCREMENTAL_OVERLAP = timedelta(minutes=10)
+
+SELECT_COLUMNS = (
+    "id,type,category,brand,strength,name,primary_unit,secondary_unit,conversion_rate,"
+    "item_code,medex_url,entry_status,generic_id,manufacturer_id,created_at,updated_at,"
+    "generic:inventory_generics(name),manufacturer:inventory_manufacturers(name)"
+)
+
+EXPORT_COLUMNS = (
+    "id", "type", "category", "brand", "strength", "name", "generic_name", "manufacturer_name",
+    "primary_unit", "secondary_unit", "conversion_rate", "item_code", "medex_url", "entry_status",
+    "generic_id", "manufacturer_id", "created_at", "updated_at",
+)
+
+_DONE = object()
+
+
+def uuid_partitions(count):
+    """Splits the UUID space into `count` contiguous [low, high) ranges (high None = open end)."""
+    count = max(1, min(count, 256))
+    bounds = [f"{(256 * i) // count:02x}000000-0000-0000-0000-000000000000" for i in range(count)]
+    return [(bounds[i], bounds[i + 1] if i + 1 < count else None) for i in range(count)]
+
+
+def flatten(row):
+    generic = row.pop('generic', None) or {}
+    manufacturer = row.pop('manufacturer', None) or {}
+    row['generic_name'] = generic.get('name')
+    row['manufacturer_name'] = manufacturer.get('name')
+    return row
+
+
+def make_client():
+    from supabase import create_client, ClientOptions
+    options = ClientOptions(postgrest_client_timeout=60)
+    return create_client(config.SUPABASE_URL, config.SUPABASE_KEY, options=options)
+
+
+def fetch_partition(low, high, since, page_size, out_queue, errors, columns=SELECT_COLUMNS):
+    """Keyset-paginates one id range and pushes each page (a list of rows) to out_queue."""
+    try:
+        supabase = make_client()
+        last_id = None
+        while True:
+            q = supabase.table(config.SUPABASE_TABLE).select(columns)
+            q = q.gt("id", last_id) if last_id else q.gte("id", low)
+            if high:
+                q = q.lt("id", high)
+            if since:
+                q = q.gt("updated_at", since)
+            rows = q.order("id").limit(page_size).execute().data or []
+            if not rows:
+                break
+            out_queue.put(rows)
+            if len(rows) < page_size:
+                break
+            last_id = rows[-1]['id']
+    except Exception as e:
+        errors.append(f"{low}..{high}: {e}")
+    finally:
+        out_queue.put(_DONE)
+
+
+def stream_pages(since=None, workers=4, page_size=1000, columns=SELECT_COLUMNS):
+    """
+    Yields pages of rows from all partitions as they arrive (unordered between partitions).
+    Raises RuntimeError at the end if any partition failed.
+    """
+    partitions = uuid_partitions(workers)
+    pages = queue.Queue(maxsize=len(partitions) * 2)
+    errors = []
+    threads = [
+        threading.Thread(target=fetch_partition, args=(lo, hi, since, page_size, pages, errors, columns), daemon=True)
+        for lo, hi in partitions
+    ]
+    for t in threads:
+        t.start()
+
+    finished = 0
+    while finished < len(threads):
+        item = pages.get()
+        if item is _DONE:
+            finished += 1
+            continue
+        yield item
+
+    for t in threads:
+        t.join()
+    if errors:
+        raise RuntimeError("Export incomplete: " + "; ".join(errors))
+
+
+class CsvGzWriter:
+    def __init__(self, path):
+        self.f = gzip.open(path, 'wt', encoding='utf-8', newline='')
+        self.writer = csv.DictWriter(self.f, fieldnames=EXPORT_COLUMNS, extrasaction='ignore')
+        self.writer.writeheader()
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.f.close()
+
+
+class ParquetWriter:
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow. Run: pip install pyarrow")
+        self.pa = pa
+        fields = [pa.field(c, pa.int32() if c == 'conversion_rate' else pa.string()) for c in EXPORT_COLUMNS]
+        self.schema = pa.schema(fields)
+        self.writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+
+    def write_rows(self, rows):
+        cols = {c: [r.get(c) for r in rows] for c in EXPORT_COLUMNS}
+        self.writer.write_table(self.pa.Table.from_pydict(cols, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def load_state():
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(state):
+    with open(STATE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+
+
+def incremental_since(state):
+    last = state.get('max_updated_at')
+    if not last:
+        return None
+    try:
+        return (datetime.fromisoformat(last) - INCREMENTAL_OVERLAP).isoformat()
+    except ValueError:
+        return last
+
+
+def export_inventory(fmt="csv", full=False, workers=4, page_size=1000, out_path=None, on_page=None):
+    """
+    Writes an export file and returns (path, row_count, since).
+    `on_page(n)` is called with the size of every page written (for progress display).
+    """
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    state = load_state()
+    since = None if full else incremental_since(state)
+
+    stamp = time.strftime('%Y%m%d_%H%M%S')
+    kind = "delta" if since else "full"
+    ext = "parquet" if fmt == "parquet" else "csv.gz"
+    path = out_path or os.path.join(EXPORT_DIR, f"inventory_global_{kind}_{stamp}.{ext}")
+    tmp_path = f"{path}.part"
+
+    writer = ParquetWriter(tmp_path) if fmt == "parquet" else CsvGzWriter(tmp_path)
+    count = 0
+    max_updated = state.get('max_updated_at') if since else None
+    try:
+        for rows in stream_pages(since=since, workers=workers, page_size=page_size):
+            rows = [flatten(r) for r in rows]
+            writer.write_rows(rows)
+            count += len(rows)
+            page_max = max((r['updated_at'] for r in rows if r.get('updated_at')), default=None)
+            if page_max and (max_updated is None or page_max > max_updated):
+                max_updated = page_max
+            if on_page:
+                on_page(len(rows))
+    except BaseException:
+        writer.close()
+        os.remove(tmp_path)
+        raise
+    writer.close()
+    os.replace(tmp_path, path)
+
+    # Only advance the watermark once the file is complete
+    state.update({'max_updated_at': max_updated, 'last_export': path, 'last_export_rows': count})
+    save_state(state)
+    return path, count, since
+
+
+def main(fmt="csv", full=False, workers=4, page_size=1000, out_path=None):
+    from rich.console import Console
+    from rich.progress import Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
+
+    console = Console()
+    start = time.time()
+    with Progress(SpinnerColumn(), TextColumn("{task.description}"), TimeElapsedColumn(), console=console) as progress:
+        task = progress.add_task("[cyan]Exporting inventory_global...", total=None)
+        rows_done = [0]
+
+        def on_page(n):
+            rows_done[0] += n
+            progress.update(task, description=f"[cyan]Exporting inventory_global... {rows_done[0]} rows")
+
+        path, count, since = export_inventory(fmt, full, workers, page_size, out_path, on_page)
+
+    mode = f"changes since {since}" if since else "full"
+    console.print(f"[bold green]✓ Exported {count} rows ({mode}) to {path} in {time.time() - start:.1f}s[/]")
+
+
+if __name__ == "__main__":
+    main()
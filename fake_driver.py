@@ -0,0 +1,372 @@
+"""
+Offline stand-ins for the browser and Supabase, for benchmarks and dry runs of
+MedexBrowserScraper without Chrome or the live site.
+
+    FakeChromiumPage  serves saved HTML (list and brand pages) through the part of
+                      the DrissionPage API the scraper uses: get / url / ele / eles /
+                      run_js / scroll / set.cookies / wait / quit
+    FakeSupabase      answers the insert RPC like fix_rpc.sql (INSERTED with an id,
+                      DUPLICATE for a known row) with an optional simulated latency
+    build_site()      writes list/brand page fixtures for CSV rows (same markup
+                      the scraper's selectors target); real pages saved from
+                      medex.com.bd can be dropped into the same directory
+
+Both fakes add the time spent inside them to `.elapsed`, so callers can subtract
+it and see what the scraper's own code costs.
+
+    scraper = MedexBrowserScraper(page=FakeChromiumPage(site), supabase=FakeSupabase())
+"""
+import html
+import json
+import os
+import re
+import time
+import uuid
+from html.parser import HTMLParser
+
+FIXTURE_DIR = "data/fixtures"
+BASE_URL = "https://medex.com.bd/companies/0/fixture-pharma/brands"
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+
+# --- Minimal DOM -------------------------------------------------------------
+
+class Node:
+    __slots__ = ("tag", "attrs", "children", "parent", "texts")
+
+    def __init__(self, tag, attrs, parent=None):
+        self.tag = tag
+        self.attrs = attrs
+        self.children = []
+        self.parent = parent
+        self.texts = []
+
+    def iter(self):
+        for child in self.children:
+            yield child
+            yield from child.iter()
+
+    @property
+    def text(self):
+        parts = list(self.texts)
+        for node in self.iter():
+            parts.extend(node.texts)
+        return " ".join(" ".join(parts).split())
+
+    def attr(self, name):
+        return self.attrs.get(name)
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Node("#document", {})
+        self.current = self.root
+
+    def handle_starttag(self, tag, attrs):
+        node = Node(tag, {k: v or "" for k, v in attrs}, self.current)
+        self.current.children.append(node)
+        if tag not in VOID_TAGS:
+            self.current = node
+
+    def handle_endtag(self, tag):
+        node = self.current
+        while node is not self.root and node.tag != tag:
+            node = node.parent
+        if node is not self.root:
+            self.current = node.parent
+
+    def handle_data(self, data):
+        if data.strip():
+            self.current.texts.append(data)
+
+
+def parse_html(text):
+    builder = _TreeBuilder()
+    builder.feed(text)
+    builder.close()
+    return builder.root
+
+
+# --- Selectors (only the forms main_browser uses) ----------------------------
+
+COMPOUND_RE = re.compile(r'^(?P<tag>[\w-]*)(?P<rest>(?:\.[\w-]+|\[[\w-]+(?:[*^]?="[^"]*")?\])*)$')
+PART_RE = re.compile(r'\.([\w-]+)|\[([\w-]+)(?:([*^]?)="([^"]*)")?\]')
+CSS_PART_RE = re.compile(r'(?:[^\s\[]|\[[^\]]*\])+')  # Splits on spaces outside [...]
+XPATH_RE = re.compile(r'//(\w+)\[contains\(@class,\s*"([^"]+)"\)\]')
+
+
+def _compound(text):
+    match = COMPOUND_RE.match(text)
+    if not match:
+        raise ValueError(f"Unsupported selector part: {text}")
+    tag = match.group('tag') or None
+    classes, attrs = [], []
+    for cls, name, op, value in PART_RE.findall(match.group('rest')):
+        if cls:
+            classes.append(cls)
+        else:
+            attrs.append((name, op, value))
+
+    def test(node):
+        if tag and node.tag != tag:
+            return False
+        node_classes = node.attrs.get("class", "").split()
+        if any(c not in node_classes for c in classes):
+            return False
+        for name, op, value in attrs:
+            have = node.attrs.get(name)
+            if have is None:
+                return False
+            if op == "" and value and have != value:
+                return False
+            if op == "*" and value not in have:
+                return False
+            if op == "^" and not have.startswith(value):
+                return False
+        return True
+    return test
+
+
+def compile_selector(selector):
+    """DrissionPage locator ('tag:x', 'css:...', 'xpath://h1[contains(@class,"y")] | ...') -> node predicate list."""
+    if selector.startswith("tag:"):
+        name = selector[4:]
+        return [lambda node: node.tag == name]
+    if selector.startswith("css:"):
+        return [_compound(part) for part in CSS_PART_RE.findall(selector[4:])]
+    if selector.startswith("xpath:"):
+        alternatives = [(tag, cls) for tag, cls in XPATH_RE.findall(selector)]
+        if not alternatives:
+            raise ValueError(f"Unsupported xpath: {selector}")
+        return [lambda node: any(node.tag == t and c in node.attrs.get("class", "") for t, c in alternatives)]
+    raise ValueError(f"Unsupported locator: {selector}")
+
+
+def select(root, predicates):
+    """Nodes matching a descendant chain of predicates, in document order."""
+    nodes = [root]
+    for test in predicates:
+        found, seen = [], set()
+        for base in nodes:
+            for node in base.iter():
+                if id(node) not in seen and test(node):
+                    seen.add(id(node))
+                    found.append(node)
+        nodes = found
+    return nodes
+
+
+# --- Fake page ---------------------------------------------------------------
+
+class _Scroll:
+    def __init__(self, page):
+        self.page = page
+
+    def down(self, pixels=300):
+        self.page.scroll_y += pixels
+
+    def up(self, pixels=300):
+        self.page.scroll_y = max(0, self.page.scroll_y - pixels)
+
+
+class _Cookies:
+    def clear(self):
+        pass
+
+
+class _Set:
+    cookies = _Cookies()
+
+
+class _Wait:
+    def doc_loaded(self, timeout=None):
+        return True
+
+
+class FakeChromiumPage:
+    """Serves `site` ({url: html}); unknown URLs get an empty page. Parsed pages are cached."""
+
+    driver = None  # No CDP events: wait_for_unblock falls back to polling
+
+    def __init__(self, site):
+        self.site = site
+        self.url = "about:blank"
+        self.scroll_y = 0
+        self.scroll = _Scroll(self)
+        self.set = _Set()
+        self.wait = _Wait()
+        self.elapsed = 0.0
+        self.requests = 0
+        self._doc = parse_html("")
+        self._parsed = {}
+        self._selectors = {}
+
+    def get(self, url):
+        t0 = time.perf_counter()
+        self.requests += 1
+        self.url = url
+        self.scroll_y = 0
+        if url not in self._parsed:
+            self._parsed[url] = parse_html(self.site.get(url, "<html><body></body></html>"))
+        self._doc = self._parsed[url]
+        self.elapsed += time.perf_counter() - t0
+        return True
+
+    def _select(self, locator):
+        if locator not in self._selectors:
+            self._selectors[locator] = compile_selector(locator)
+        return select(self._doc, self._selectors[locator])
+
+    def ele(self, locator):
+        t0 = time.perf_counter()
+        found = self._select(locator)
+        self.elapsed += time.perf_counter() - t0
+        return found[0] if found else None
+
+    def eles(self, locator):
+        t0 = time.perf_counter()
+        found = self._select(locator)
+        self.elapsed += time.perf_counter() - t0
+        return found
+
+    def run_js(self, script):
+        """Recognizes the scraper's two list-page scripts by what they query."""
+        t0 = time.perf_counter()
+        try:
+            if "a.hoverable-block" in script:
+                return [a.attr("href") for a in self._select("css:a.hoverable-block")]
+            if "page=" in script:
+                pages = [int(m.group(1)) for a in self._select('css:a[href*="page="]')
+                         for m in [re.search(r"[?&]page=(\d+)", a.attr("href"))] if m]
+                return max(pages, default=0)
+            raise ValueError("Unsupported script in FakeChromiumPage.run_js")
+        finally:
+            self.elapsed += time.perf_counter() - t0
+
+    def quit(self):
+        pass
+
+
+# --- Fake Supabase -----------------------------------------------------------
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Call:
+    def __init__(self, client, fn):
+        self.client = client
+        self.fn = fn
+
+    def execute(self):
+        t0 = time.perf_counter()
+        try:
+            if self.client.latency:
+                time.sleep(self.client.latency)
+            return _Result(self.fn())
+        finally:
+            self.client.elapsed += time.perf_counter() - t0
+
+
+class _Query:
+    """Chainable table query; filters are accepted and ignored, selects return no rows."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        return _Call(self.client, lambda: []).execute()
+
+
+class FakeSupabase:
+    """In-memory stand-in for the sync client; `latency` seconds are slept per request."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.elapsed = 0.0
+        self.calls = 0
+        self.rows = {}
+
+    def rpc(self, name, params):
+        self.calls += 1
+        return _Call(self, lambda: self._add(params))
+
+    def table(self, name):
+        self.calls += 1
+        return _Query(self)
+
+    def _add(self, p):
+        # Same conflict key as the medicine unique index (case/space-insensitive)
+        fold = lambda v: (v or "").strip().lower()
+        key = (fold(p.get('p_type')), fold(p.get('p_brand') or p.get('p_name')),
+               fold(p.get('p_strength')).replace(" ", ""), fold(p.get('p_category')),
+               fold(p.get('p_generic_name')), fold(p.get('p_manufacturer_name')))
+        if key in self.rows:
+            return {'code': 'DUPLICATE', 'id': None}
+        self.rows[key] = str(uuid.uuid4())
+        return {'code': 'INSERTED', 'id': self.rows[key]}
+
+
+# --- Fixtures ----------------------------------------------------------------
+
+def brand_page(row):
+    esc = lambda v: html.escape(v or "")
+    category = row.get('category') or ""
+    return f"""<html><body><div class="container">
+<h1 class="page-heading-1-l brand">{esc(row.get('brand'))} <small class="h1-subtitle">{esc(category)}</small></h1>
+<img class="dosage-icon" src="/img/dosage.png" title="{esc(category)}">
+<div title="Generic Name"><a href="/generics/0/x">{esc(row.get('generic_name'))}</a></div>
+<div title="Strength">{esc(row.get('strength'))}</div>
+<div title="Manufactured by"><a href="/companies/0/x">{esc(row.get('manufacturer'))}</a></div>
+</div></body></html>"""
+
+
+def list_page(links, page, total_pages, base_url=BASE_URL):
+    items = "\n".join(f'<a class="hoverable-block" href="{html.escape(url)}">{n}</a>' for n, url in enumerate(links))
+    pager = " ".join(f'<a href="{base_url}?page={p}">{p}</a>' for p in range(1, total_pages + 1))
+    return f'<html><body><div class="data-row">{items}</div><ul class="pagination">{pager}</ul></body></html>'
+
+
+def build_site(rows, per_page=30, base_url=BASE_URL):
+    """{url: html} with list pages of `per_page` brand links over `rows` (CSV dicts)."""
+    site = {}
+    links = []
+    for n, row in enumerate(rows):
+        url = row.get('medex_url') or f"https://medex.com.bd/brands/{800000 + n}/fixture"
+        if url in site:
+            url = f"https://medex.com.bd/brands/{800000 + n}/fixture"
+        site[url] = brand_page(row)
+        links.append(url)
+    pages = max(1, -(-len(links) // per_page))
+    for page in range(1, pages + 1):
+        url = f"{base_url}?page={page}" if page > 1 else base_url
+        site[url] = list_page(links[(page - 1) * per_page:page * per_page], page, pages, base_url)
+    return site, pages
+
+
+def save_site(site, directory=FIXTURE_DIR):
+    """Writes the pages plus an index.json (url -> file) so fixtures can be edited or replaced."""
+    os.makedirs(directory, exist_ok=True)
+    index = {}
+    for n, (url, text) in enumerate(sorted(site.items())):
+        name = f"{n:05d}.html"
+        with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+            f.write(text)
+        index[url] = name
+    with open(os.path.join(directory, "index.json"), 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2)
+
+
+def load_site(directory=FIXTURE_DIR):
+    with open(os.path.join(directory, "index.json"), 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    site = {}
+    for url, name in index.items():
+        with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+            site[url] = f.read()
+    return site
@@ -1,6 +1,50 @@
 -- Run this exact SQL snippet in your Supabase SQL Editor to fix the broken RPC!
 -- The previous RPC attempted to insert into `category_id`, but your table uses `category text`.
 
+CREATE OR REPLACE FUNCTION public.resolve_inventory_generic(p_name text) RETURNS uuid
+    LANGUAGE plpgsql SECURITY DEFINER
+    SET search_path TO 'public'
+    AS $$
+DECLARE
+    v_id UUID;
+BEGIN
+    SELECT id INTO v_id FROM public.inventory_generics WHERE lower(btrim(name)) = lower(btrim(p_name));
+    IF v_id IS NULL THEN
+        INSERT INTO public.inventory_generics (name)
+        VALUES (TRIM(p_name))
+        ON CONFLICT (lower(btrim(name))) DO NOTHING
+        RETURNING id INTO v_id;
+        IF v_id IS NULL THEN
+            -- Inserted by a concurrent call after our SELECT
+            SELECT id INTO v_id FROM public.inventory_generics WHERE lower(btrim(name)) = lower(btrim(p_name));
+        END IF;
+    END IF;
+    RETURN v_id;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.resolve_inventory_manufacturer(p_name text) RETURNS uuid
+    LANGUAGE plpgsql SECURITY DEFINER
+    SET search_path TO 'public'
+    AS $$
+DECLARE
+    v_id UUID;
+BEGIN
+    SELECT id INTO v_id FROM public.inventory_manufacturers WHERE lower(btrim(name)) = lower(btrim(p_name));
+    IF v_id IS NULL THEN
+        INSERT INTO public.inventory_manufacturers (name)
+        VALUES (TRIM(p_name))
+        ON CONFLICT (lower(btrim(name))) DO NOTHING
+        RETURNING id INTO v_id;
+        IF v_id IS NULL THEN
+            -- Inserted by a concurrent call after our SELECT
+            SELECT id INTO v_id FROM public.inventory_manufacturers WHERE lower(btrim(name)) = lower(btrim(p_name));
+        END IF;
+    END IF;
+    RETURN v_id;
+END;
+$$;
+
 CREATE OR REPLACE FUNCTION public.global_inventory_add_data_from_python(
     p_type text, 
     p_category text, 
@@ -26,33 +70,21 @@ DECLARE
     v_new_id UUID;
 BEGIN
     IF p_generic_name IS NOT NULL AND p_generic_name != '' THEN 
-        INSERT INTO public.inventory_generics (name)
-        VALUES (TRIM(p_generic_name))
-        ON CONFLICT (lower(btrim(name))) DO UPDATE SET name = EXCLUDED.name
-        RETURNING id INTO v_generic_id;
+        v_generic_id := public.resolve_inventory_generic(p_generic_name);
     END IF;
 
     IF p_manufacturer_name IS NOT NULL AND p_manufacturer_name != '' THEN 
-        INSERT INTO public.inventory_manufacturers (name)
-        VALUES (TRIM(p_manufacturer_name))
-        ON CONFLICT (lower(btrim(name))) DO UPDATE SET name = EXCLUDED.name
-        RETURNING id INTO v_manufacturer_id;
+        v_manufacturer_id := public.resolve_inventory_manufacturer(p_manufacturer_name);
     END IF;
     
     -- Fallbacks to satisfy `inventory_global_data_integrity`
     IF p_type = 'MEDICINE' THEN
         IF v_generic_id IS NULL THEN
-            INSERT INTO public.inventory_generics (name)
-            VALUES ('Unknown Generic')
-            ON CONFLICT (lower(btrim(name))) DO UPDATE SET name = EXCLUDED.name
-            RETURNING id INTO v_generic_id;
+            v_generic_id := public.resolve_inventory_generic('Unknown Generic');
         END IF;
         
         IF v_manufacturer_id IS NULL THEN
-            INSERT INTO public.inventory_manufacturers (name)
-            VALUES ('Unknown Manufacturer')
-            ON CONFLICT (lower(btrim(name))) DO UPDATE SET name = EXCLUDED.name
-            RETURNING id INTO v_manufacturer_id;
+            v_manufacturer_id := public.resolve_inventory_manufacturer('Unknown Manufacturer');
         END IF;
     END IF;
     
@@ -71,6 +103,16 @@ BEGIN
         ON CONFLICT (lower(btrim(brand)), generic_id, lower(btrim(COALESCE(strength, ''::text))), manufacturer_id, lower(btrim(category))) WHERE (type = 'MEDICINE'::public.inventory_type_enum) DO NOTHING
         RETURNING id INTO v_new_id;
     ELSE
+        -- No unique index for OTHER rows: same (name, category) check the uploaders used to do
+        IF EXISTS (
+            SELECT 1 FROM public.inventory_global
+            WHERE type = 'OTHER'::public.inventory_type_enum
+              AND lower(btrim(name)) = lower(btrim(p_name))
+              AND lower(btrim(category)) = lower(btrim(p_category))
+        ) THEN
+            RETURN json_build_object('code', 'DUPLICATE', 'id', NULL);
+        END IF;
+
         INSERT INTO public.inventory_global (
             type, category, brand, generic_id, strength, manufacturer_id, name,
             primary_unit, secondary_unit, conversion_rate, item_code, medex_url, entry_status
@@ -82,7 +124,11 @@ BEGIN
         RETURNING id INTO v_new_id;
     END IF;
 
-    RETURN json_build_object('code', 'SUCCESS', 'id', v_new_id);
+    -- RETURNING produced no row: ON CONFLICT DO NOTHING skipped an existing medicine
+    IF v_new_id IS NULL THEN
+        RETURN json_build_object('code', 'DUPLICATE', 'id', NULL);
+    END IF;
+    RETURN json_build_object('code', 'INSERTED', 'id', v_new_id);
 EXCEPTION WHEN OTHERS THEN
     RETURN json_build_object('code', 'INTERNAL_ERROR', 'message', SQLERRM);
 END;
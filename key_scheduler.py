@@ -0,0 +1,83 @@
+"""
+Keeps concurrent insert RPCs off each other's dimension rows.
+
+Every call of global_inventory_add_data_from_python resolves a generic and a
+manufacturer row. When the name already exists, migrations/004 only SELECTs it
+(no lock). A name that does not exist yet is inserted, and every concurrent call
+with the same name waits on that insert. On a single-manufacturer file, with up
+to 15 calls in flight, that would serialize most of the first requests.
+
+KeyScheduler sends at most one row per unresolved key. Other rows with that key
+are parked until it finishes, and rows with different keys keep going. Once a
+call for a key has succeeded, the key is resolved and its parked rows are
+released together. Names that already have an id in the name index
+(name_index.py) start out resolved. In practice, each new generic/manufacturer
+is created once before its rows go out in parallel.
+
+    scheduler = KeyScheduler(known_keys(get_index()))
+    if scheduler.claim(dimension_keys(payload), item):
+        ... send ...
+        ready.extend(scheduler.release(keys, ok=True))
+
+Not thread-safe: bulk_uploader calls it from one event loop, and
+bench_rpc_load.KeyedFeed wraps it in a lock.
+"""
+from name_index import normalize_name
+
+UNKNOWN_NAMES = {"generic": "Unknown Generic", "manufacturer": "Unknown Manufacturer"}
+
+
+def dimension_keys(payload):
+    """(kind, key) of the generic / manufacturer rows the RPC will resolve for `payload`."""
+    keys = []
+    for kind, field in (("generic", "p_generic_name"), ("manufacturer", "p_manufacturer_name")):
+        name = (payload.get(field) or "").strip()
+        if not name and payload.get('p_type') == 'MEDICINE':
+            name = UNKNOWN_NAMES[kind]  # The RPC's fallback rows
+        if name:
+            keys.append((kind, normalize_name(name, kind)))
+    return tuple(keys)
+
+
+def known_keys(index):
+    """Keys of the names that already exist remotely (have an id in the name index)."""
+    return {(kind, key) for kind, entries in index.entries.items() for key, (row_id, _) in entries.items() if row_id}
+
+
+class KeyScheduler:
+    def __init__(self, resolved=()):
+        self.resolved = set(resolved)
+        self.claimed = set()   # Unresolved keys with a row in flight
+        self.parked = {}       # key -> items waiting for it to resolve
+        self.deferrals = 0
+
+    def claim(self, keys, item):
+        """True if `item` may be sent now; otherwise it is parked behind a busy key."""
+        pending = [k for k in keys if k not in self.resolved]
+        for key in pending:
+            if key in self.claimed:
+                self.parked.setdefault(key, []).append(item)
+                self.deferrals += 1
+                return False
+        self.claimed.update(pending)
+        return True
+
+    def release(self, keys, ok=True):
+        """
+        Ends the call that claimed `keys`. The keys count as resolved only if it
+        succeeded. Returns the parked items to send next; they are claimed again
+        if a key is still unresolved.
+        """
+        released = []
+        for key in keys:
+            if key not in self.claimed:
+                continue
+            self.claimed.discard(key)
+            if ok:
+                self.resolved.add(key)
+            released.extend(self.parked.pop(key, ()))
+        return released
+
+    @property
+    def waiting(self):
+        return sum(len(items) for items in self.parked.values())
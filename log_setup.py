@@ -0,0 +1,85 @@
+"""
+Shared logging setup for all entry points.
+
+Callers only put records on an in-memory queue; a background listener thread
+buffers them and writes to the log file in batches (on a timer, when the
+buffer fills, or immediately for ERROR and above). With debug output disabled
+a `logger.debug(...)` call costs one level check.
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+
+import config
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_listener = None
+
+
+class PeriodicFlushHandler(logging.handlers.MemoryHandler):
+    """MemoryHandler that also flushes its buffer every `interval` seconds."""
+
+    def __init__(self, target, capacity=512, interval=2.0, flush_level=logging.ERROR):
+        super().__init__(capacity, flushLevel=flush_level, target=target, flushOnClose=True)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._flush_loop, name="log-flush", daemon=True)
+        self._thread.start()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def close(self):
+        self._stop.set()
+        target = self.target
+        super().close()
+        if target:
+            target.close()
+
+
+def setup_logging(logfile, level=None):
+    """
+    Routes the root logger through a queue to a buffered file writer.
+    `level` defaults to DEBUG when config.DEBUG_LOGGING is set, else config.LOG_LEVEL.
+    Safe to call more than once; only the first call configures logging.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    if level is None:
+        level = logging.DEBUG if getattr(config, "DEBUG_LOGGING", False) else getattr(config, "LOG_LEVEL", "INFO")
+
+    file_handler = logging.FileHandler(logfile, encoding='utf-8')
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    buffered = PeriodicFlushHandler(file_handler, interval=getattr(config, "LOG_FLUSH_INTERVAL", 2.0))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+    # Suppress debug logs from third-party libraries
+    for noisy in ("httpx", "httpcore", "hpack"):
+        logging.getLogger(noisy).setLevel(logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(log_queue, buffered)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Drains the queue and flushes everything to disk."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
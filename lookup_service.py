@@ -0,0 +1,329 @@
+"""
+Read-only inventory lookup service for pharmacy front ends.
+
+Keeps a local SQLite replica of inventory_global (with generic and manufacturer
+names, pulled through exporter.stream_pages) and serves every request from
+in-memory indexes built from it, so lookups never touch Supabase:
+
+    - exact lookups: dict  normalized value -> item ids
+    - prefix/autocomplete: sorted key lists searched with bisect
+    - an LRU cache of finished responses, cleared whenever the index is swapped
+
+The replica is refreshed incrementally (rows whose updated_at moved past the
+stored watermark) every config.LOOKUP_REFRESH_INTERVAL seconds, or on demand
+through POST /admin/refresh with the X-Admin-Token header (config.ADMIN_TOKEN).
+Rows deleted upstream only disappear on a full sync.
+
+    python lookup_service.py sync [--full]      # fill / update the replica
+    python lookup_service.py serve [--port 5055]
+
+    GET  /autocomplete/brand?q=nap&limit=10     # items whose brand (or name) starts with q
+    GET  /autocomplete/generic?q=para           # distinct generic names, with item counts
+    GET  /autocomplete/manufacturer?q=inc
+    GET  /lookup/brand?q=Napa                   # items with exactly this brand / generic / manufacturer
+    GET  /items/<id>
+    GET  /health
+"""
+import argparse
+import sqlite3
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+
+import config
+
+REPLICA_PATH = "data/lookup_replica.db"
+FIELDS = ("brand", "generic", "manufacturer")
+ITEM_COLUMNS = (
+    "id", "type", "category", "brand", "strength", "name", "generic_name", "manufacturer_name",
+    "primary_unit", "secondary_unit", "conversion_rate", "item_code", "medex_url", "updated_at",
+)
+SELECT_COLUMNS = (
+    "id,type,category,brand,strength,name,primary_unit,secondary_unit,conversion_rate,item_code,"
+    "medex_url,updated_at,generic:inventory_generics(name),manufacturer:inventory_manufacturers(name)"
+)
+
+CREATE_SQL = f"""
+CREATE TABLE IF NOT EXISTS items (id TEXT PRIMARY KEY, {', '.join(ITEM_COLUMNS[1:])});
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+UPSERT_SQL = f"INSERT OR REPLACE INTO items ({', '.join(ITEM_COLUMNS)}) VALUES ({', '.join('?' for _ in ITEM_COLUMNS)})"
+
+
+def fold(value):
+    return " ".join(value.casefold().split()) if value else ""
+
+
+class Replica:
+    """SQLite copy of inventory_global; one short-lived connection per call (thread-safe)."""
+
+    def __init__(self, path=REPLICA_PATH):
+        self.path = path
+
+    def connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.executescript(CREATE_SQL)
+        return conn
+
+    def get_meta(self, key):
+        conn = self.connect()
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    def sync(self, full=False, workers=4):
+        """Pulls changed rows (all rows with full=True); returns (rows written, since)."""
+        from exporter import flatten, incremental_since, stream_pages
+
+        watermark = None if full else self.get_meta('max_updated_at')
+        since = incremental_since({'max_updated_at': watermark}) if watermark else None
+        count = 0
+        conn = self.connect()
+        try:
+            if full:
+                conn.execute("DELETE FROM items")
+            for page in stream_pages(since=since, workers=workers, columns=SELECT_COLUMNS):
+                rows = [flatten(r) for r in page]
+                conn.executemany(UPSERT_SQL, [tuple(r.get(c) for c in ITEM_COLUMNS) for r in rows])
+                count += len(rows)
+                page_max = max((r['updated_at'] for r in rows if r.get('updated_at')), default=None)
+                if page_max and (watermark is None or page_max > watermark):
+                    watermark = page_max
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('max_updated_at', ?)", (watermark,))
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('last_sync', ?)", (time.strftime('%Y-%m-%dT%H:%M:%S'),))
+            conn.commit()  # Watermark and rows land together, or not at all
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return count, since
+
+    def load_items(self):
+        conn = self.connect()
+        try:
+            cur = conn.execute(f"SELECT {', '.join(ITEM_COLUMNS)} FROM items")
+            return [dict(zip(ITEM_COLUMNS, row)) for row in cur]
+        finally:
+            conn.close()
+
+
+class LookupIndex:
+    """Immutable in-memory indexes over the replica rows."""
+
+    def __init__(self, items):
+        self.items = {item['id']: item for item in items}
+        self.exact = {field: {} for field in FIELDS}
+        names = {field: {} for field in ("generic", "manufacturer")}
+        brand_keys = []
+        for item in items:
+            label = item['brand'] if item['type'] == 'MEDICINE' else item['name']
+            values = {"brand": label, "generic": item['generic_name'], "manufacturer": item['manufacturer_name']}
+            for field, value in values.items():
+                key = fold(value)
+                if not key:
+                    continue
+                self.exact[field].setdefault(key, []).append(item['id'])
+                if field == "brand":
+                    brand_keys.append((key, item['id']))
+                else:
+                    entry = names[field].setdefault(key, [value, 0])
+                    entry[1] += 1
+
+        brand_keys.sort()
+        self.prefix = {"brand": ([k for k, _ in brand_keys], [i for _, i in brand_keys])}
+        for field, entries in names.items():
+            keys = sorted(entries)
+            self.prefix[field] = (keys, [entries[k] for k in keys])
+
+    def search(self, field, query, limit):
+        """Entries whose key starts with the folded query, in key order."""
+        keys, values = self.prefix[field]
+        q = fold(query)
+        out = []
+        i = bisect_left(keys, q)
+        while i < len(keys) and len(out) < limit and keys[i].startswith(q):
+            out.append(values[i])
+            i += 1
+        return out
+
+    def autocomplete(self, field, query, limit=10):
+        hits = self.search(field, query, limit)
+        if field == "brand":
+            return [self.summary(self.items[i]) for i in hits]
+        return [{"name": name, "items": count} for name, count in hits]
+
+    def lookup(self, field, query):
+        return [self.items[i] for i in self.exact[field].get(fold(query), [])]
+
+    @staticmethod
+    def summary(item):
+        return {k: item[k] for k in ("id", "type", "category", "brand", "name", "strength", "generic_name", "manufacturer_name")}
+
+
+class LRUCache:
+    def __init__(self, size=4096):
+        self.size = size
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            if key in self.data:
+                self.data.move_to_end(key)
+                self.hits += 1
+                return self.data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            if len(self.data) > self.size:
+                self.data.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+class LookupState:
+    """Current index plus refresh bookkeeping, shared by the request handlers and the refresher."""
+
+    def __init__(self, replica, cache_size=4096):
+        self.replica = replica
+        self.cache = LRUCache(cache_size)
+        self.refresh_lock = threading.Lock()
+        self.last_error = None
+        self.index = LookupIndex(replica.load_items())
+
+    def refresh(self, full=False):
+        """Syncs the replica and swaps in a fresh index. Returns rows pulled, or None if a refresh is running."""
+        if not self.refresh_lock.acquire(blocking=False):
+            return None
+        try:
+            count, _ = self.replica.sync(full=full)
+            if count or full:
+                self.index = LookupIndex(self.replica.load_items())  # Single reference swap, readers never block
+                self.cache.clear()
+            self.last_error = None
+            return count
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+        finally:
+            self.refresh_lock.release()
+
+    def cached(self, key, build):
+        value = self.cache.get(key)
+        if value is None:
+            value = build()
+            self.cache.put(key, value)
+        return value
+
+
+def refresh_forever(state, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            state.refresh()
+        except Exception:
+            pass  # Kept in state.last_error and shown by /health
+
+
+def create_app(state):
+    from flask import Flask, abort, jsonify, request
+
+    app = Flask(__name__)
+
+    def limit_arg():
+        try:
+            return max(1, min(int(request.args.get('limit', 10)), 100))
+        except ValueError:
+            return 10
+
+    @app.get("/autocomplete/<field>")
+    def autocomplete(field):
+        if field not in FIELDS:
+            abort(404)
+        q, limit = request.args.get('q', ''), limit_arg()
+        if not fold(q):
+            return jsonify([])
+        return jsonify(state.cached(("auto", field, fold(q), limit), lambda: state.index.autocomplete(field, q, limit)))
+
+    @app.get("/lookup/<field>")
+    def lookup(field):
+        if field not in FIELDS:
+            abort(404)
+        q = request.args.get('q', '')
+        return jsonify(state.cached(("exact", field, fold(q)), lambda: state.index.lookup(field, q)))
+
+    @app.get("/items/<item_id>")
+    def item(item_id):
+        found = state.index.items.get(item_id)
+        if not found:
+            abort(404)
+        return jsonify(found)
+
+    @app.get("/health")
+    def health():
+        return jsonify({
+            "items": len(state.index.items),
+            "last_sync": state.replica.get_meta('last_sync'),
+            "max_updated_at": state.replica.get_meta('max_updated_at'),
+            "cache": {"entries": len(state.cache.data), "hits": state.cache.hits, "misses": state.cache.misses},
+            "last_error": state.last_error,
+        })
+
+    @app.post("/admin/refresh")
+    def admin_refresh():
+        if request.headers.get('X-Admin-Token') != config.ADMIN_TOKEN:
+            abort(403)
+        full = request.args.get('full') == '1'
+        threading.Thread(target=state.refresh, kwargs={'full': full}, daemon=True).start()
+        return jsonify({"status": "refresh started", "full": full}), 202
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local read-only inventory lookup service.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("sync", help="Fill / update the local replica")
+    p.add_argument("--full", action="store_true", help="Re-pull every row (also drops rows deleted upstream)")
+    p = sub.add_parser("serve", help="Serve lookups from the replica")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=5055)
+    p.add_argument("--no-refresh", action="store_true", help="Do not refresh the replica in the background")
+    args = parser.parse_args(argv)
+
+    from rich.console import Console
+    console = Console()
+    replica = Replica()
+
+    if args.command == "sync":
+        start = time.time()
+        count, since = replica.sync(full=args.full)
+        mode = f"changes since {since}" if since else "full"
+        console.print(f"[bold green]✓ Replica updated: {count} rows ({mode}) in {time.time() - start:.1f}s[/]")
+        return 0
+
+    state = LookupState(replica)
+    if not state.index.items:
+        console.print("[yellow]Replica is empty, running a full sync first...[/]")
+        state.refresh(full=True)
+    if not args.no_refresh:
+        threading.Thread(target=refresh_forever, args=(state, config.LOOKUP_REFRESH_INTERVAL), daemon=True).start()
+    console.print(f"[bold cyan]Serving {len(state.index.items)} items on http://{args.host}:{args.port}[/]")
+    create_app(state).run(host=args.host, port=args.port, threaded=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 import random
 import time
+import threading
 from alert_manager import AlertManager
 import csv
 import os
@@ -11,7 +12,6 @@ import socket
 import logging
 import unicodedata
 from datetime import datetime
-from supabase import create_client, ClientOptions
 
 from rich.console import Console
 from rich.panel import Panel
@@ -19,25 +19,46 @@ from rich.prompt import Prompt
 from rich.table import Table
 from rich.text import Text
 
-# DrissionPage
-from DrissionPage import ChromiumPage, ChromiumOptions
+# DrissionPage and supabase are imported where first needed, so the pure helpers
+# (and tools built on them) load without starting the heavy stack
 
 # Config
 import config
+from row_validator import validate_rpc_payload, rpc_outcome
+from name_index import canonicalize_payload
+from crawl_frontier import CrawlFrontier, frontier_path_for, DONE, FAILED, QUEUED
+from scrape_journal import ScrapeJournal, journal_path_for
+from dead_letter import DeadLetter
+from url_dedup import open_seen
+
+from log_setup import setup_logging
 
 # --- Logging Setup ---
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("scraper.log")
-        # Removed StreamHandler to let rich console handle stdout beautifully
-    ]
-)
+# File only (scraper.log, configured in main_loop) to let rich console handle stdout beautifully
 logger = logging.getLogger(__name__)
 
 console = Console()
 
+# Collects all detail links of a list page in a single round-trip
+HARVEST_LINKS_JS = "return Array.from(document.querySelectorAll('a.hoverable-block'), a => a.href);"
+
+# Highest ?page=N found in the pagination links
+TOTAL_PAGES_JS = """
+return Math.max(0, ...Array.from(document.querySelectorAll('a[href*="page="]'), a => {
+    const m = a.href.match(/[?&]page=(\\d+)/);
+    return m ? parseInt(m[1], 10) : 0;
+}));
+"""
+
+# Seconds between fallback checks while waiting for a navigation event on a block page
+SECURITY_CHECK_HEARTBEAT = 30
+
+def human_pause(low, high):
+    """Random pause between `low` and `high` seconds, scaled by config.SLEEP_SCALE (0 disables it)."""
+    scale = config.SLEEP_SCALE
+    if scale > 0:
+        time.sleep(random.uniform(low, high) * scale)
+
 # --- Constants ---
 def clean_text(text):
     """
@@ -226,11 +247,97 @@ def parse_curl_command(curl_command):
     
     return cookies, headers
 
+def upload_scraped_item(supabase, data, stats, dead_letter=None):
+    """
+    Sends one transformed item through the insert RPC and records the outcome in stats.
+    Failures are also written to `dead_letter` (if given) with the payload.
+    Returns 'inserted', 'skipped' or 'error'.
+    """
+    is_medicine = data['type'] == 'MEDICINE'
+
+    def none_if_empty(val, default_val=None):
+        if val is None: return default_val
+        if isinstance(val, str) and str(val).strip() == '': return default_val
+        return val
+
+    # Prepare dynamic RPC Request Mapping Matching Bulk Uploader
+    rpc_payload = {
+        "p_type": data['type'],
+        "p_category": none_if_empty(data.get('category'), 'Miscellaneous'), 
+        "p_brand": none_if_empty(data.get('brand')) if is_medicine else None,
+        "p_generic_name": none_if_empty(data.get('generic_name')) if is_medicine else None, 
+        "p_strength": none_if_empty(data.get('strength'), 'N/A') if is_medicine else None,
+        "p_manufacturer_name": none_if_empty(data.get('manufacturer')), 
+        "p_name": None if is_medicine else none_if_empty(data.get('name')),
+        "p_primary_unit": none_if_empty(data.get('primary_unit', 'piece')),
+        "p_secondary_unit": none_if_empty(data.get('secondary_unit')),
+        "p_conversion_rate": data.get('conversion_rate', 1),
+        "p_item_code": none_if_empty(data.get('item_code'), ''),
+        "p_medex_url": none_if_empty(data.get('medex_url'))
+    }
+
+    rpc_payload, problems = validate_rpc_payload(rpc_payload)
+    canonicalize_payload(rpc_payload)
+
+    try:
+        if problems:
+            raise ValueError(f"Rejected locally: {'; '.join(problems)}")
+        res = supabase.rpc('global_inventory_add_data_from_python', rpc_payload).execute()
+        # INSERTED / DUPLICATE from the RPC itself (migrations/003); raises on INTERNAL_ERROR
+        if rpc_outcome(res.data) == 'duplicate':
+            console.print(f"    [bold yellow]⚠ Skipped (Duplicate):[/bold yellow] {data['brand']}")
+            logger.info(f"    -> Skipped (Duplicate already in Database): {data['brand']}")
+            stats['skipped'] += 1
+            return 'skipped'
+        console.print(f"    [bold green]✓ Scraped & Uploaded:[/bold green] {data['brand']}")
+        logger.info(f"    -> Scraped & Uploaded to Supabase: {data['brand']}")
+        stats['inserted'] += 1
+        return 'inserted'
+    except Exception as db_err:
+        console.print(f"    [bold red]✖ DB Upload failed for {data.get('brand')}:[/bold red] {db_err}")
+        logger.error(f"    -> DB Upload failed for {data.get('brand')}: {db_err}")
+        stats['errors'] += 1
+        if dead_letter is not None:
+            dead_letter.record_failure(rpc_payload, db_err, "scraper", "validate" if problems else "upload")
+        return 'error'
+
+
 class MedexBrowserScraper:
-    def __init__(self):
+    def __init__(self, allow_attach=True, base_url=None, rate_limiter=None, item_sink=None, shared_seen=None, on_progress=None,
+                 page=None, supabase=None):
+        """
+        Optional hooks (used by scheduler.py to run several crawls side by side):
+            allow_attach: attach to a debug Chrome on port 9222 if one is running
+            base_url:     company brand listing to crawl (default config.BASE_URL)
+            rate_limiter: object with acquire(), called before every navigation
+            item_sink:    callable(item, url) that takes over uploading transformed items; the
+                          URL is left QUEUED in the frontier and the sink's owner marks it
+                          DONE / seen once the upload succeeds
+            shared_seen:  set-like store (`in` / add) of URLs already processed by any worker
+            on_progress:  callable(counts) with the frontier counts after each item
+            page:         ready page object to drive instead of a Chrome (e.g. fake_driver.FakeChromiumPage)
+            supabase:     client to upload with instead of creating one from config
+        """
+        self.seen_urls = set() # Duplicate tracker; the brand-ID store of the current dedup file once loaded
+        self._seen_stores = {}
+        self._supabase = supabase
+        self.base_url = base_url or config.BASE_URL
+        self.rate_limiter = rate_limiter
+        self.item_sink = item_sink
+        self.shared_seen = shared_seen
+        self.on_progress = on_progress
+
+        if page is not None:
+            # Injected page: owned by the caller, treated like an attached browser (never quit by us)
+            self.page = page
+            self.attached_mode = True
+            return
+
         # 1. Try to Attach to Existing Chrome (The "Mind Boggling" Fix)
         # Check if port 9222 is open
         try:
+            if not allow_attach:
+                raise RuntimeError("Attach mode disabled")
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             result = sock.connect_ex(('127.0.0.1', 9222))
             sock.close()
@@ -239,6 +346,8 @@ class MedexBrowserScraper:
                 logger.info(">>> ATTACHING TO EXISTING CHROME INSTANCE (PORT 9222) <<<")
                 logger.info("Using your verified session. Cloudflare should be bypassed.")
                 
+                from DrissionPage import ChromiumPage, ChromiumOptions
+
                 co = ChromiumOptions()
                 co.set_local_port(9222)
                 self.page = ChromiumPage(co)
@@ -252,11 +361,15 @@ class MedexBrowserScraper:
         logger.info(">>> LAUNCHING NEW BROWSER INSTANCE <<<")
         self.attached_mode = False
         
-        # Create a temporary user data directory
+        # Create a temporary user data directory (kept across relaunches so the HTTP cache stays warm)
         self.temp_user_data = tempfile.mkdtemp(prefix="medex_scraper_profile_")
         logger.info(f"Created Temp Profile: {self.temp_user_data}")
-        
-        self.seen_urls = set() # Duplicate Trackers
+
+        self.launch_browser()
+
+    def launch_browser(self):
+        """Starts a Chrome instance on the scraper's profile directory."""
+        from DrissionPage import ChromiumPage, ChromiumOptions
 
         co = ChromiumOptions()
         
@@ -309,7 +422,45 @@ class MedexBrowserScraper:
             traceback.print_exc()
             sys.exit(1)
 
+    @property
+    def supabase(self):
+        """Sync Supabase client, created on first use and reused by every session."""
+        if self._supabase is None:
+            from supabase import create_client, ClientOptions
+            options = ClientOptions(postgrest_client_timeout=15)
+            self._supabase = create_client(config.SUPABASE_URL, config.SUPABASE_KEY, options=options)
+        return self._supabase
+
+    def reset_session(self):
+        """
+        Soft reset after a block: drops the site's cookies and leaves the page,
+        keeping the browser process and its disk cache warm.
+        """
+        try:
+            self.page.set.cookies.clear()
+        except Exception as e:
+            logger.warning(f"Could not clear cookies: {e}")
+        try:
+            self.page.get("about:blank")
+        except: pass
+        logger.info("Session reset (cookies cleared, browser kept).")
+
+    def relaunch(self):
+        """Hard reset: restarts the browser process on the same profile (cache survives)."""
+        if self.attached_mode:
+            self.reset_session()
+            return
+        try:
+            self.page.quit()
+        except: pass
+        logger.info("Relaunching browser on the existing profile...")
+        self.launch_browser()
+
     def cleanup(self):
+        for store in self._seen_stores.values():
+            store.close()
+        self._seen_stores.clear()
+        self.seen_urls = set()
         try:
             # Only quit if we launched it ourselves
             if hasattr(self, 'attached_mode') and not self.attached_mode:
@@ -323,6 +474,12 @@ class MedexBrowserScraper:
                 logger.info("Cleaned up temp profile.")
         except: pass
 
+    def navigate(self, url):
+        """Loads a URL, respecting the shared request budget if one is set."""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        self.page.get(url)
+
     def check_for_block(self):
         """Checks if current page is blocked (Terms of Use)."""
         try:
@@ -337,17 +494,75 @@ class MedexBrowserScraper:
         try:
             # Scroll down a bit
             self.page.scroll.down(random.randint(100, 400))
-            time.sleep(random.uniform(0.1, 0.3))
+            human_pause(0.1, 0.3)
             
             # Maybe scroll up a tiny bit
             if random.random() < 0.3:
                 self.page.scroll.up(random.randint(10, 50))
             
             # Wait a tick
-            time.sleep(random.uniform(0.2, 0.5))
+            human_pause(0.2, 0.5)
             
         except: pass
 
+    def wait_for_unblock(self, alerter=None):
+        """
+        Blocks until the main frame navigates away from the block page.
+        Driven by CDP navigation events (Page.frameNavigated / navigatedWithinDocument),
+        so it wakes as soon as the operator finishes; the alert is silenced from the
+        same event. Falls back to a slow URL check if events are unavailable.
+        """
+        resumed = threading.Event()
+
+        def on_navigated(**kwargs):
+            frame = kwargs.get('frame')
+            if frame is not None:
+                if frame.get('parentId'):
+                    return  # iframe (e.g. the captcha widget), not the page itself
+                nav_url = frame.get('url', '')
+            else:
+                nav_url = kwargs.get('url', '')
+            if nav_url and "terms-of-use" not in nav_url:
+                resumed.set()
+                if alerter:
+                    alerter.signal_stop()
+
+        def chained(previous):
+            def handler(**kwargs):
+                if previous:
+                    previous(**kwargs)  # e.g. ChromiumBase._onFrameNavigated, which keeps the page state current
+                on_navigated(**kwargs)
+            return handler
+
+        events = ('Page.frameNavigated', 'Page.navigatedWithinDocument')
+        driver = getattr(self.page, 'driver', None)
+        previous = {}
+        try:
+            # set_callback replaces the handler, so keep DrissionPage's own and call it first
+            for event in events:
+                previous[event] = driver.event_handlers.get(event)
+            for event in events:
+                driver.set_callback(event, chained(previous[event]))
+            heartbeat = SECURITY_CHECK_HEARTBEAT
+        except Exception as e:
+            logger.warning(f"Navigation events unavailable ({e}); falling back to polling.")
+            driver = None
+            heartbeat = 2
+
+        try:
+            # The heartbeat only guards against a missed event or a closed browser
+            while not resumed.wait(heartbeat):
+                if not self.check_for_block():
+                    break
+                if not self.page.ele('tag:body'):
+                    break
+        finally:
+            if driver is not None:
+                for event in events:
+                    try:
+                        driver.set_callback(event, previous.get(event))
+                    except: pass
+
     def handle_security_check(self):
         """
         Detects Cloudflare/Security checks.
@@ -367,18 +582,16 @@ class MedexBrowserScraper:
                 alerter.start()
 
                 try:
-                    # Wait until title changes or user solves it
-                    while self.check_for_block():
-                        time.sleep(2)
-                        # Optional: Check if we lost connection or browser closed
-                        if not self.page.ele('tag:body'):
-                            break
+                    # Sleep until the browser reports a navigation away from the block page
+                    self.wait_for_unblock(alerter)
                 finally:
-                    # Stop Audio Alert immediately after loop breaks (solved or error)
+                    # Stop Audio Alert immediately after the wait ends (solved or error)
                     alerter.stop()
 
                 logger.info("Security Check passed! Resuming...")
-                time.sleep(2) # Extra buffer
+                try:
+                    self.page.wait.doc_loaded(timeout=10)
+                except: pass
                 return True
             
             return True
@@ -388,7 +601,13 @@ class MedexBrowserScraper:
             return False
 
     def scrape_details(self, url):
-        self.page.get(url)
+        """Transformed item for a brand page, or "BLOCKED" / "SKIP" / None."""
+        raw = self.extract_raw(url)
+        return transform_medex_item(raw) if isinstance(raw, dict) else raw
+
+    def extract_raw(self, url):
+        """Raw fields of a brand page (as scraped, before transform_medex_item), or "BLOCKED" / "SKIP" / None."""
+        self.navigate(url)
         
         # Check for block
         if self.check_for_block():
@@ -428,7 +647,7 @@ class MedexBrowserScraper:
             dosage_form = dosage_icon.attr("title") if dosage_icon else ""
             
             # Prepare raw data
-            raw_data = {
+            return {
                 "brand_name": brand_raw,
                 "generic_name": generic,
                 "strength": strength,
@@ -437,152 +656,209 @@ class MedexBrowserScraper:
                 "category_name": dosage_form, 
                 "url": url
             }
-            
-            return transform_medex_item(raw_data)
         except Exception as e:
             logger.error(f"Extraction Error for {url}: {e}")
             return None
 
     def load_processed_urls(self, filename):
-        if os.path.exists(filename):
-            logger.info(f"Loading processed URLs from {filename}...")
+        """Opens (once) the brand-ID store for `filename` and makes it the current dedup set."""
+        if filename not in self._seen_stores:
             try:
-                with open(filename, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        url = line.strip()
-                        if url: self.seen_urls.add(url)
-                logger.info(f"Loaded {len(self.seen_urls)} processed URLs.")
+                self._seen_stores[filename] = open_seen(filename)
+                logger.info(f"Loaded {len(self._seen_stores[filename])} processed URLs for {filename}.")
             except Exception as e:
                 logger.error(f"Error loading processed URLs: {e}")
+                return
+        self.seen_urls = self._seen_stores[filename]
+
+    def list_page_url(self, page):
+        base = self.base_url
+        return f"{base}{'&' if '?' in base else '?'}page={page}" if page > 1 else base
 
-    def append_processed_url(self, url, filename):
+    def harvest_links(self):
+        """Pulls every detail href on the current list page in one call, in page order."""
         try:
-            with open(filename, 'a', encoding='utf-8') as f:
-                f.write(f"{url}\n")
-        except: pass
+            links = self.page.run_js(HARVEST_LINKS_JS) or []
+        except Exception as e:
+            logger.warning(f"JS harvest failed ({e}); falling back to element scan.")
+            try:
+                links = [el.attr('href') for el in self.page.eles('css:a.hoverable-block')]
+            except: links = []
+        # Dedup links on the page itself, keeping their order
+        return list(dict.fromkeys(link for link in links if link))
+
+    def discover_total_pages(self):
+        """Reads the highest page number from the pagination links of the current list page."""
+        try:
+            total = self.page.run_js(TOTAL_PAGES_JS)
+            return int(total) if total else None
+        except Exception as e:
+            logger.warning(f"Could not read page count: {e}")
+            return None
+
+    def harvest_list_pages(self, frontier):
+        """
+        Phase 1: visits each pending list page once and queues its detail URLs.
+        Returns (status, page) where status is 'DONE' or 'BLOCKED'.
+        """
+        pages = frontier.pending_pages()
+        for page in pages:
+            console.print(f"[bold blue]--- Harvesting List Page {page} ---[/]")
+            logger.info(f"--- Harvesting List Page {page} ---")
+
+            self.navigate(self.list_page_url(page))
+
+            if self.check_for_block():
+                logger.warning(f"BLOCKED at Page {page} List View.")
+                return "BLOCKED", page
+
+            if not self.handle_security_check():
+                 logger.error(f"Failed captcha on list page {page}. Skipping page or Blocked?")
+                 return "BLOCKED", page
+
+            if frontier.total_pages is None:
+                total = self.discover_total_pages()
+                if total:
+                    logger.info(f"Listing has {total} pages.")
+                    frontier.set_total_pages(max(total, page))
+
+            # Human behavior on list page
+            self.simulate_human_behavior()
+
+            links = self.harvest_links()
+            if not links and page != frontier.total_pages:
+                # Half-loaded page or a soft block: never mark it harvested with nothing on it
+                retry = frontier.list_page_empty(page)
+                console.print(f"[yellow]No items found on Page {page}; "
+                              f"{'will retry it' if retry else 'giving up on it'}.[/]")
+                logger.warning(f"No items found on list page {page} ({'retrying' if retry else 'gave up'}).")
+                if retry:
+                    pages.append(page)  # Retried once the other pages are harvested
+                human_pause(2, 4)
+                continue
+            frontier.add_urls(page, links)
+            console.print(f"[cyan]Found {len(links)} items on Page {page}[/]")
+            logger.info(f"Found {len(links)} items on Page {page}")
+
+            # Random delay between pages
+            human_pause(2, 4)
+
+        return "DONE", None
+
+    def submit_item(self, data, stats, dead_letter=None, url=None):
+        """Hands a transformed item to the item sink, or uploads it directly. Returns the outcome."""
+        if self.item_sink is not None:
+            self.item_sink(data, url)
+            stats['queued'] = stats.get('queued', 0) + 1
+            return 'queued'
+        return upload_scraped_item(self.supabase, data, stats, dead_letter)
 
     def run_session(self, start_page, end_page, filename, suffix=""):
         """
         Runs the scraper for the given range and uploads dynamically to Supabase.
+        Progress lives in a persistent frontier next to `filename`, so a restarted
+        session skips list pages it already harvested and resumes at the first
+        unfinished detail URL.
         Returns:
-            (status_code, last_processed_page)
+            (status_code, last_processed_page, stats)
             status_code: 'DONE', 'BLOCKED', 'ERROR'
         """
         if not os.path.exists('data'): os.makedirs('data')
         
-        base = config.BASE_URL
-        
         # Load processed URLs to avoid duplicates
         self.load_processed_urls(filename)
 
-        # Initialize Supabase Sync Client
-        url = config.SUPABASE_URL
-        key = config.SUPABASE_KEY
-        options = ClientOptions(postgrest_client_timeout=15)
-        try:
-            supabase = create_client(url, key, options=options)
-        except Exception as e:
-            logger.critical(f"Supabase init error: {e}")
-            return "ERROR", start_page, {}
+        # Supabase Sync Client (kept warm across sessions; not needed when a sink uploads for us)
+        if self.item_sink is None:
+            try:
+                self.supabase
+            except Exception as e:
+                logger.critical(f"Supabase init error: {e}")
+                return "ERROR", start_page, {}
             
-        stats = {'inserted': 0, 'skipped': 0, 'errors': 0, 'total': 0}
+        stats = {'inserted': 0, 'skipped': 0, 'errors': 0, 'total': 0, 'finished': 0}
+        frontier = CrawlFrontier(frontier_path_for(filename))
+        frontier.plan_pages(start_page, end_page)
+        journal = ScrapeJournal(journal_path_for(filename))
+        dead_letter = DeadLetter()
         
         try:
-            for page in range(start_page, end_page + 1):
-                console.print(f"[bold blue]--- Processing Page {page} ---[/]")
-                logger.info(f"--- Processing Page {page} ---")
-                list_url = f"{base}{'&' if '?' in base else '?'}page={page}" if page > 1 else base
-                
-                self.page.get(list_url)
-                
-                if self.check_for_block():
-                    logger.warning(f"BLOCKED at Page {page} List View.")
-                    return "BLOCKED", page
-                
-                if not self.handle_security_check():
-                     logger.error(f"Failed captcha on list page {page}. Skipping page or Blocked?")
-                     return "BLOCKED", page
-                
-                # Human behavior on list page
-                self.simulate_human_behavior()
+            # Phase 1: list pages -> queued detail URLs
+            status, page = self.harvest_list_pages(frontier)
+            if status == "BLOCKED":
+                return "BLOCKED", page, stats
+
+            # Phase 2: drain the queue of detail URLs
+            pending = frontier.pending_urls()
+            if self.on_progress is not None:
+                self.on_progress(frontier.counts())
+            console.print(f"[cyan]{len(pending)} detail pages queued.[/]")
+            
+            for link, page in pending:
+                if link in self.seen_urls or (self.shared_seen is not None and link in self.shared_seen):
+                    frontier.mark(link, DONE)
+                    continue
+                    
+                stats['total'] += 1
+                    
+                # Cleanup name for logging
+                slug = link.split('/')[-1].replace('-', ' ').title()
+                logger.info(f"Processing: {slug}")
                 
                 try:
-                    links = [el.attr('href') for el in self.page.eles('css:a.hoverable-block')]
-                except: links = []
-                
-                # Dedup links on the page itself
-                unique_links = list(set(links))
-                console.print(f"[cyan]Found {len(unique_links)} items on Page {page}[/]")
-                logger.info(f"Found {len(unique_links)} items on Page {page}")
+                    raw_or_status = self.extract_raw(link)
+                except Exception as e:
+                    logger.error(f"Critical error on item {slug}: {e}")
+                    raw_or_status = "ERROR"
                 
-                for link in unique_links:
-                    if link in self.seen_urls:
-                        continue
-                        
-                    stats['total'] += 1
-                        
-                    # Cleanup name for logging
-                    slug = link.split('/')[-1].replace('-', ' ').title()
-                    logger.info(f"Processing: {slug}")
-                    
+                if raw_or_status == "BLOCKED":
+                    logger.warning(f"BLOCKED at Item: {slug}")
+                    return "BLOCKED", page, stats
+
+                details_or_status = None
+                if isinstance(raw_or_status, dict):
+                    # Journal the raw fields first, so a transform bug never costs a re-scrape
                     try:
-                        details_or_status = self.scrape_details(link)
+                        details_or_status = transform_medex_item(raw_or_status)
+                        journal.record_scrape(link, page, raw_or_status, details_or_status)
                     except Exception as e:
-                        logger.error(f"Critical error on item {slug}: {e}")
-                        details_or_status = "ERROR"
-                    
-                    if details_or_status == "BLOCKED":
-                        logger.warning(f"BLOCKED at Item: {slug}")
-                        return "BLOCKED", page
-                    
-                    if isinstance(details_or_status, dict):
-                        data = details_or_status
-                        is_medicine = data['type'] == 'MEDICINE'
-                        
-                        def none_if_empty(val, default_val=None):
-                            if val is None: return default_val
-                            if isinstance(val, str) and str(val).strip() == '': return default_val
-                            return val
-                        
-                        # Prepare dynamic RPC Request Mapping Matching Bulk Uploader
-                        rpc_payload = {
-                            "p_type": data['type'],
-                            "p_category": none_if_empty(data.get('category'), 'Miscellaneous'), 
-                            "p_brand": none_if_empty(data.get('brand')) if is_medicine else None,
-                            "p_generic_name": none_if_empty(data.get('generic_name')) if is_medicine else None, 
-                            "p_strength": none_if_empty(data.get('strength'), 'N/A') if is_medicine else None,
-                            "p_manufacturer_name": none_if_empty(data.get('manufacturer')), 
-                            "p_name": None if is_medicine else none_if_empty(data.get('name')),
-                            "p_primary_unit": none_if_empty(data.get('primary_unit', 'piece')),
-                            "p_secondary_unit": none_if_empty(data.get('secondary_unit')),
-                            "p_conversion_rate": data.get('conversion_rate', 1),
-                            "p_item_code": none_if_empty(data.get('item_code'), ''),
-                            "p_medex_url": none_if_empty(data.get('medex_url'))
-                        }
-                        
-                        try:
-                            res = supabase.rpc('global_inventory_add_data_from_python', rpc_payload).execute()
-                            console.print(f"    [bold green]✓ Scraped & Uploaded:[/bold green] {data['brand']}")
-                            logger.info(f"    -> Scraped & Uploaded to Supabase: {data['brand']}")
-                            stats['inserted'] += 1
-                        except Exception as db_err:
-                            err_str = str(db_err).lower()
-                            if "inventory_global_medex_url_key" in err_str or "duplicate key" in err_str or "inventory_global_brand_id_key" in err_str:
-                                console.print(f"    [bold yellow]⚠ Skipped (Duplicate):[/bold yellow] {data['brand']}")
-                                logger.info(f"    -> Skipped (Duplicate already in Database): {data['brand']}")
-                                stats['skipped'] += 1
-                            else:
-                                console.print(f"    [bold red]✖ DB Upload failed for {data.get('brand')}:[/bold red] {db_err}")
-                                logger.error(f"    -> DB Upload failed for {data.get('brand')}: {db_err}")
-                                stats['errors'] += 1
-
-                        # Append successful execution to text log so we skip next load
-                        self.append_processed_url(link, filename)
+                        logger.error(f"Transform error on item {slug}: {e}")
+                        journal.record_scrape(link, page, raw_or_status, None, error=str(e))
+                        dead_letter.record_failure(None, e, "scraper", "transform", url=link)
+                else:
+                    dead_letter.record_failure(None, f"No data extracted ({raw_or_status})", "scraper", "extract", url=link)
+
+                if isinstance(details_or_status, dict):
+                    outcome = self.submit_item(details_or_status, stats, dead_letter, url=link)
+                    journal.record_upload(link, outcome)
+
+                    if outcome == 'queued':
+                        # Not uploaded yet: the sink's owner marks it DONE / seen on success
+                        frontier.mark(link, QUEUED)
+                    else:
+                        # Mark done in the on-disk store so we skip it next load
                         self.seen_urls.add(link)
-                        time.sleep(random.uniform(0.5, 1.5))
-                
-                # Random delay between pages
-                time.sleep(random.uniform(2, 4))
+                        if self.shared_seen is not None:
+                            self.shared_seen.add(link)
+                        frontier.mark(link, DONE)
+                    human_pause(0.5, 1.5)
+                else:
+                    frontier.mark(link, FAILED)
+                    if frontier.can_retry(link):
+                        pending.append((link, page))  # Retried once the rest of the queue is done
+                stats['finished'] += 1  # `total` also counts the item a block interrupts
+
+                if self.on_progress is not None:
+                    self.on_progress(frontier.counts())
+
+            exhausted = frontier.exhausted_urls()
+            stats['exhausted'] = len(exhausted)
+            if exhausted:
+                console.print(f"[bold red]{len(exhausted)} detail pages failed {frontier.max_attempts} times "
+                              f"and are not retried any more:[/]")
+                for url, _ in exhausted[:10]:
+                    console.print(f" - [red]{url}[/]")
+                logger.warning(f"{len(exhausted)} detail pages permanently failed: {[url for url, _ in exhausted]}")
         
             return "DONE", end_page, stats
             
@@ -591,17 +867,103 @@ class MedexBrowserScraper:
             import traceback
             traceback.print_exc()
             return "ERROR", start_page, stats
+        finally:
+            dead_letter.close()
+            journal.close()
+            frontier.close()
+
+
+class SessionManager:
+    """
+    Keeps the scraper warm across BLOCKED restarts: one browser process/profile,
+    one Supabase client and one in-memory dedup set for the whole run.
+    A block only triggers a soft reset; the browser is relaunched (on the same
+    profile) after `relaunch_after` consecutive blocks.
+    """
+    def __init__(self, relaunch_after=3, **scraper_options):
+        self.relaunch_after = relaunch_after
+        self.consecutive_blocks = 0
+        self.scraper = None
+        self.scraper_options = scraper_options
+
+    def get_scraper(self):
+        if self.scraper is None:
+            self.scraper = MedexBrowserScraper(**self.scraper_options)
+        return self.scraper
+
+    def session_succeeded(self):
+        self.consecutive_blocks = 0
+
+    def recover_from_block(self):
+        self.consecutive_blocks += 1
+        if self.consecutive_blocks >= self.relaunch_after:
+            self.scraper.relaunch()
+            self.consecutive_blocks = 0
+        else:
+            self.scraper.reset_session()
 
+    def close(self):
+        if self.scraper is not None:
+            self.scraper.cleanup()
+            self.scraper = None
 
-def main_loop():
+
+def run_crawl(sessions, start_page, end_page, filename, suffix=""):
+    """
+    Runs sessions until the range is done, recovering from blocks with the warm session.
+    Returns (final_status, all_stats).
+    """
+    current_page = start_page
+    all_stats = {'inserted': 0, 'skipped': 0, 'errors': 0, 'total': 0}
+    status = None
+
+    while current_page <= end_page:
+        console.print(f"\n[bold magenta]=== Starting Session from Page {current_page} ===[/]")
+        scraper = sessions.get_scraper()
+        
+        status, stop_page, session_stats = scraper.run_session(start_page, end_page, filename, suffix)
+        if session_stats:
+            all_stats['inserted'] += session_stats.get('inserted', 0)
+            all_stats['skipped'] += session_stats.get('skipped', 0)
+            all_stats['errors'] += session_stats.get('errors', 0)
+            all_stats['total'] += session_stats.get('total', 0)
+        
+        if status == "DONE":
+            console.print("\n[bold green]✨ Scraping Completed Successfully![/]")
+            break
+        elif status == "BLOCKED":
+            console.print(f"[bold yellow]⚠ Session Blocked at Page {stop_page}. Restarting in {config.BLOCK_COOLDOWN_SECONDS} seconds...[/]")
+            current_page = stop_page # The frontier resumes from the exact URL we got blocked on
+            if session_stats and session_stats.get('finished'):
+                sessions.session_succeeded() # Finished items before the block, so the count starts over
+            sessions.recover_from_block()
+            time.sleep(config.BLOCK_COOLDOWN_SECONDS)
+        elif status == "ERROR":
+            console.print(f"[bold red]✖ Session Error at Page {stop_page}. Stopping.[/]")
+            break
+        else:
+            console.print(f"[bold red]Unknown status {status}. Stopping.[/]")
+            break
+
+    return status, all_stats
+
+
+def main_loop(suffix=None, start_page=None, end_page=None, base_url=None, interactive=True):
+    """
+    Live scrape & upload. Without arguments it behaves as before (asks for the suffix);
+    with interactive=False it never prompts and falls back to config defaults.
+    """
+    setup_logging("scraper.log")
     try:
         console.print(Panel(Text("Medidesh Live Browser Scraper & Uploader", justify="center", style="bold cyan"), expand=False))
         
-        start_page = int(config.START_PAGE)
-        end_page = int(config.END_PAGE)
+        start_page = int(start_page or config.START_PAGE)
+        end_page = int(end_page or config.END_PAGE)
         
-        # User Input for Suffix (Ask once)
-        suffix_input = Prompt.ask("What is the [cyan]list suffix[/]? (e.g. ACI Limited) [dim][Default: All][/dim]", default="").strip()
+        if suffix is None and interactive:
+            # User Input for Suffix (Ask once)
+            suffix = Prompt.ask("What is the [cyan]list suffix[/]? (e.g. ACI Limited) [dim][Default: All][/dim]", default="")
+        suffix_input = (suffix or "").strip()
             
         if not suffix_input:
             suffix = config.DEFAULT_SUFFIX
@@ -614,36 +976,11 @@ def main_loop():
         console.print(f"[dim]Deduplication File: {filename}[/dim]\n")
         logger.info(f"Deduplication File: {filename}")
 
-        current_page = start_page
-        all_stats = {'inserted': 0, 'skipped': 0, 'errors': 0, 'total': 0}
-        
-        while current_page <= end_page:
-            console.print(f"\n[bold magenta]=== Starting Session from Page {current_page} ===[/]")
-            scraper = MedexBrowserScraper()
-            
-            try:
-                status, stop_page, session_stats = scraper.run_session(current_page, end_page, filename, suffix)
-                if session_stats:
-                    all_stats['inserted'] += session_stats.get('inserted', 0)
-                    all_stats['skipped'] += session_stats.get('skipped', 0)
-                    all_stats['errors'] += session_stats.get('errors', 0)
-                    all_stats['total'] += session_stats.get('total', 0)
-            finally:
-                scraper.cleanup()
-            
-            if status == "DONE":
-                console.print("\n[bold green]✨ Scraping Completed Successfully![/]")
-                break
-            elif status == "BLOCKED":
-                console.print(f"[bold yellow]⚠ Session Blocked at Page {stop_page}. Restarting in 10 seconds...[/]")
-                current_page = stop_page # Resume from the page we got blocked on
-                time.sleep(10)
-            elif status == "ERROR":
-                console.print(f"[bold red]✖ Session Error at Page {stop_page}. Stopping.[/]")
-                break
-            else:
-                console.print(f"[bold red]Unknown status {status}. Stopping.[/]")
-                break
+        sessions = SessionManager(base_url=base_url)
+        try:
+            _, all_stats = run_crawl(sessions, start_page, end_page, filename, suffix)
+        finally:
+            sessions.close()
                 
         # Print Final Summary Table
         console.print("\n")
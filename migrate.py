@@ -0,0 +1,199 @@
+"""
+Versioned SQL migrations (migrations/NNN_name.sql) and an index-usage check.
+
+    python migrate.py status            # applied / pending migrations
+    python migrate.py up                # apply pending migrations in order
+    python migrate.py check             # EXPLAIN ANALYZE the hot queries, fail if one is not index-backed
+
+Applied versions are recorded in public.schema_migrations. Each file runs in its
+own transaction, except files whose first line is `-- migrate: no-transaction`
+(needed for CREATE INDEX CONCURRENTLY), which run statement by statement.
+
+`check` runs with enable_seqscan off, so on a small local database it proves an
+index *can* serve each query (the planner would otherwise pick a seq scan on a
+few hundred rows). Run it against a scratch copy loaded with the schema dump:
+
+    psql -d medidesh_local -f "MedideshDb -  Feb 27.sql"
+    psql -d medidesh_local -f fix_rpc.sql
+    python migrate.py up --dsn postgresql://localhost/medidesh_local
+    python migrate.py check --dsn postgresql://localhost/medidesh_local
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+
+from rich.console import Console
+from rich.table import Table
+
+import config
+
+try:
+    import psycopg
+except ImportError:
+    psycopg = None
+
+console = Console()
+
+MIGRATIONS_DIR = "migrations"
+NO_TRANSACTION = "-- migrate: no-transaction"
+
+CREATE_LEDGER_SQL = """
+CREATE TABLE IF NOT EXISTS public.schema_migrations (
+    version text PRIMARY KEY,
+    applied_at timestamptz NOT NULL DEFAULT now()
+)
+"""
+
+# (name, query, params, indexes that may serve it)
+HOT_QUERIES = [
+    ("existence check (MEDICINE)",
+     "SELECT id FROM public.inventory_global WHERE brand = %s AND strength = %s AND category = %s",
+     ("Napa", "500 mg", "Tablet"), ("idx_inventory_global_brand_strength_category",)),
+    ("existence check (OTHER)",
+     "SELECT id FROM public.inventory_global WHERE name = %s AND category = %s",
+     ("Surgical Mask", "Miscellaneous"), ("idx_inventory_global_name_category",)),
+    ("generic lookup (ilike)",
+     "SELECT id FROM public.inventory_generics WHERE name ILIKE %s",
+     ("Paracetamol",), ("idx_inventory_generics_search", "idx_inventory_generics_name_unique")),
+    ("manufacturer lookup (ilike)",
+     "SELECT id FROM public.inventory_manufacturers WHERE name ILIKE %s",
+     ("Incepta Pharmaceuticals Ltd.",), ("idx_inventory_manufacturers_search", "idx_inventory_manufacturers_name_unique")),
+    ("RPC dimension conflict key",
+     "SELECT id FROM public.inventory_generics WHERE lower(btrim(name)) = lower(btrim(%s))",
+     ("Paracetamol",), ("idx_inventory_generics_name_unique",)),
+    ("RPC manufacturer lookup (migrations/004)",
+     "SELECT id FROM public.inventory_manufacturers WHERE lower(btrim(name)) = lower(btrim(%s))",
+     ("Incepta Pharmaceuticals Ltd.",), ("idx_inventory_manufacturers_name_unique",)),
+    ("RPC medicine conflict key",
+     "SELECT id FROM public.inventory_global WHERE type = 'MEDICINE' AND lower(btrim(brand)) = lower(btrim(%s)) "
+     "AND generic_id IS NULL AND lower(btrim(COALESCE(strength, ''))) = %s AND manufacturer_id IS NULL "
+     "AND lower(btrim(category)) = %s",
+     ("Napa", "500mg", "tablet"), ("idx_inventory_global_unique_medicine",)),
+    ("incremental export",
+     "SELECT id FROM public.inventory_global WHERE updated_at > now() - interval '1 day'",
+     (), ("idx_inventory_global_updated_at",)),
+    ("lookup by medex_url",
+     "SELECT id FROM public.inventory_global WHERE medex_url = %s",
+     ("https://medex.com.bd/brands/31999/abdolax-10-mg-tablet",), ("idx_inventory_global_medex_url",)),
+    ("dashboard count per category",
+     "SELECT type, category, count(*) FROM public.inventory_global GROUP BY type, category",
+     (), ("idx_inventory_global_type_category",)),
+    ("brand search (ilike)",
+     "SELECT id FROM public.inventory_global WHERE brand ILIKE %s",
+     ("%napa%",), ("idx_inventory_global_brand_trgm",)),
+    ("repair job: rows on a placeholder generic",
+     "SELECT id FROM public.inventory_global WHERE generic_id = ANY(%s::uuid[])",
+     (["00000000-0000-0000-0000-000000000000"],), ("idx_inventory_global_generic_id",)),
+]
+
+
+def migration_files():
+    """[(version, path)] sorted by version, version = file name without .sql."""
+    paths = sorted(glob.glob(os.path.join(MIGRATIONS_DIR, "*.sql")))
+    return [(os.path.basename(p)[:-4], p) for p in paths]
+
+
+def split_statements(sql):
+    """Splits a no-transaction migration on ';' at line ends (such files hold no function bodies)."""
+    body = "\n".join(line for line in sql.splitlines() if not line.strip().startswith("--"))
+    return [s.strip() for s in re.split(r";\s*(?:\n|$)", body) if s.strip()]
+
+
+def applied_versions(conn):
+    conn.execute(CREATE_LEDGER_SQL)
+    return {row[0] for row in conn.execute("SELECT version FROM public.schema_migrations")}
+
+
+def migrate_up(dsn):
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        done = applied_versions(conn)
+        applied = []
+        for version, path in migration_files():
+            if version in done:
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                sql = f.read()
+            console.print(f"[cyan]Applying {version}...[/]")
+            if sql.lstrip().startswith(NO_TRANSACTION):
+                for statement in split_statements(sql):
+                    conn.execute(statement)
+                conn.execute("INSERT INTO public.schema_migrations (version) VALUES (%s)", (version,))
+            else:
+                with conn.transaction():
+                    conn.execute(sql)
+                    conn.execute("INSERT INTO public.schema_migrations (version) VALUES (%s)", (version,))
+            applied.append(version)
+        return applied
+
+
+def plan_indexes(plan):
+    """Index names used anywhere in an EXPLAIN (FORMAT JSON) plan tree."""
+    found = set()
+    if 'Index Name' in plan:
+        found.add(plan['Index Name'])
+    for child in plan.get('Plans', []):
+        found |= plan_indexes(child)
+    return found
+
+
+def check_queries(dsn):
+    """Returns [(name, ok, used_indexes, ms)] for HOT_QUERIES."""
+    results = []
+    with psycopg.connect(dsn) as conn:
+        conn.execute("SET enable_seqscan = off")
+        for name, query, params, expected in HOT_QUERIES:
+            try:
+                row = conn.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {query}", params).fetchone()
+                explain = row[0][0]
+                used = plan_indexes(explain['Plan'])
+                results.append((name, bool(used & set(expected)), used, explain.get('Execution Time', 0.0)))
+            except Exception as e:
+                conn.rollback()
+                conn.execute("SET enable_seqscan = off")
+                results.append((name, False, {f"error: {e}"}, 0.0))
+        conn.rollback()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply SQL migrations / check index usage of hot queries.")
+    parser.add_argument("command", choices=("status", "up", "check"))
+    parser.add_argument("--dsn", default=config.DATABASE_URL, help="Postgres connection string (default: config.DATABASE_URL)")
+    args = parser.parse_args(argv)
+
+    if psycopg is None:
+        console.print("[bold red]psycopg is not installed.[/] Run: pip install 'psycopg[binary]'")
+        return 2
+    if not args.dsn:
+        console.print("[bold red]No connection string. Set DATABASE_URL in config.py or pass --dsn.[/]")
+        return 2
+
+    if args.command == "status":
+        with psycopg.connect(args.dsn, autocommit=True) as conn:
+            done = applied_versions(conn)
+        for version, _ in migration_files():
+            mark = "[green]applied[/]" if version in done else "[yellow]pending[/]"
+            console.print(f"{version:40} {mark}")
+        return 0
+
+    if args.command == "up":
+        applied = migrate_up(args.dsn)
+        console.print(f"[bold green]✓ {len(applied)} migration(s) applied.[/]" if applied else "[green]Up to date.[/]")
+        return 0
+
+    results = check_queries(args.dsn)
+    table = Table(title="Hot query index check (EXPLAIN ANALYZE, seqscan off)", show_header=True, header_style="bold")
+    table.add_column("Query")
+    table.add_column("Index used")
+    table.add_column("ms", justify="right")
+    table.add_column("OK", justify="center")
+    for name, ok, used, ms in results:
+        table.add_row(name, ", ".join(sorted(used)) or "-", f"{ms:.2f}", "[green]✓[/]" if ok else "[red]✖[/]")
+    console.print(table)
+    return 0 if all(ok for _, ok, _, _ in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
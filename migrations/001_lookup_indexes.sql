@@ -0,0 +1,33 @@
+-- migrate: no-transaction
+-- Indexes behind the hot lookups of the scraper / uploaders / exporter / dashboard.
+-- Built CONCURRENTLY so a live catalogue keeps accepting inserts while they build.
+
+-- bulk_uploader / upload_supabase existence check: .match({brand, strength, category})
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_inventory_global_brand_strength_category
+    ON public.inventory_global USING btree (brand, strength, category);
+
+-- Same check for OTHER rows: .match({name, category})
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_inventory_global_name_category
+    ON public.inventory_global USING btree (name, category)
+    WHERE name IS NOT NULL;
+
+-- Incremental export / change-detector cache refresh: updated_at > since
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_inventory_global_updated_at
+    ON public.inventory_global USING btree (updated_at);
+
+-- Lookups by Medex page (repair job, dedup against the catalogue)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_inventory_global_medex_url
+    ON public.inventory_global USING btree (medex_url)
+    WHERE medex_url IS NOT NULL;
+
+-- Dashboard counts / group-bys per type and category
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_inventory_global_type_category
+    ON public.inventory_global USING btree (type, category);
+
+-- Substring / ilike brand search
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_inventory_global_brand_trgm
+    ON public.inventory_global USING gin (brand extensions.gin_trgm_ops);
+
+-- resolve_dependency_direct uses ilike(name, value) on the dimension tables; the existing
+-- gin trigram indexes (idx_inventory_generics_search / idx_inventory_manufacturers_search)
+-- already serve it, and migrate.py check verifies that.
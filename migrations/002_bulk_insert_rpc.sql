@@ -0,0 +1,90 @@
+-- Set-based variant of global_inventory_add_data_from_python.
+--
+--   SELECT public.global_inventory_add_data_bulk('[{"p_type": "MEDICINE", "p_brand": ...}, ...]'::jsonb);
+--
+-- Takes an array of the single-row RPC payloads (same p_* keys) and does per batch
+-- what the single RPC does per row: trimmed dimension names with 'Unknown Generic' /
+-- 'Unknown Manufacturer' fallbacks for MEDICINE, text_to_unit_enum for units and
+-- ON CONFLICT DO NOTHING on idx_inventory_global_unique_medicine. Dimension rows are
+-- inserted with DO NOTHING (no row locks on existing names, unlike DO UPDATE).
+-- Returns {"code": "SUCCESS", "received": n, "inserted": k} or INTERNAL_ERROR.
+
+CREATE OR REPLACE FUNCTION public.global_inventory_add_data_bulk(p_rows jsonb)
+RETURNS json
+    LANGUAGE plpgsql SECURITY DEFINER
+    SET search_path TO 'public'
+    AS $$
+DECLARE
+    v_received integer;
+    v_inserted integer := 0;
+    v_count integer;
+BEGIN
+    CREATE TEMP TABLE IF NOT EXISTS _bulk_rows (
+        p_type text, p_category text, p_brand text, p_generic_name text, p_strength text,
+        p_manufacturer_name text, p_name text, p_primary_unit text, p_secondary_unit text,
+        p_conversion_rate integer, p_item_code text, p_medex_url text
+    ) ON COMMIT DROP;
+    TRUNCATE _bulk_rows;
+
+    INSERT INTO _bulk_rows
+    SELECT r.p_type, COALESCE(NULLIF(btrim(r.p_category), ''), 'Miscellaneous'), r.p_brand,
+           CASE WHEN r.p_type = 'MEDICINE' THEN COALESCE(NULLIF(btrim(r.p_generic_name), ''), 'Unknown Generic')
+                ELSE NULLIF(btrim(r.p_generic_name), '') END,
+           r.p_strength,
+           CASE WHEN r.p_type = 'MEDICINE' THEN COALESCE(NULLIF(btrim(r.p_manufacturer_name), ''), 'Unknown Manufacturer')
+                ELSE NULLIF(btrim(r.p_manufacturer_name), '') END,
+           r.p_name, r.p_primary_unit, r.p_secondary_unit, r.p_conversion_rate, r.p_item_code, r.p_medex_url
+    FROM jsonb_to_recordset(p_rows) AS r(
+        p_type text, p_category text, p_brand text, p_generic_name text, p_strength text,
+        p_manufacturer_name text, p_name text, p_primary_unit text, p_secondary_unit text,
+        p_conversion_rate integer, p_item_code text, p_medex_url text
+    );
+    GET DIAGNOSTICS v_received = ROW_COUNT;
+
+    INSERT INTO public.inventory_generics (name)
+    SELECT DISTINCT ON (lower(p_generic_name)) p_generic_name
+    FROM _bulk_rows WHERE p_generic_name IS NOT NULL
+    ON CONFLICT (lower(btrim(name))) DO NOTHING;
+
+    INSERT INTO public.inventory_manufacturers (name)
+    SELECT DISTINCT ON (lower(p_manufacturer_name)) p_manufacturer_name
+    FROM _bulk_rows WHERE p_manufacturer_name IS NOT NULL
+    ON CONFLICT (lower(btrim(name))) DO NOTHING;
+
+    INSERT INTO public.inventory_global (
+        type, category, brand, generic_id, strength, manufacturer_id, name,
+        primary_unit, secondary_unit, conversion_rate, item_code, medex_url, entry_status
+    )
+    SELECT CAST(s.p_type AS public.inventory_type_enum), s.p_category, s.p_brand, gen.id, s.p_strength, man.id, s.p_name,
+           COALESCE(public.text_to_unit_enum(s.p_primary_unit), 'piece'::public.unit_enum),
+           public.text_to_unit_enum(s.p_secondary_unit),
+           COALESCE(s.p_conversion_rate, 1), COALESCE(s.p_item_code, ''), s.p_medex_url, 'AI_L1'
+    FROM _bulk_rows s
+    LEFT JOIN public.inventory_generics gen ON lower(btrim(gen.name)) = lower(s.p_generic_name)
+    LEFT JOIN public.inventory_manufacturers man ON lower(btrim(man.name)) = lower(s.p_manufacturer_name)
+    WHERE s.p_type = 'MEDICINE'
+    ON CONFLICT (lower(btrim(brand)), generic_id, lower(btrim(COALESCE(strength, ''::text))), manufacturer_id, lower(btrim(category))) WHERE (type = 'MEDICINE'::public.inventory_type_enum) DO NOTHING;
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    v_inserted := v_inserted + v_count;
+
+    INSERT INTO public.inventory_global (
+        type, category, brand, generic_id, strength, manufacturer_id, name,
+        primary_unit, secondary_unit, conversion_rate, item_code, medex_url, entry_status
+    )
+    SELECT CAST(s.p_type AS public.inventory_type_enum), s.p_category, NULL, NULL, NULL, man.id, s.p_name,
+           COALESCE(public.text_to_unit_enum(s.p_primary_unit), 'piece'::public.unit_enum),
+           public.text_to_unit_enum(s.p_secondary_unit),
+           COALESCE(s.p_conversion_rate, 1), COALESCE(s.p_item_code, ''), s.p_medex_url, 'AI_L1'
+    FROM _bulk_rows s
+    LEFT JOIN public.inventory_manufacturers man ON lower(btrim(man.name)) = lower(s.p_manufacturer_name)
+    WHERE s.p_type = 'OTHER';
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    v_inserted := v_inserted + v_count;
+
+    RETURN json_build_object('code', 'SUCCESS', 'received', v_received, 'inserted', v_inserted);
+EXCEPTION WHEN OTHERS THEN
+    RETURN json_build_object('code', 'INTERNAL_ERROR', 'message', SQLERRM);
+END;
+$$;
+
+GRANT ALL ON FUNCTION public.global_inventory_add_data_bulk(jsonb) TO service_role;
@@ -0,0 +1,147 @@
+-- Dimension rows without row locks in global_inventory_add_data_from_python.
+--
+-- The RPC used to resolve the generic and manufacturer with
+--     INSERT ... ON CONFLICT (lower(btrim(name))) DO UPDATE SET name = EXCLUDED.name
+-- which takes a row lock (and writes a new row version) on the existing name on
+-- every call. Concurrent calls for one manufacturer or a popular generic queued
+-- behind each other until the previous transaction ended.
+--
+-- resolve_inventory_generic / resolve_inventory_manufacturer SELECT the existing
+-- row first (plain read, no lock) and insert only names that are new (DO NOTHING,
+-- then re-SELECT if a concurrent call created the name). The first spelling of a
+-- name now stays, like name_index.py's canonical spelling. Result codes are as in
+-- migrations/003. bulk_uploader additionally lets only one in-flight row create a
+-- given new name (key_scheduler.py); bench_rpc_load.py --schedule measures both.
+
+CREATE OR REPLACE FUNCTION public.resolve_inventory_generic(p_name text) RETURNS uuid
+    LANGUAGE plpgsql SECURITY DEFINER
+    SET search_path TO 'public'
+    AS $$
+DECLARE
+    v_id UUID;
+BEGIN
+    SELECT id INTO v_id FROM public.inventory_generics WHERE lower(btrim(name)) = lower(btrim(p_name));
+    IF v_id IS NULL THEN
+        INSERT INTO public.inventory_generics (name)
+        VALUES (TRIM(p_name))
+        ON CONFLICT (lower(btrim(name))) DO NOTHING
+        RETURNING id INTO v_id;
+        IF v_id IS NULL THEN
+            -- Inserted by a concurrent call after our SELECT
+            SELECT id INTO v_id FROM public.inventory_generics WHERE lower(btrim(name)) = lower(btrim(p_name));
+        END IF;
+    END IF;
+    RETURN v_id;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.resolve_inventory_manufacturer(p_name text) RETURNS uuid
+    LANGUAGE plpgsql SECURITY DEFINER
+    SET search_path TO 'public'
+    AS $$
+DECLARE
+    v_id UUID;
+BEGIN
+    SELECT id INTO v_id FROM public.inventory_manufacturers WHERE lower(btrim(name)) = lower(btrim(p_name));
+    IF v_id IS NULL THEN
+        INSERT INTO public.inventory_manufacturers (name)
+        VALUES (TRIM(p_name))
+        ON CONFLICT (lower(btrim(name))) DO NOTHING
+        RETURNING id INTO v_id;
+        IF v_id IS NULL THEN
+            -- Inserted by a concurrent call after our SELECT
+            SELECT id INTO v_id FROM public.inventory_manufacturers WHERE lower(btrim(name)) = lower(btrim(p_name));
+        END IF;
+    END IF;
+    RETURN v_id;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.global_inventory_add_data_from_python(
+    p_type text, 
+    p_category text, 
+    p_brand text, 
+    p_generic_name text, 
+    p_strength text, 
+    p_manufacturer_name text, 
+    p_name text, 
+    p_primary_unit text, 
+    p_secondary_unit text, 
+    p_conversion_rate integer, 
+    p_item_code text, 
+    p_medex_url text
+) RETURNS json
+    LANGUAGE plpgsql SECURITY DEFINER
+    SET search_path TO 'public'
+    AS $$
+DECLARE
+    v_generic_id UUID;
+    v_manufacturer_id UUID;
+    v_enum_primary_unit public.unit_enum;
+    v_enum_secondary_unit public.unit_enum;
+    v_new_id UUID;
+BEGIN
+    IF p_generic_name IS NOT NULL AND p_generic_name != '' THEN 
+        v_generic_id := public.resolve_inventory_generic(p_generic_name);
+    END IF;
+
+    IF p_manufacturer_name IS NOT NULL AND p_manufacturer_name != '' THEN 
+        v_manufacturer_id := public.resolve_inventory_manufacturer(p_manufacturer_name);
+    END IF;
+    
+    -- Fallbacks to satisfy `inventory_global_data_integrity`
+    IF p_type = 'MEDICINE' THEN
+        IF v_generic_id IS NULL THEN
+            v_generic_id := public.resolve_inventory_generic('Unknown Generic');
+        END IF;
+        
+        IF v_manufacturer_id IS NULL THEN
+            v_manufacturer_id := public.resolve_inventory_manufacturer('Unknown Manufacturer');
+        END IF;
+    END IF;
+    
+    v_enum_primary_unit := COALESCE(public.text_to_unit_enum(p_primary_unit), 'piece'::public.unit_enum);
+    v_enum_secondary_unit := public.text_to_unit_enum(p_secondary_unit);
+
+    IF p_type = 'MEDICINE' THEN
+        INSERT INTO public.inventory_global (
+            type, category, brand, generic_id, strength, manufacturer_id, name,
+            primary_unit, secondary_unit, conversion_rate, item_code, medex_url, entry_status
+        )
+        VALUES (
+            CAST(p_type AS public.inventory_type_enum), p_category, p_brand, v_generic_id, p_strength, v_manufacturer_id, p_name,
+            v_enum_primary_unit, v_enum_secondary_unit, COALESCE(p_conversion_rate, 1), COALESCE(p_item_code, ''), p_medex_url, 'AI_L1'
+        )
+        ON CONFLICT (lower(btrim(brand)), generic_id, lower(btrim(COALESCE(strength, ''::text))), manufacturer_id, lower(btrim(category))) WHERE (type = 'MEDICINE'::public.inventory_type_enum) DO NOTHING
+        RETURNING id INTO v_new_id;
+    ELSE
+        -- No unique index for OTHER rows: same (name, category) check the uploaders used to do
+        IF EXISTS (
+            SELECT 1 FROM public.inventory_global
+            WHERE type = 'OTHER'::public.inventory_type_enum
+              AND lower(btrim(name)) = lower(btrim(p_name))
+              AND lower(btrim(category)) = lower(btrim(p_category))
+        ) THEN
+            RETURN json_build_object('code', 'DUPLICATE', 'id', NULL);
+        END IF;
+
+        INSERT INTO public.inventory_global (
+            type, category, brand, generic_id, strength, manufacturer_id, name,
+            primary_unit, secondary_unit, conversion_rate, item_code, medex_url, entry_status
+        )
+        VALUES (
+            CAST(p_type AS public.inventory_type_enum), p_category, p_brand, v_generic_id, p_strength, v_manufacturer_id, p_name,
+            v_enum_primary_unit, v_enum_secondary_unit, COALESCE(p_conversion_rate, 1), COALESCE(p_item_code, ''), p_medex_url, 'AI_L1'
+        )
+        RETURNING id INTO v_new_id;
+    END IF;
+
+    -- RETURNING produced no row: ON CONFLICT DO NOTHING skipped an existing medicine
+    IF v_new_id IS NULL THEN
+        RETURN json_build_object('code', 'DUPLICATE', 'id', NULL);
+    END IF;
+    RETURN json_build_object('code', 'INSERTED', 'id', v_new_id);
+EXCEPTION WHEN OTHERS THEN
+    RETURN json_build_object('code', 'INTERNAL_ERROR', 'message', SQLERRM);
+END;
+$$;
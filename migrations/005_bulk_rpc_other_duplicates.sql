@@ -0,0 +1,97 @@
+-- OTHER rows in global_inventory_add_data_bulk skip (name, category) duplicates.
+--
+-- Same function as 002, except for OTHER rows. There is no unique index for
+-- them, so the bulk insert used to add a second copy of a row that already
+-- existed (e.g. when dead_letter.redrive re-sends a row whose timed-out upload
+-- had landed). It now applies the same (name, category) check as the single-row
+-- RPC (migrations/003) and keeps one row per (name, category) within a batch.
+-- MEDICINE rows are unchanged (ON CONFLICT DO NOTHING on the unique index).
+
+CREATE OR REPLACE FUNCTION public.global_inventory_add_data_bulk(p_rows jsonb)
+RETURNS json
+    LANGUAGE plpgsql SECURITY DEFINER
+    SET search_path TO 'public'
+    AS $$
+DECLARE
+    v_received integer;
+    v_inserted integer := 0;
+    v_count integer;
+BEGIN
+    CREATE TEMP TABLE IF NOT EXISTS _bulk_rows (
+        p_type text, p_category text, p_brand text, p_generic_name text, p_strength text,
+        p_manufacturer_name text, p_name text, p_primary_unit text, p_secondary_unit text,
+        p_conversion_rate integer, p_item_code text, p_medex_url text
+    ) ON COMMIT DROP;
+    TRUNCATE _bulk_rows;
+
+    INSERT INTO _bulk_rows
+    SELECT r.p_type, COALESCE(NULLIF(btrim(r.p_category), ''), 'Miscellaneous'), r.p_brand,
+           CASE WHEN r.p_type = 'MEDICINE' THEN COALESCE(NULLIF(btrim(r.p_generic_name), ''), 'Unknown Generic')
+                ELSE NULLIF(btrim(r.p_generic_name), '') END,
+           r.p_strength,
+           CASE WHEN r.p_type = 'MEDICINE' THEN COALESCE(NULLIF(btrim(r.p_manufacturer_name), ''), 'Unknown Manufacturer')
+                ELSE NULLIF(btrim(r.p_manufacturer_name), '') END,
+           r.p_name, r.p_primary_unit, r.p_secondary_unit, r.p_conversion_rate, r.p_item_code, r.p_medex_url
+    FROM jsonb_to_recordset(p_rows) AS r(
+        p_type text, p_category text, p_brand text, p_generic_name text, p_strength text,
+        p_manufacturer_name text, p_name text, p_primary_unit text, p_secondary_unit text,
+        p_conversion_rate integer, p_item_code text, p_medex_url text
+    );
+    GET DIAGNOSTICS v_received = ROW_COUNT;
+
+    INSERT INTO public.inventory_generics (name)
+    SELECT DISTINCT ON (lower(p_generic_name)) p_generic_name
+    FROM _bulk_rows WHERE p_generic_name IS NOT NULL
+    ON CONFLICT (lower(btrim(name))) DO NOTHING;
+
+    INSERT INTO public.inventory_manufacturers (name)
+    SELECT DISTINCT ON (lower(p_manufacturer_name)) p_manufacturer_name
+    FROM _bulk_rows WHERE p_manufacturer_name IS NOT NULL
+    ON CONFLICT (lower(btrim(name))) DO NOTHING;
+
+    INSERT INTO public.inventory_global (
+        type, category, brand, generic_id, strength, manufacturer_id, name,
+        primary_unit, secondary_unit, conversion_rate, item_code, medex_url, entry_status
+    )
+    SELECT CAST(s.p_type AS public.inventory_type_enum), s.p_category, s.p_brand, gen.id, s.p_strength, man.id, s.p_name,
+           COALESCE(public.text_to_unit_enum(s.p_primary_unit), 'piece'::public.unit_enum),
+           public.text_to_unit_enum(s.p_secondary_unit),
+           COALESCE(s.p_conversion_rate, 1), COALESCE(s.p_item_code, ''), s.p_medex_url, 'AI_L1'
+    FROM _bulk_rows s
+    LEFT JOIN public.inventory_generics gen ON lower(btrim(gen.name)) = lower(s.p_generic_name)
+    LEFT JOIN public.inventory_manufacturers man ON lower(btrim(man.name)) = lower(s.p_manufacturer_name)
+    WHERE s.p_type = 'MEDICINE'
+    ON CONFLICT (lower(btrim(brand)), generic_id, lower(btrim(COALESCE(strength, ''::text))), manufacturer_id, lower(btrim(category))) WHERE (type = 'MEDICINE'::public.inventory_type_enum) DO NOTHING;
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    v_inserted := v_inserted + v_count;
+
+    INSERT INTO public.inventory_global (
+        type, category, brand, generic_id, strength, manufacturer_id, name,
+        primary_unit, secondary_unit, conversion_rate, item_code, medex_url, entry_status
+    )
+    SELECT CAST(s.p_type AS public.inventory_type_enum), s.p_category, NULL, NULL, NULL, man.id, s.p_name,
+           COALESCE(public.text_to_unit_enum(s.p_primary_unit), 'piece'::public.unit_enum),
+           public.text_to_unit_enum(s.p_secondary_unit),
+           COALESCE(s.p_conversion_rate, 1), COALESCE(s.p_item_code, ''), s.p_medex_url, 'AI_L1'
+    FROM (
+        -- One row per (name, category) within the batch
+        SELECT DISTINCT ON (lower(btrim(p_name)), lower(btrim(p_category))) *
+        FROM _bulk_rows WHERE p_type = 'OTHER'
+    ) s
+    LEFT JOIN public.inventory_manufacturers man ON lower(btrim(man.name)) = lower(s.p_manufacturer_name)
+    WHERE NOT EXISTS (
+        SELECT 1 FROM public.inventory_global g
+        WHERE g.type = 'OTHER'::public.inventory_type_enum
+          AND lower(btrim(g.name)) = lower(btrim(s.p_name))
+          AND lower(btrim(g.category)) = lower(btrim(s.p_category))
+    );
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    v_inserted := v_inserted + v_count;
+
+    RETURN json_build_object('code', 'SUCCESS', 'received', v_received, 'inserted', v_inserted);
+EXCEPTION WHEN OTHERS THEN
+    RETURN json_build_object('code', 'INTERNAL_ERROR', 'message', SQLERRM);
+END;
+$$;
+
+GRANT ALL ON FUNCTION public.global_inventory_add_data_bulk(jsonb) TO service_role;
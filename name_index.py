@@ -0,0 +1,281 @@
+"""
+Name-normalization index for inventory_generics / inventory_manufacturers.
+
+The RPC only dedupes dimension names on lower(btrim(name)), so spelling variants
+("Incepta Pharmaceuticals Ltd." / "Incepta Pharmaceuticals Ltd") become separate
+rows. `normalize_name` folds those variants to one key (Unicode folding, case,
+punctuation, whitespace and, for manufacturers, trailing corporate suffixes) and
+the index maps key -> (id, canonical name), stored in data/name_index.json.
+
+Uploaders pass every payload through `canonicalize_payload`, which swaps the raw
+names for the canonical spelling so the RPC finds the existing row. Names not in
+the index are registered as canonical for their key, so later variants in the
+same run also collapse onto the first spelling.
+
+    python name_index.py build           # rebuild the index from the dimension tables
+    python name_index.py merge           # report duplicate groups (dry run)
+    python name_index.py merge --apply   # re-point references and delete duplicates (needs DATABASE_URL)
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import unicodedata
+
+import config
+
+INDEX_FILE = "data/name_index.json"
+
+TABLES = {
+    "generic": "inventory_generics",
+    "manufacturer": "inventory_manufacturers",
+}
+
+# Legal-form words dropped from the end of manufacturer names
+CORPORATE_SUFFIXES = {
+    "ltd", "limited", "pvt", "private", "plc", "inc", "incorporated", "co", "company",
+    "corp", "corporation", "llc", "gmbh", "ag", "sa",
+}
+
+_PUNCT = re.compile(r"[^\w+/%]+")
+_SPACED = re.compile(r"\s*([+/])\s*")
+
+
+def normalize_name(raw, kind="manufacturer"):
+    """Lookup key for a dimension name; '' for blank input."""
+    if not raw:
+        return ""
+    text = unicodedata.normalize("NFKD", raw)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    text = text.replace("&", " and ")
+    text = _PUNCT.sub(" ", text)
+    text = _SPACED.sub(r" \1 ", text)
+    tokens = text.split()
+    if kind == "manufacturer":
+        while len(tokens) > 1 and tokens[-1] in CORPORATE_SUFFIXES:
+            tokens.pop()
+    return " ".join(tokens)
+
+
+class NameIndex:
+    """key -> [id, canonical name] per kind. `id` is None for names not yet seen remotely."""
+
+    def __init__(self, path=INDEX_FILE, load=True):
+        self.path = path
+        self.entries = {kind: {} for kind in TABLES}
+        self._lock = threading.Lock()
+        self._seen = {kind: {} for kind in TABLES}  # exact raw spelling -> canonical
+        if load and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for kind in TABLES:
+                self.entries[kind].update(data.get(kind, {}))
+
+    def canonical(self, kind, raw):
+        """Canonical spelling for `raw` (registers it if its key is new)."""
+        seen = self._seen[kind].get(raw)
+        if seen is not None:
+            return seen
+        if raw is None or not str(raw).strip():
+            return raw
+        name = str(raw).strip()
+        key = normalize_name(name, kind)
+        with self._lock:
+            entry = self.entries[kind].setdefault(key, [None, name])
+        self._seen[kind][raw] = entry[1]
+        return entry[1]
+
+    def lookup_id(self, kind, raw):
+        entry = self.entries[kind].get(normalize_name(raw, kind))
+        return entry[0] if entry else None
+
+    def add(self, kind, row_id, name):
+        """Adds a remote row; the first spelling seen for a key stays canonical."""
+        key = normalize_name(name, kind)
+        current = self.entries[kind].get(key)
+        if current is None or current[0] is None:
+            self.entries[kind][key] = [row_id, name.strip()]
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Process-wide index, loaded on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = NameIndex()
+    return _index
+
+
+def canonicalize_payload(payload, index=None):
+    """Replaces p_generic_name / p_manufacturer_name with their canonical spellings (in place)."""
+    index = index or get_index()
+    if payload.get('p_generic_name'):
+        payload['p_generic_name'] = index.canonical("generic", payload['p_generic_name'])
+    if payload.get('p_manufacturer_name'):
+        payload['p_manufacturer_name'] = index.canonical("manufacturer", payload['p_manufacturer_name'])
+    return payload
+
+
+def fetch_dimension(supabase, table, page_size=1000):
+    """All (id, name, created_at) rows of a dimension table, keyset-paginated on id."""
+    rows, last_id = [], None
+    while True:
+        q = supabase.table(table).select("id,name,created_at")
+        if last_id:
+            q = q.gt("id", last_id)
+        page = q.order("id").limit(page_size).execute().data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        last_id = page[-1]['id']
+
+
+def build_index(path=INDEX_FILE, supabase=None):
+    """Rebuilds the index from the dimension tables; returns {kind: (rows, keys)}."""
+    if supabase is None:
+        from exporter import make_client
+        supabase = make_client()
+    index = NameIndex(path=path, load=False)  # From scratch, not merged into the old file
+    summary = {}
+    for kind, table in TABLES.items():
+        rows = fetch_dimension(supabase, table)
+        # Oldest spelling wins until the merge job collapses the group
+        for row in sorted(rows, key=lambda r: (r['created_at'], r['id'])):
+            index.add(kind, row['id'], row['name'])
+        summary[kind] = (len(rows), len(index.entries[kind]))
+    index.save()
+    return summary
+
+
+# Every dimension row with its reference count across both inventory tables
+DIMENSION_USAGE_SQL = """
+SELECT d.id, d.name,
+       (SELECT count(*) FROM public.inventory_global g WHERE g.{col} = d.id)
+     + (SELECT count(*) FROM public.inventory i WHERE i.{col} = d.id) AS refs
+FROM public.{table} d
+ORDER BY d.created_at, d.id
+"""
+
+# Re-point one duplicate, except medicine rows whose canonical twin already exists
+# (they would violate idx_inventory_global_unique_medicine and are left for review).
+REPOINT_GLOBAL_SQL = """
+UPDATE public.inventory_global g SET {col} = %(keep)s
+WHERE g.{col} = %(dup)s
+  AND NOT (g.type = 'MEDICINE' AND EXISTS (
+      SELECT 1 FROM public.inventory_global t
+      WHERE t.type = 'MEDICINE'
+        AND t.{col} = %(keep)s
+        AND t.{other} IS NOT DISTINCT FROM g.{other}
+        AND lower(btrim(t.brand)) = lower(btrim(g.brand))
+        AND lower(btrim(COALESCE(t.strength, ''))) = lower(btrim(COALESCE(g.strength, '')))
+        AND lower(btrim(t.category)) = lower(btrim(g.category))))
+"""
+
+REPOINT_INVENTORY_SQL = "UPDATE public.inventory SET {col} = %(keep)s WHERE {col} = %(dup)s"
+
+DELETE_UNUSED_SQL = """
+DELETE FROM public.{table} d WHERE d.id = %(dup)s
+  AND NOT EXISTS (SELECT 1 FROM public.inventory_global g WHERE g.{col} = d.id)
+  AND NOT EXISTS (SELECT 1 FROM public.inventory i WHERE i.{col} = d.id)
+"""
+
+
+def duplicate_groups(rows, kind):
+    """Groups (id, name, refs) rows by key; returns [(keep_row, [dup_rows])] for keys with >1 row."""
+    groups = {}
+    for row in rows:
+        groups.setdefault(normalize_name(row[1], kind), []).append(row)
+    result = []
+    for members in groups.values():
+        if len(members) > 1:
+            # Most referenced spelling wins; rows are ordered oldest first for ties
+            keep = max(members, key=lambda r: r[2])
+            result.append((keep, [r for r in members if r is not keep]))
+    return result
+
+
+def merge_duplicates(dsn, apply=False):
+    """Collapses duplicate dimension rows onto one canonical row per key, in one transaction."""
+    try:
+        import psycopg
+    except ImportError:
+        raise RuntimeError("Merging needs psycopg. Run: pip install 'psycopg[binary]'")
+
+    report = {}
+    with psycopg.connect(dsn) as conn:
+        for kind, table in TABLES.items():
+            col = f"{kind}_id"
+            other = "manufacturer_id" if kind == "generic" else "generic_id"
+            rows = conn.execute(DIMENSION_USAGE_SQL.format(col=col, table=table)).fetchall()
+            groups = duplicate_groups(rows, kind)
+            moved = deleted = 0
+            if apply:
+                for keep, dups in groups:
+                    for dup in dups:
+                        params = {"keep": keep[0], "dup": dup[0]}
+                        moved += conn.execute(REPOINT_GLOBAL_SQL.format(col=col, other=other), params).rowcount
+                        moved += conn.execute(REPOINT_INVENTORY_SQL.format(col=col), params).rowcount
+                        deleted += conn.execute(DELETE_UNUSED_SQL.format(col=col, table=table), params).rowcount
+            report[kind] = {"groups": groups, "moved": moved, "deleted": deleted}
+        if not apply:
+            conn.rollback()
+    return report
+
+
+def main(argv=None):
+    from rich.console import Console
+    from rich.table import Table
+
+    parser = argparse.ArgumentParser(description="Build the name index / merge duplicate generics and manufacturers.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="Rebuild data/name_index.json from the dimension tables")
+    p = sub.add_parser("merge", help="Merge duplicate dimension rows (dry run unless --apply)")
+    p.add_argument("--apply", action="store_true", help="Write the changes")
+    p.add_argument("--dsn", default=config.DATABASE_URL, help="Postgres connection string (default: config.DATABASE_URL)")
+    args = parser.parse_args(argv)
+
+    console = Console()
+    if args.command == "build":
+        for kind, (rows, keys) in build_index().items():
+            console.print(f"[green]{TABLES[kind]}:[/] {rows} rows -> {keys} keys ({rows - keys} variant spellings)")
+        console.print(f"[bold green]✓ Index written to {INDEX_FILE}[/]")
+        return 0
+
+    if not args.dsn:
+        console.print("[bold red]No connection string. Set DATABASE_URL in config.py or pass --dsn.[/]")
+        return 2
+    report = merge_duplicates(args.dsn, apply=args.apply)
+    for kind, result in report.items():
+        table = Table(title=f"{TABLES[kind]} duplicate groups", show_header=True, header_style="bold")
+        table.add_column("Keep", style="green")
+        table.add_column("Refs", justify="right")
+        table.add_column("Merged", style="yellow")
+        for keep, dups in result["groups"]:
+            table.add_row(keep[1], str(keep[2]), ", ".join(f"{d[1]} ({d[2]})" for d in dups))
+        console.print(table)
+        if args.apply:
+            console.print(f"  {result['moved']} references re-pointed, {result['deleted']} rows deleted")
+    if not args.apply:
+        console.print("[yellow]Dry run - nothing written. Re-run with --apply.[/]")
+    else:
+        build_index()
+        console.print(f"[bold green]✓ Index rebuilt ({INDEX_FILE})[/]")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+"""
+Offline near-duplicate finder for the catalogue.
+
+The unique index only catches brands that are equal after lower(btrim(...)), so
+"Abdolax." / "Abdolax Tablet" / "Abdolax" all survive as separate rows. This
+job reads an export (exporter.py, gzip CSV) or the scraper CSVs and:
+
+1. drops repeats of a row already read (same id, or same medex_url: the same
+   page scraped into several CSVs), which are re-scrapes rather than duplicates
+2. blocks rows on (manufacturer, generic, strength), names folded with
+   name_index.normalize_name and strength the way the DB trigger does; only
+   rows in the same block are ever compared, so the work grows with the block
+   sizes, not with the square of the catalogue
+3. inside a block compares brands (same category only): identical after
+   stripping punctuation and leftover dosage-form words -> score 1.0, else
+   difflib ratio (quick_ratio as a cheap pre-filter) against --threshold.
+   Oversized blocks (placeholders like "Unknown Generic") fall back to a
+   sorted-neighbourhood window instead of all pairs
+4. groups matches into clusters (union-find) and writes a merge report, one
+   line per row, with a suggested row to keep
+
+    python near_dupes.py                                  # latest full export, else data/*.csv
+    python near_dupes.py data/exports/inventory_global_full_X.csv.gz --threshold 0.92
+"""
+import argparse
+import csv
+import glob
+import gzip
+import os
+import re
+import sys
+import time
+from difflib import SequenceMatcher
+
+from rich.console import Console
+from rich.table import Table
+
+from name_index import normalize_name
+
+console = Console()
+
+REPORT_DIR = "data/reports"  # Not data/, where the uploaders pick up every *.csv
+MAX_BLOCK = 200   # Larger blocks are compared within a sliding window only
+WINDOW = 20
+
+# Words transform_medex_item can leave behind in a brand (category / dosage form names)
+FORM_WORDS = {
+    "tablet", "tablets", "tab", "tabs", "capsule", "capsules", "cap", "caps", "syrup", "syp",
+    "injection", "inj", "cream", "ointment", "gel", "lotion", "solution", "suspension", "suppository",
+    "powder", "granules", "inhaler", "drops", "drop", "spray", "shampoo", "soap", "serum", "mouthwash",
+    "infusion", "nebulizer", "nebuliser", "patch", "transdermal", "medicated",
+}
+PUNCT_RE = re.compile(r"[^\w+%/ ]+")
+
+REPORT_COLUMNS = (
+    "cluster", "action", "score", "id", "brand", "strength", "category", "generic_name",
+    "manufacturer_name", "medex_url", "source",
+)
+
+
+def brand_key(brand):
+    """Brand folded for comparison: case, punctuation and form words removed."""
+    words = PUNCT_RE.sub(" ", (brand or "").casefold()).split()
+    kept = [w for w in words if w not in FORM_WORDS]
+    return " ".join(kept or words)
+
+
+def strength_key(strength):
+    # Same as the normalize_inventory_global trigger
+    return (strength or "").strip().replace(" ", "").lower()
+
+
+def open_text(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def load_records(paths):
+    """MEDICINE rows from export files or scraper CSVs, in one shape; returns (records, repeats dropped)."""
+    records, seen, repeats = [], set(), 0
+    for path in paths:
+        with open_text(path) as f:
+            for n, row in enumerate(csv.DictReader(f), start=2):
+                if (row.get('type') or 'MEDICINE').upper() != 'MEDICINE' or not (row.get('brand') or '').strip():
+                    continue
+                keys = {("id", row['id']) if row.get('id') else None,
+                        ("url", row['medex_url'].strip()) if (row.get('medex_url') or '').strip() else None} - {None}
+                if keys & seen:
+                    repeats += 1  # Same row or page read again (another CSV of the same scrape)
+                    continue
+                seen |= keys
+                records.append({
+                    "id": row.get('id') or f"{os.path.basename(path)}:{n}",
+                    "brand": row['brand'].strip(),
+                    "strength": row.get('strength') or "",
+                    "category": row.get('category') or "",
+                    "generic_name": row.get('generic_name') or "",
+                    "manufacturer_name": row.get('manufacturer_name') or row.get('manufacturer') or "",
+                    "medex_url": row.get('medex_url') or "",
+                    "source": os.path.basename(path),
+                })
+    return records, repeats
+
+
+def block_records(records):
+    blocks = {}
+    for i, rec in enumerate(records):
+        key = (normalize_name(rec['manufacturer_name'], "manufacturer"),
+               normalize_name(rec['generic_name'], "generic"),
+               strength_key(rec['strength']))
+        rec['_key'] = brand_key(rec['brand'])
+        blocks.setdefault(key, []).append(i)
+    return blocks
+
+
+def candidate_pairs(members):
+    """All pairs of a normal block; neighbours within WINDOW (by brand key) for an oversized one."""
+    n = len(members)
+    if n <= MAX_BLOCK:
+        for a in range(n):
+            for b in range(a + 1, n):
+                yield members[a], members[b]
+    else:
+        for a in range(n):
+            for b in range(a + 1, min(a + WINDOW, n)):
+                yield members[a], members[b]
+
+
+def similarity(a, b, threshold):
+    """1.0 for equal brand keys, else difflib ratio if it reaches `threshold` (None otherwise)."""
+    if a == b:
+        return 1.0
+    matcher = SequenceMatcher(None, a, b, autojunk=False)
+    if matcher.real_quick_ratio() < threshold or matcher.quick_ratio() < threshold:
+        return None
+    ratio = matcher.ratio()
+    return ratio if ratio >= threshold else None
+
+
+def find_clusters(records, threshold=0.9):
+    """Returns (clusters, stats); a cluster is [(record index, best score)] with 2+ rows."""
+    blocks = block_records(records)
+    parent = list(range(len(records)))
+    score = {}
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    compared = 0
+    for members in blocks.values():
+        if len(members) < 2:
+            continue
+        members.sort(key=lambda i: records[i]['_key'])
+        for i, j in candidate_pairs(members):
+            if records[i]['category'].casefold() != records[j]['category'].casefold():
+                continue
+            compared += 1
+            s = similarity(records[i]['_key'], records[j]['_key'], threshold)
+            if s is None:
+                continue
+            parent[find(i)] = find(j)
+            score[i] = max(score.get(i, 0.0), s)
+            score[j] = max(score.get(j, 0.0), s)
+
+    groups = {}
+    for i in score:
+        groups.setdefault(find(i), []).append(i)
+    clusters = [[(i, score[i]) for i in sorted(g)] for g in groups.values() if len(g) > 1]
+    clusters.sort(key=lambda c: (-len(c), records[c[0][0]]['_key']))
+    stats = {"rows": len(records), "blocks": len(blocks), "comparisons": compared,
+             "clusters": len(clusters), "rows_in_clusters": sum(len(c) for c in clusters)}
+    return clusters, stats
+
+
+def pick_keeper(records, cluster):
+    """Row to keep: brand already clean (equal to its key), then has a medex_url, then shortest brand."""
+    def rank(entry):
+        rec = records[entry[0]]
+        return (rec['brand'].casefold() != rec['_key'], not rec['medex_url'], len(rec['brand']), rec['brand'])
+    return min(cluster, key=rank)[0]
+
+
+def write_report(records, clusters, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        for n, cluster in enumerate(clusters, start=1):
+            keep = pick_keeper(records, cluster)
+            for i, s in cluster:
+                writer.writerow({**records[i], "cluster": n, "action": "KEEP" if i == keep else "MERGE",
+                                 "score": f"{s:.3f}"})
+
+
+def default_inputs():
+    exports = sorted(glob.glob("data/exports/inventory_global_full_*.csv.gz"))
+    return exports[-1:] or sorted(glob.glob("data/*.csv"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find near-duplicate brands (blocked on manufacturer+generic+strength).")
+    parser.add_argument("inputs", nargs="*", help="Export .csv.gz or scraper CSVs (default: latest full export, else data/*.csv)")
+    parser.add_argument("--threshold", type=float, default=0.9, help="Minimum similarity of the cleaned brands (0-1)")
+    parser.add_argument("--out", help="Report path (default: data/reports/near_dupes_<timestamp>.csv)")
+    args = parser.parse_args(argv)
+
+    paths = args.inputs or default_inputs()
+    if not paths:
+        console.print("[bold yellow]No input files. Export the catalogue first (python cli.py export --full).[/]")
+        return 2
+
+    start = time.time()
+    records, repeats = load_records(paths)
+    clusters, stats = find_clusters(records, args.threshold)
+    out = args.out or os.path.join(REPORT_DIR, f"near_dupes_{time.strftime('%Y%m%d_%H%M%S')}.csv")
+    write_report(records, clusters, out)
+
+    summary = Table(title="Near-Duplicate Scan", show_header=True, header_style="bold")
+    summary.add_column("Metric", style="bold cyan")
+    summary.add_column("Value", justify="right")
+    summary.add_row("Input files", str(len(paths)))
+    summary.add_row("Medicine rows", str(stats['rows']))
+    summary.add_row("Repeated rows skipped (same id / medex_url)", str(repeats))
+    summary.add_row("Blocks", str(stats['blocks']))
+    summary.add_row("Pairs compared", str(stats['comparisons']))
+    summary.add_row("[yellow]Duplicate clusters[/]", f"[yellow]{stats['clusters']}[/]")
+    summary.add_row("[yellow]Rows to merge[/]", f"[yellow]{stats['rows_in_clusters'] - stats['clusters']}[/]")
+    summary.add_row("Time", f"{time.time() - start:.1f}s")
+    console.print(summary)
+
+    for cluster in clusters[:10]:
+        keep = pick_keeper(records, cluster)
+        others = ", ".join(f"'{records[i]['brand']}'" for i, _ in cluster if i != keep)
+        rec = records[keep]
+        console.print(f" - [green]{rec['brand']}[/] {rec['strength']} ({rec['category']}) <- [yellow]{others}[/]")
+    console.print(f"\n[bold green]✓ Report written to {out}[/]")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
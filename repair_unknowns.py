@@ -0,0 +1,275 @@
+"""
+Repairs inventory_global rows that the RPC attached to the 'Unknown Generic' /
+'Unknown Manufacturer' placeholders (see check_unknowns.sql).
+
+1. Pulls every placeholder row (id, brand, medex_url) keyset-paginated.
+2. Re-extracts generic and manufacturer from the brand page: the HTML is taken
+   from data/html_cache/<brand_id>.html.gz when present and only fetched (with
+   curl_cffi, cookies/headers from config.CURL_COMMAND) on a cache miss, at most
+   one request every config.REPAIR_FETCH_INTERVAL seconds. Fetching stops at
+   the first block; rows left over are picked up by the next run.
+3. Resolves the names to dimension ids (through the name index) and applies the
+   corrections as batched `update ... in (ids)`, one batch per target id pair.
+
+    python repair_unknowns.py --dry-run     # show what would change
+    python repair_unknowns.py --no-fetch    # cached pages only
+"""
+import argparse
+import gzip
+import os
+import random
+import sys
+import time
+
+from rich.console import Console
+from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, MofNCompleteColumn
+from rich.table import Table
+
+import config
+from main_browser import clean_text, parse_curl_command
+from name_index import get_index, normalize_name
+from crawl_frontier import brand_id_from_url
+
+console = Console()
+
+CACHE_DIR = "data/html_cache"
+PLACEHOLDERS = {
+    "generic": ("inventory_generics", "Unknown Generic"),
+    "manufacturer": ("inventory_manufacturers", "Unknown Manufacturer"),
+}
+
+
+class Blocked(Exception):
+    pass
+
+
+def cache_path(url):
+    bid = brand_id_from_url(url)
+    return os.path.join(CACHE_DIR, f"{bid}.html.gz") if bid is not None else None
+
+
+def read_cached(url):
+    path = cache_path(url)
+    if path and os.path.exists(path):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return f.read()
+    return None
+
+
+def write_cached(url, html):
+    path = cache_path(url)
+    if not path:
+        return
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = f"{path}.tmp"
+    with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+        f.write(html)
+    os.replace(tmp, path)
+
+
+def extract_names(html):
+    """Generic and manufacturer from a brand page (same selectors as scrape_details)."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    generic_el = soup.select_one('div[title="Generic Name"] a')
+    mfg_el = soup.select_one('div[title="Manufactured by"] a')
+    return (
+        clean_text(generic_el.get_text()) if generic_el else None,
+        clean_text(mfg_el.get_text()) if mfg_el else None,
+    )
+
+
+class PoliteFetcher:
+    """curl_cffi session that waits at least `interval` seconds (plus jitter) between requests."""
+
+    def __init__(self, interval):
+        from curl_cffi import requests as curl_requests
+
+        cookies, headers = parse_curl_command(config.CURL_COMMAND)
+        self.session = curl_requests.Session(impersonate="chrome")
+        self.session.headers.update(headers or config.DEFAULT_HEADERS)
+        if cookies:
+            self.session.cookies.update(cookies)
+        self.interval = interval
+        self.last = 0.0
+        self.fetched = 0
+
+    def get(self, url):
+        wait = self.last + self.interval + random.uniform(0, self.interval / 2) - time.time()
+        if wait > 0:
+            time.sleep(wait)
+        self.last = time.time()
+        resp = self.session.get(url, timeout=30)
+        if resp.status_code in (403, 429) or "terms-of-use" in str(resp.url):
+            raise Blocked(f"{resp.status_code} {resp.url}")
+        resp.raise_for_status()
+        self.fetched += 1
+        return resp.text
+
+
+def placeholder_ids(supabase):
+    """{'generic': [ids], 'manufacturer': [ids]} of the placeholder dimension rows."""
+    ids = {}
+    for kind, (table, name) in PLACEHOLDERS.items():
+        res = supabase.table(table).select("id").ilike("name", name).execute()
+        ids[kind] = [r['id'] for r in res.data or []]
+    return ids
+
+
+def fetch_unknown_rows(supabase, ids, page_size=1000):
+    """All rows pointing at a placeholder, as {id: row} with an 'unknown' set of kinds."""
+    rows = {}
+    for kind, kind_ids in ids.items():
+        if not kind_ids:
+            continue
+        last_id = None
+        while True:
+            q = supabase.table(config.SUPABASE_TABLE).select("id,brand,medex_url").in_(f"{kind}_id", kind_ids)
+            if last_id:
+                q = q.gt("id", last_id)
+            page = q.order("id").limit(page_size).execute().data or []
+            for r in page:
+                rows.setdefault(r['id'], {**r, 'unknown': set()})['unknown'].add(kind)
+            if len(page) < page_size:
+                break
+            last_id = page[-1]['id']
+    return rows
+
+
+def resolve_dimension(supabase, kind, name, dry_run):
+    """Id of the dimension row for `name` (created if missing); index first, then the table."""
+    table = PLACEHOLDERS[kind][0]
+    index = get_index()
+    known = index.lookup_id(kind, name)
+    if known:
+        return known
+    name = index.canonical(kind, name)
+    res = supabase.table(table).select("id").ilike("name", name).limit(1).execute()
+    if res.data:
+        row_id = res.data[0]['id']
+    elif dry_run:
+        return f"<new {kind}: {name}>"
+    else:
+        row_id = supabase.table(table).insert({"name": name}).execute().data[0]['id']
+    index.entries[kind][normalize_name(name, kind)] = [row_id, name]
+    return row_id
+
+
+def apply_batches(supabase, groups, batch_size):
+    """groups: {(generic_id, manufacturer_id): [row ids]}. Returns (updated, collisions, errors)."""
+    updated, collisions, errors = 0, [], []
+    for (generic_id, manufacturer_id), ids in groups.items():
+        values = {}
+        if generic_id:
+            values['generic_id'] = generic_id
+        if manufacturer_id:
+            values['manufacturer_id'] = manufacturer_id
+        for i in range(0, len(ids), batch_size):
+            chunk = ids[i:i + batch_size]
+            try:
+                supabase.table(config.SUPABASE_TABLE).update(values).in_("id", chunk).execute()
+                updated += len(chunk)
+                continue
+            except Exception as e:
+                if "duplicate key" not in str(e).lower():
+                    errors.append(str(e))
+                    continue
+            # A row in the batch already has a correct twin; retry one by one to isolate it
+            for row_id in chunk:
+                try:
+                    supabase.table(config.SUPABASE_TABLE).update(values).eq("id", row_id).execute()
+                    updated += 1
+                except Exception as e:
+                    if "duplicate key" in str(e).lower():
+                        collisions.append(row_id)
+                    else:
+                        errors.append(f"{row_id}: {e}")
+    return updated, collisions, errors
+
+
+def repair(dry_run=False, fetch=True, limit=None, batch_size=200, interval=None):
+    from exporter import make_client
+
+    supabase = make_client()
+    ids = placeholder_ids(supabase)
+    rows = fetch_unknown_rows(supabase, ids)
+    todo = [r for r in rows.values() if r.get('medex_url')][:limit]
+    stats = {"rows": len(rows), "no_url": len(rows) - len([r for r in rows.values() if r.get('medex_url')]),
+             "cached": 0, "fetched": 0, "not_found": 0, "unfetched": 0}
+
+    fetcher = None
+    blocked = None
+    groups = {}
+    with Progress(SpinnerColumn(), TextColumn("{task.description}"), BarColumn(), MofNCompleteColumn(), console=console) as progress:
+        task = progress.add_task("[cyan]Re-extracting...", total=len(todo))
+        for row in todo:
+            progress.advance(task)
+            url = row['medex_url']
+            html = read_cached(url)
+            if html is not None:
+                stats['cached'] += 1
+            elif fetch and not blocked:
+                try:
+                    fetcher = fetcher or PoliteFetcher(interval or config.REPAIR_FETCH_INTERVAL)
+                    html = fetcher.get(url)
+                    write_cached(url, html)
+                    stats['fetched'] += 1
+                except Blocked as e:
+                    blocked = str(e)
+                    progress.update(task, description=f"[yellow]Blocked ({blocked}); cache only from here...")
+                except Exception as e:
+                    console.print(f"[red]Fetch failed for {url}: {e}[/]")
+            if html is None:
+                stats['unfetched'] += 1
+                continue
+
+            generic, mfg = extract_names(html)
+            new_generic = resolve_dimension(supabase, "generic", generic, dry_run) if 'generic' in row['unknown'] and generic else None
+            new_mfg = resolve_dimension(supabase, "manufacturer", mfg, dry_run) if 'manufacturer' in row['unknown'] and mfg else None
+            if not new_generic and not new_mfg:
+                stats['not_found'] += 1
+                continue
+            groups.setdefault((new_generic, new_mfg), []).append(row['id'])
+
+    planned = sum(len(v) for v in groups.values())
+    updated, collisions, errors = 0, [], []
+    if not dry_run:
+        updated, collisions, errors = apply_batches(supabase, groups, batch_size)
+
+    summary = Table(title="Unknown Repair" + (" (dry run)" if dry_run else ""), show_header=True, header_style="bold")
+    summary.add_column("Metric", style="bold cyan")
+    summary.add_column("Value", justify="right")
+    summary.add_row("Placeholder rows", str(stats['rows']))
+    summary.add_row("Without medex_url", str(stats['no_url']))
+    summary.add_row("Pages from cache", str(stats['cached']))
+    summary.add_row("Pages fetched", str(stats['fetched']))
+    summary.add_row("Pages not available", str(stats['unfetched']))
+    summary.add_row("Still unknown on page", str(stats['not_found']))
+    summary.add_row("[yellow]Corrections[/]", f"[yellow]{planned}[/] in {len(groups)} batches")
+    summary.add_row("[green]Updated[/]", f"[green]{updated}[/]")
+    summary.add_row("Duplicates of existing rows", str(len(collisions)))
+    summary.add_row("[red]Errors[/]", f"[red]{len(errors)}[/]")
+    console.print(summary)
+    if blocked:
+        console.print(f"[yellow]Fetching stopped after a block ({blocked}). Re-run later to continue.[/]")
+    for e in errors[:10]:
+        console.print(f" - [red]{e}[/]")
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fill in Unknown Generic / Unknown Manufacturer rows from Medex.")
+    parser.add_argument("--dry-run", action="store_true", help="Resolve and report, write nothing")
+    parser.add_argument("--no-fetch", action="store_true", help="Use cached pages only")
+    parser.add_argument("--limit", type=int, help="At most N rows this run")
+    parser.add_argument("--batch-size", type=int, default=200, help="Row ids per update request")
+    parser.add_argument("--interval", type=float, help="Seconds between fetches (default: config.REPAIR_FETCH_INTERVAL)")
+    args = parser.parse_args(argv)
+    repair(dry_run=args.dry_run, fetch=not args.no_fetch, limit=args.limit,
+           batch_size=args.batch_size, interval=args.interval)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+Local mirror of the `inventory_global` integrity rules.
+
+Rows that would come back from `global_inventory_add_data_from_python` as
+INTERNAL_ERROR are caught (or repaired) here, before they ever use a request.
+"""
+
+# Mirror of `public.unit_enum` (MedideshDb dump). Keep in sync with the schema.
+UNIT_ENUM = (
+    'piece', 'tablet', 'capsule', 'strip', 'bottle', 'box', 'pack', 'tube',
+    'vial', 'sachet', 'ml', 'mg', 'gm', 'kg', 'liter', 'can', 'roll', 'pair',
+    'set', 'unit', 'carton', 'dozen', 'gallon', 'syringe', 'ampoule',
+    'injection', 'other', 'puff', 'drop', 'kit', 'bag', 'container', 'jar',
+    'case'
+)
+_UNIT_SET = frozenset(UNIT_ENUM)
+
+INVENTORY_TYPES = ('MEDICINE', 'OTHER')
+
+
+def _blank(val):
+    return val is None or (isinstance(val, str) and val.strip() == '')
+
+
+def text_to_unit_enum(val):
+    """
+    Same mapping as `public.text_to_unit_enum`: NULL/blank -> None,
+    known values -> lowercased enum label, anything else -> 'other'.
+    """
+    if _blank(val):
+        return None
+    cleaned = str(val).strip().lower()
+    return cleaned if cleaned in _UNIT_SET else 'other'
+
+
+def validate_rpc_payload(payload):
+    """
+    Checks an RPC payload against `inventory_global_data_integrity`.
+
+    MEDICINE: brand, generic and strength required, name must be NULL.
+    OTHER:    name required, brand/generic/strength must be NULL.
+
+    Fixable problems are repaired in place (units, defaults, fields the
+    constraint requires to be NULL). Returns (payload, problems) where
+    `problems` lists the reasons the row cannot be sent; empty means OK.
+    """
+    problems = []
+
+    p_type = (payload.get('p_type') or '').strip().upper()
+    if p_type not in INVENTORY_TYPES:
+        problems.append(f"invalid type '{payload.get('p_type')}'")
+        return payload, problems
+    payload['p_type'] = p_type
+
+    if _blank(payload.get('p_category')):
+        payload['p_category'] = 'Miscellaneous'
+
+    if p_type == 'MEDICINE':
+        payload['p_name'] = None
+        if _blank(payload.get('p_brand')):
+            problems.append("MEDICINE row without brand")
+        if _blank(payload.get('p_strength')):
+            payload['p_strength'] = 'N/A'
+        # A missing generic is not fatal: the RPC attaches 'Unknown Generic'.
+    else:
+        payload['p_brand'] = None
+        payload['p_generic_name'] = None
+        payload['p_strength'] = None
+        if _blank(payload.get('p_name')):
+            problems.append("OTHER row without name")
+
+    # Units are resolved server-side; resolve them here so the payload is what gets stored
+    payload['p_primary_unit'] = text_to_unit_enum(payload.get('p_primary_unit')) or 'piece'
+    payload['p_secondary_unit'] = text_to_unit_enum(payload.get('p_secondary_unit'))
+
+    try:
+        rate = int(payload.get('p_conversion_rate') or 1)
+    except (TypeError, ValueError):
+        rate = 1
+    payload['p_conversion_rate'] = rate if rate > 0 else 1
+
+    return payload, problems
+
+
+def rpc_outcome(result):
+    """
+    'inserted' or 'duplicate' for a `global_inventory_add_data_from_python` result.
+
+    Reads the INSERTED / DUPLICATE codes (migrations/003) and the older SUCCESS
+    code, where a null id means ON CONFLICT DO NOTHING skipped the row. Raises
+    with the RPC's message for INTERNAL_ERROR.
+    """
+    if not isinstance(result, dict):
+        return 'inserted'
+    code = result.get('code')
+    if code == 'INSERTED':
+        return 'inserted'
+    if code == 'DUPLICATE':
+        return 'duplicate'
+    if code == 'SUCCESS':
+        return 'inserted' if result.get('id') else 'duplicate'
+    raise Exception(result.get('message') or f"RPC returned {code}")
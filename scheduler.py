@@ -0,0 +1,361 @@
+"""
+Multi-manufacturer crawl scheduler.
+
+Reads a job spec (see jobs.example.json) listing company brand listings and page
+ranges, and runs them through a pool of worker processes, each with its own
+browser. Workers share:
+    - one global request budget (SharedRateLimiter)
+    - one dedup store (URLs already processed by any worker; a brand-ID file
+      every worker maps, see url_dedup.py)
+    - one upload queue, drained by a single uploader thread in this process;
+      a URL counts as done (frontier DONE, dedup stores) only once the
+      uploader's RPC for it succeeded
+
+Job status is kept in data/jobs_state.json. A worker that finishes its pages
+leaves the job SCRAPED; it becomes DONE once the uploader acknowledged all of
+its items. After a crash, rerunning the same spec skips DONE jobs, and every
+other job resumes from its crawl frontier.
+
+Usage:
+    python scheduler.py jobs.json [--workers 2] [--rpm 30]
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import re
+import sys
+import threading
+import time
+
+from rich.console import Console
+from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TimeElapsedColumn
+from rich.table import Table
+
+import config
+
+console = Console()
+
+STATE_FILE = "data/jobs_state.json"
+SEEN_FILE = "data/jobs_seen.bin"
+
+
+class SharedRateLimiter:
+    """Global request budget shared by all worker processes (evenly spaced request slots)."""
+
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / max(requests_per_minute, 1)
+        self._next_slot = mp.Value('d', 0.0)
+
+    def acquire(self):
+        with self._next_slot.get_lock():
+            now = time.time()
+            slot = max(now, self._next_slot.value)
+            self._next_slot.value = slot + self.interval
+        wait = slot - time.time()
+        if wait > 0:
+            time.sleep(wait)
+
+
+def job_suffix(job):
+    return re.sub(r'[^\w\s-]', '', job['name']).strip().replace(' ', '_')
+
+
+def job_dedup_file(job):
+    # Same naming as main_browser.main_loop, so manual and scheduled runs share progress
+    return f"data/scraped_urls_{job_suffix(job)}_{job['start_page']}_to_{job['end_page']}.txt"
+
+
+def load_spec(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        spec = json.load(f)
+    jobs = spec.get('jobs', [])
+    for job in jobs:
+        if 'name' not in job or 'url' not in job:
+            raise ValueError(f"Job needs 'name' and 'url': {job}")
+        job.setdefault('start_page', 1)
+        job.setdefault('end_page', job['start_page'])
+    return spec, jobs
+
+
+def load_state():
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(state):
+    tmp = f"{STATE_FILE}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, STATE_FILE)
+
+
+def worker_main(worker_id, job_queue, events, rate_limiter, upload_queue, seen_path):
+    """Worker process: takes jobs until it receives None."""
+    from log_setup import setup_logging
+    from url_dedup import SeenBrands
+    setup_logging(f"scraper.worker{worker_id}.log")
+    shared_seen = SeenBrands(seen_path)  # Same mmap'ed file in every worker
+
+    import main_browser
+    main_browser.console.quiet = True  # Progress is rendered by the scheduler
+
+    while True:
+        job = job_queue.get()
+        if job is None:
+            break
+        name = job['name']
+        events.put(('started', name, None))
+
+        sessions = main_browser.SessionManager(
+            allow_attach=False,
+            base_url=job['url'],
+            rate_limiter=rate_limiter,
+            item_sink=lambda item, url, name=name, dedup=job_dedup_file(job): upload_queue.put((name, dedup, url, item)),
+            shared_seen=shared_seen,
+            on_progress=lambda counts, name=name: events.put(('progress', name, counts)),
+        )
+        status, stats = "ERROR", {}
+        try:
+            status, stats = main_browser.run_crawl(
+                sessions, job['start_page'], job['end_page'], job_dedup_file(job), job_suffix(job)
+            )
+        except Exception as e:
+            main_browser.logger.error(f"Job {name} failed: {e}")
+        finally:
+            sessions.close()
+        events.put(('finished', name, {'status': status, 'stats': stats}))
+    shared_seen.close()
+
+
+class UploadAcks:
+    """Marks uploaded URLs DONE in their job's frontier and in the dedup stores (uploader thread only)."""
+
+    def __init__(self, seen_path):
+        from url_dedup import SeenBrands
+        self.shared_seen = SeenBrands(seen_path)
+        self.frontiers = {}
+        self.seen = {}
+
+    def ack(self, dedup_file, url, ok):
+        from crawl_frontier import CrawlFrontier, frontier_path_for, DONE, FAILED
+        from url_dedup import open_seen
+
+        if dedup_file not in self.frontiers:
+            self.frontiers[dedup_file] = CrawlFrontier(frontier_path_for(dedup_file))
+            self.seen[dedup_file] = open_seen(dedup_file)
+        if ok:
+            self.seen[dedup_file].add(url)
+            self.shared_seen.add(url)
+        self.frontiers[dedup_file].mark(url, DONE if ok else FAILED)
+
+    def close(self):
+        for frontier in self.frontiers.values():
+            frontier.close()
+        for seen in self.seen.values():
+            seen.close()
+        self.shared_seen.close()
+
+
+def uploader_thread(upload_queue, job_stats, seen_path=SEEN_FILE):
+    """Single consumer of the shared upload queue (one Supabase client for all workers)."""
+    import main_browser
+    from dead_letter import DeadLetter
+    from supabase import create_client, ClientOptions
+
+    options = ClientOptions(postgrest_client_timeout=15)
+    supabase = create_client(config.SUPABASE_URL, config.SUPABASE_KEY, options=options)
+    main_browser.console.quiet = True
+    dead_letter = DeadLetter()
+    acks = UploadAcks(seen_path)
+
+    try:
+        while True:
+            msg = upload_queue.get()
+            if msg is None:
+                break
+            name, dedup_file, url, item = msg
+            stats = job_stats.setdefault(name, {'inserted': 0, 'skipped': 0, 'errors': 0})
+            outcome = main_browser.upload_scraped_item(supabase, item, stats, dead_letter)
+            try:
+                acks.ack(dedup_file, url, outcome in ('inserted', 'skipped'))
+            except Exception as e:
+                main_browser.logger.error(f"Could not record upload of {url}: {e}")
+    finally:
+        dead_letter.close()
+        acks.close()
+
+
+def requeue_unacked(jobs):
+    """
+    Items a crashed run scraped but never uploaded go back to PENDING, so they are scraped again.
+    Returns {job name: requeued count} for the jobs that had any.
+    """
+    from crawl_frontier import CrawlFrontier, frontier_path_for
+
+    requeued = {}
+    for job in jobs:
+        path = frontier_path_for(job_dedup_file(job))
+        if os.path.exists(path):
+            frontier = CrawlFrontier(path)
+            count = frontier.requeue_unacked()
+            frontier.close()
+            if count:
+                requeued[job['name']] = count
+    return requeued
+
+
+def promote_scraped(jobs, state):
+    """SCRAPED -> DONE for jobs whose frontier has no item left waiting for an upload ack."""
+    from crawl_frontier import CrawlFrontier, frontier_path_for, QUEUED
+
+    for job in jobs:
+        st = state.get(job['name'], {})
+        if st.get('status') != 'SCRAPED':
+            continue
+        frontier = CrawlFrontier(frontier_path_for(job_dedup_file(job)))
+        unacked = frontier.counts()[QUEUED]
+        frontier.close()
+        if not unacked:
+            st['status'] = 'DONE'
+
+
+def run_jobs(jobs, workers, requests_per_minute, rerun=False):
+    state = load_state()
+    # Every job in the spec, even a DONE one: its frontier is the source of truth
+    requeued = requeue_unacked(jobs)
+    if requeued:
+        console.print(f"[yellow]{sum(requeued.values())} item(s) from the last run were never uploaded; "
+                      f"they will be scraped again.[/]")
+    todo = [job for job in jobs
+            if rerun or job['name'] in requeued or state.get(job['name'], {}).get('status') != 'DONE']
+    if not todo:
+        console.print("[bold green]All jobs are already done.[/] Use --rerun to run them again.")
+        return state
+
+    workers = max(1, min(workers, len(todo)))
+    console.print(f"[bold cyan]Running {len(todo)} jobs on {workers} workers "
+                  f"({requests_per_minute} requests/min shared).[/]")
+
+    for path in (SEEN_FILE, f"{SEEN_FILE}.urls"):
+        if os.path.exists(path):
+            os.remove(path)  # The shared store only covers this run
+    job_queue = mp.Queue()
+    events = mp.Queue()
+    upload_queue = mp.Queue()
+    rate_limiter = SharedRateLimiter(requests_per_minute)
+
+    for job in todo:
+        job_queue.put(job)
+        state.setdefault(job['name'], {})['status'] = 'QUEUED'
+    for _ in range(workers):
+        job_queue.put(None)
+    save_state(state)
+
+    job_stats = {}
+    uploader = threading.Thread(target=uploader_thread, args=(upload_queue, job_stats), daemon=True)
+    uploader.start()
+
+    procs = [
+        mp.Process(target=worker_main, args=(i + 1, job_queue, events, rate_limiter, upload_queue, SEEN_FILE))
+        for i in range(workers)
+    ]
+    for p in procs:
+        p.start()
+
+    remaining = {job['name'] for job in todo}
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(bar_width=30),
+        TextColumn("{task.completed}/{task.total}"),
+        TimeElapsedColumn(),
+        console=console
+    ) as progress:
+        tasks = {job['name']: progress.add_task(f"[dim]{job['name']} (queued)", total=None) for job in todo}
+        while remaining:
+            if not any(p.is_alive() for p in procs) and events.empty():
+                break  # Workers died without reporting; state keeps the job resumable
+            try:
+                kind, name, payload = events.get(timeout=1)
+            except Exception:
+                continue
+
+            if kind == 'started':
+                state[name]['status'] = 'RUNNING'
+                state[name]['started_at'] = time.time()
+                progress.update(tasks[name], description=f"[cyan]{name}")
+            elif kind == 'progress':
+                done = payload.get('DONE', 0) + payload.get('FAILED', 0) + payload.get('QUEUED', 0)
+                total = done + payload.get('PENDING', 0)
+                state[name].update({'done': done, 'total': total})
+                progress.update(tasks[name], completed=done, total=total or None)
+            elif kind == 'finished':
+                remaining.discard(name)
+                # DONE only after the uploader acked every item (promote_scraped)
+                state[name]['status'] = 'SCRAPED' if payload['status'] == 'DONE' else 'FAILED'
+                state[name]['finished_at'] = time.time()
+                color = "green" if state[name]['status'] == 'SCRAPED' else "red"
+                progress.update(tasks[name], description=f"[{color}]{name} ({state[name]['status']})")
+            save_state(state)
+
+    for p in procs:
+        p.join()
+    upload_queue.put(None)
+    uploader.join()
+
+    for name, stats in job_stats.items():
+        state.setdefault(name, {})['upload'] = stats
+    promote_scraped(todo, state)
+    save_state(state)
+    return state
+
+
+def print_summary(jobs, state):
+    table = Table(title="Scheduled Jobs Summary", title_style="bold cyan")
+    table.add_column("Job", style="bold")
+    table.add_column("Status")
+    table.add_column("Pages", justify="right")
+    table.add_column("Items", justify="right")
+    table.add_column("Uploaded", justify="right", style="green")
+    table.add_column("Duplicates", justify="right", style="yellow")
+    table.add_column("Errors", justify="right", style="red")
+    for job in jobs:
+        st = state.get(job['name'], {})
+        up = st.get('upload', {})
+        table.add_row(
+            job['name'], st.get('status', '-'), f"{job['start_page']}-{job['end_page']}",
+            f"{st.get('done', 0)}/{st.get('total', 0)}",
+            str(up.get('inserted', 0)), str(up.get('skipped', 0)), str(up.get('errors', 0)),
+        )
+    console.print(table)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run several Medex company crawls from a job spec file.")
+    parser.add_argument("spec", help="Job spec JSON (see jobs.example.json)")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: spec 'workers' or 2)")
+    parser.add_argument("--rpm", type=int, help="Shared page requests per minute (default: spec or 30)")
+    parser.add_argument("--rerun", action="store_true", help="Also run jobs already marked DONE")
+    args = parser.parse_args(argv)
+
+    spec, jobs = load_spec(args.spec)
+    if not jobs:
+        console.print("[bold yellow]No jobs in spec.[/]")
+        sys.exit(0)
+    if not os.path.exists('data'): os.makedirs('data')
+
+    workers = args.workers or spec.get('workers', 2)
+    rpm = args.rpm or spec.get('requests_per_minute', 30)
+    try:
+        state = run_jobs(jobs, workers, rpm, rerun=args.rerun)
+    except KeyboardInterrupt:
+        console.print("\n[bold yellow]⚠ Scheduler stopped. Rerun the same spec to resume.[/]")
+        sys.exit(0)
+    print_summary(jobs, state)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Append-only journal of everything the live scraper extracted.
+
+One JSON line per event, next to the dedup file
+(data/scraped_urls_X_1_to_5.txt -> data/scraped_urls_X_1_to_5.journal.jsonl):
+
+    {"t": ..., "url": ..., "page": 3, "raw": {...}, "item": {...}, "error": null}   # scrape
+    {"t": ..., "url": ..., "upload": "inserted"}                                     # upload outcome
+
+Writes are buffered and fsync'ed every `fsync_every` records or `fsync_interval`
+seconds (and on close), so journaling costs next to nothing per page while a
+crash loses at most the last batch. A torn last line is skipped on read.
+
+The journal lets uploads and transforms be replayed without the browser:
+
+    python cli.py replay                       # re-upload items whose upload did not succeed
+    python cli.py replay --retransform --all   # re-run transform_medex_item on every raw record
+    python cli.py replay --csv data/out.csv    # write items as a bulk_uploader CSV instead
+"""
+import csv
+import glob
+import json
+import os
+import threading
+import time
+
+# Upload outcomes that need no replay ('queued' items went to the scheduler's
+# uploader, whose result is not journaled, so they count as unconfirmed)
+SETTLED = ('inserted', 'skipped')
+
+CSV_COLUMNS = (
+    "type", "category", "brand", "generic_name", "strength", "manufacturer", "name",
+    "primary_unit", "secondary_unit", "conversion_rate", "item_code", "medex_url",
+    "entry_status", "updated_by",
+)
+
+
+def journal_path_for(dedup_filename):
+    """data/scraped_urls_X_1_to_5.txt -> data/scraped_urls_X_1_to_5.journal.jsonl"""
+    base = dedup_filename[:-4] if dedup_filename.endswith('.txt') else dedup_filename
+    return f"{base}.journal.jsonl"
+
+
+class ScrapeJournal:
+    def __init__(self, path, fsync_every=50, fsync_interval=5.0):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._f = open(path, 'a', encoding='utf-8')
+        self._unsynced = 0
+        self._last_sync = time.time()
+
+    def _append(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self._f.write(line)
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every or time.time() - self._last_sync >= self.fsync_interval:
+                self._sync()
+
+    def _sync(self):
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._unsynced = 0
+        self._last_sync = time.time()
+
+    def record_scrape(self, url, page, raw, item, error=None):
+        self._append({"t": time.time(), "url": url, "page": page, "raw": raw, "item": item, "error": error})
+
+    def record_upload(self, url, outcome):
+        self._append({"t": time.time(), "url": url, "upload": outcome})
+
+    def close(self):
+        with self._lock:
+            if not self._f.closed:
+                self._sync()
+                self._f.close()
+
+
+def iter_records(path):
+    """Yields journal records, skipping a torn (partially written) line."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def latest_by_url(paths):
+    """url -> (last scrape record, last upload outcome or None, journal path) over the given journals."""
+    state = {}
+    for path in paths:
+        for rec in iter_records(path):
+            url = rec.get('url')
+            scrape, outcome, source = state.get(url, (None, None, path))
+            if 'upload' in rec:
+                outcome = rec['upload']
+            else:
+                scrape, outcome, source = rec, None, path
+            state[url] = (scrape, outcome, source)
+    return state
+
+
+def replay(paths, retransform=False, replay_all=False, csv_path=None, dry_run=False):
+    """
+    Re-uploads (or writes to CSV) the journaled items. Only items whose last upload
+    did not settle are replayed unless `replay_all`. Returns a stats dict.
+    """
+    from rich.console import Console
+    from main_browser import transform_medex_item, upload_scraped_item
+
+    console = Console()
+    stats = {'records': 0, 'selected': 0, 'transform_errors': 0,
+             'inserted': 0, 'skipped': 0, 'errors': 0, 'written': 0}
+    selected = []
+    for url, (scrape, outcome, source) in latest_by_url(paths).items():
+        if scrape is None:
+            continue
+        stats['records'] += 1
+        if not replay_all and outcome in SETTLED:
+            continue
+        item = scrape.get('item')
+        if retransform or item is None:
+            try:
+                item = transform_medex_item(scrape['raw'])
+            except Exception as e:
+                stats['transform_errors'] += 1
+                console.print(f"[red]Transform failed for {url}: {e}[/]")
+                continue
+        selected.append((url, item, source))
+    stats['selected'] = len(selected)
+
+    if dry_run:
+        return stats
+
+    if csv_path:
+        with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS, extrasaction='ignore', quoting=csv.QUOTE_ALL)
+            writer.writeheader()
+            writer.writerows(item for _, item, _ in selected)
+        stats['written'] = len(selected)
+        return stats
+
+    from exporter import make_client
+
+    supabase = make_client()
+    journals = {}
+    try:
+        for url, item, source in selected:
+            outcome = upload_scraped_item(supabase, item, stats)
+            if source not in journals:
+                journals[source] = ScrapeJournal(source)
+            journals[source].record_upload(url, outcome)
+    finally:
+        for journal in journals.values():
+            journal.close()
+    return stats
+
+
+def find_journals(pattern="data/*.journal.jsonl"):
+    return sorted(glob.glob(pattern))
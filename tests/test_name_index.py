@@ -0,0 +1,64 @@
+import json
+
+import name_index
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+    def __init__(self, rows):
+        self.rows = rows
+        self.after = None
+        self.size = None
+
+    def select(self, columns):
+        return self
+
+    def gt(self, column, value):
+        self.after = value
+        return self
+
+    def order(self, column):
+        return self
+
+    def limit(self, size):
+        self.size = size
+        return self
+
+    def execute(self):
+        rows = sorted(self.rows, key=lambda r: r['id'])
+        if self.after:
+            rows = [r for r in rows if r['id'] > self.after]
+        return _Result(rows[:self.size])
+
+
+class FakeClient:
+    def __init__(self, tables):
+        self.tables = tables
+
+    def table(self, name):
+        return _Query(self.tables.get(name, []))
+
+
+def test_build_index_writes_oldest_spelling(tmp_path):
+    path = tmp_path / "name_index.json"
+    path.write_text(json.dumps({"generic": {"stale": [None, "Stale"]}, "manufacturer": {}}))
+    client = FakeClient({
+        "inventory_generics": [
+            {"id": "g2", "name": "paracetamol", "created_at": "2025-02-01"},
+            {"id": "g1", "name": "Paracetamol", "created_at": "2025-01-01"},
+        ],
+        "inventory_manufacturers": [
+            {"id": "m1", "name": "Incepta Pharmaceuticals Ltd.", "created_at": "2025-01-01"},
+        ],
+    })
+
+    summary = name_index.build_index(str(path), supabase=client)
+
+    assert summary == {"generic": (2, 1), "manufacturer": (1, 1)}
+    data = json.loads(path.read_text())
+    assert data["generic"] == {"paracetamol": ["g1", "Paracetamol"]}
+    assert data["manufacturer"] == {"incepta pharmaceuticals": ["m1", "Incepta Pharmaceuticals Ltd."]}
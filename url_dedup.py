@@ -0,0 +1,126 @@
+"""
+Compact, memory-mapped "already processed" store keyed on the Medex brand ID.
+
+Every detail URL (https://medex.com.bd/brands/31999/abdolax-10-mg-tablet)
+carries a numeric brand ID, so instead of a set of full URL strings the store is
+a flat byte array on disk, one byte per ID (1 = processed), mapped with mmap:
+
+    - lookup / add are a single index into the mapping (O(1))
+    - ~50k brand IDs -> ~64 KB file; opening it is one mmap call, nothing to parse
+    - one byte (not one bit) per ID, so writers in different processes never
+      read-modify-write a shared byte; workers can share one file safely
+
+The file grows in 64 KB steps when a larger ID is added, under an exclusive
+flock and never below its current size, so a process with a stale size cannot
+shrink it; readers in other processes remap when they see an ID past their
+mapped size. The rare URL
+without a brand ID is kept in a sidecar text file (`<path>.urls`).
+"""
+import mmap
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock; run the scheduler with a single worker there
+    fcntl = None
+
+from crawl_frontier import brand_id_from_url
+
+GROW_STEP = 64 * 1024
+
+
+def seen_path_for(dedup_filename):
+    """data/scraped_urls_X_1_to_5.txt -> data/scraped_urls_X_1_to_5.seen.bin"""
+    base = dedup_filename[:-4] if dedup_filename.endswith('.txt') else dedup_filename
+    return f"{base}.seen.bin"
+
+
+class SeenBrands:
+    def __init__(self, path):
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._file = os.fdopen(fd, 'r+b')
+        self._grow(GROW_STEP)
+        self._mm = mmap.mmap(fd, 0)
+
+        self._extra_path = f"{path}.urls"
+        self._extra = set()
+        if os.path.exists(self._extra_path):
+            with open(self._extra_path, 'r', encoding='utf-8') as f:
+                self._extra = {line.strip() for line in f if line.strip()}
+
+    def _grow(self, min_size):
+        """Grows the file to hold `min_size` bytes; returns its size. Never shrinks it."""
+        fd = self._file.fileno()
+        size = os.fstat(fd).st_size
+        if size >= min_size:
+            return size
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            size = os.fstat(fd).st_size  # Another process may have grown it while we waited
+            if size < min_size:
+                size = -(-min_size // GROW_STEP) * GROW_STEP
+                os.ftruncate(fd, size)
+            return size
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def _remap(self, min_size=0):
+        """Maps the file again, growing it first if it is smaller than `min_size`."""
+        size = self._grow(min_size)
+        if size != len(self._mm):
+            self._mm.close()
+            self._mm = mmap.mmap(self._file.fileno(), 0)
+
+    def __contains__(self, url):
+        bid = brand_id_from_url(url)
+        if bid is None:
+            return url in self._extra
+        if bid >= len(self._mm):
+            self._remap()  # Another process may have grown the file
+            if bid >= len(self._mm):
+                return False
+        return self._mm[bid] == 1
+
+    def add(self, url):
+        bid = brand_id_from_url(url)
+        if bid is None:
+            if url not in self._extra:
+                self._extra.add(url)
+                with open(self._extra_path, 'a', encoding='utf-8') as f:
+                    f.write(f"{url}\n")
+            return
+        if bid >= len(self._mm):
+            self._remap(bid + 1)
+        self._mm[bid] = 1
+
+    def __len__(self):
+        return self._mm[:].count(1) + len(self._extra)
+
+    def flush(self):
+        self._mm.flush()
+
+    def close(self):
+        if not self._mm.closed:
+            self._mm.flush()
+            self._mm.close()
+            self._file.close()
+
+
+def open_seen(dedup_filename):
+    """
+    Opens the store for a dedup file, importing the URLs of the old text log
+    (`dedup_filename`) the first time.
+    """
+    path = seen_path_for(dedup_filename)
+    fresh = not os.path.exists(path)
+    seen = SeenBrands(path)
+    if fresh and os.path.exists(dedup_filename):
+        with open(dedup_filename, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    seen.add(line.strip())
+        seen.flush()
+    return seen